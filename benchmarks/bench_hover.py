@@ -0,0 +1,126 @@
+# coding:utf-8
+"""
+地图卡片悬停重绘耗时
+
+模拟鼠标依次划过地图选择页的每张卡片（进入 + 离开），统计每次悬停的处理与重绘耗时。
+作为对比，同时测量旧实现：在 enterEvent/leaveEvent 中调用 setStyleSheet 的卡片。
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_hover.py --rounds 20
+"""
+import argparse
+import math
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QEvent, QPointF, Qt
+from PyQt5.QtGui import QEnterEvent
+from PyQt5.QtWidgets import QApplication, QWidget
+from qfluentwidgets import CaptionLabel, ElevatedCardWidget, FlowLayout, ImageLabel
+
+from components.queryPageSub.map_select import MapSelect
+
+
+class StyleSheetCard(ElevatedCardWidget):
+    """旧版 MapCard 的悬停实现，用作对比"""
+
+    def __init__(self, iconPath: str, name: str, parent=None):
+        super().__init__(parent)
+        self.setStyleSheet("StyleSheetCard { border: 2px solid transparent; }")
+        self.imageLabel = ImageLabel(iconPath, self)
+        self.imageLabel.setBorderRadius(8, 8, 8, 8)
+        self.imageLabel.scaledToHeight(155)
+        self.label = CaptionLabel(name, self)
+        self.setFixedSize(300, 180)
+
+    def enterEvent(self, event):
+        self.setStyleSheet("StyleSheetCard { border: 4px solid red;border-radius: 8px; }")
+        super().enterEvent(event)
+
+    def leaveEvent(self, event):
+        self.setStyleSheet("StyleSheetCard { border: 4px solid transparent; border-radius: 8px;}")
+        super().leaveEvent(event)
+
+
+def legacyPage(cards) -> QWidget:
+    """用旧版卡片搭建与地图选择页相同布局的页面"""
+    page = QWidget()
+    layout = FlowLayout(page, needAni=False)
+    layout.setContentsMargins(30, 30, 30, 30)
+    layout.setVerticalSpacing(20)
+    layout.setHorizontalSpacing(10)
+    page.map_cards = []
+    for card in cards:
+        widget = StyleSheetCard(card.iconPath, card.name, page)
+        layout.addWidget(widget)
+        page.map_cards.append(widget)
+
+    return page
+
+
+def hover(app: QApplication, card) -> float:
+    """进入再离开一张卡片，返回处理完所有重绘的耗时（毫秒）"""
+    start = time.perf_counter()
+    app.sendEvent(card, QEnterEvent(QPointF(10, 10), QPointF(10, 10), QPointF(10, 10)))
+    card.window().repaint()
+    app.sendEvent(card, QEvent(QEvent.Leave))
+    card.window().repaint()
+    app.processEvents()
+    return (time.perf_counter() - start) * 1000
+
+
+def measure(app: QApplication, page, rounds: int) -> list:
+    page.resize(1000, 800)
+    page.show()
+
+    # 等封面全部加载完，避免测量期间混入加载完成引起的重绘
+    deadline = time.perf_counter() + 10
+    while time.perf_counter() < deadline and not all(
+            getattr(card, "isImageLoaded", True) for card in page.map_cards):
+        app.processEvents()
+        time.sleep(0.01)
+    app.processEvents()
+
+    # 预热一轮
+    for card in page.map_cards:
+        hover(app, card)
+
+    samples = []
+    for _ in range(rounds):
+        for card in page.map_cards:
+            samples.append(hover(app, card))
+
+    page.hide()
+    return samples
+
+
+def summary(name: str, samples: list) -> str:
+    samples = sorted(samples)
+    p95 = samples[math.ceil(0.95 * len(samples)) - 1]
+    return (f"{name:<16} hovers={len(samples):<5} mean={statistics.mean(samples):7.3f} ms  "
+            f"median={statistics.median(samples):7.3f} ms  p95={p95:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20, help="每张卡片悬停的次数")
+    args = parser.parse_args()
+
+    QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
+    app = QApplication(sys.argv)
+
+    page = MapSelect()
+    painted = measure(app, page, args.rounds)
+    legacy = measure(app, legacyPage(page.map_cards), args.rounds)
+
+    print(summary("PaintCard", painted))
+    print(summary("setStyleSheet", legacy))
+    print(f"speedup (mean)   {statistics.mean(legacy) / statistics.mean(painted):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
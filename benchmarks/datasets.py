@@ -0,0 +1,235 @@
+# coding:utf-8
+"""
+基准测试用的合成数据
+
+点位按固定随机种子生成，同样的参数在不同机器、不同版本之间得到完全相同的数据，
+测试结果才有可比性。截图用 QPainter 画出来，动图由本模块直接编码为 GIF，不依赖仓库外的图片。
+"""
+import random
+import struct
+from typing import Iterator, List
+
+from common.catalog import SKILL_SLOTS, catalog
+from common.lineup_store import IMAGE_KINDS, SIDES, Lineup
+
+# 点位文本使用的常见词
+WORDS = [
+    "A点", "B点", "C点", "中路", "长廊", "天台", "箱子", "拐角", "门口", "窗户", "楼梯",
+    "平台", "包点", "下水道", "进攻方出生点", "防守方出生点", "烟", "闪光", "墙角", "高台",
+    "电箱", "柱子", "管道", "车库", "小道", "二楼", "对面", "右侧", "左侧", "后方",
+]
+
+
+def _text(rng: random.Random, low: int, high: int) -> str:
+    return "".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def syntheticLineups(count: int, seed: int = 0) -> Iterator[Lineup]:
+    """
+    生成 count 个点位，地图和英雄取自真实目录
+
+    每个点位带 1~3 张虚构的图片摘要，只用于填充 lineup_images 表。
+    约 80% 的点位标注了站位和落点坐标，坐标用单独的随机数生成器，不影响其余字段
+    """
+    rng = random.Random(seed)
+    positionRng = random.Random(seed + 1)
+    maps = [m.name for m in catalog().maps]
+    heroes = [h.name for h in catalog().heroes]
+    sides = list(SIDES)
+
+    for _ in range(count):
+        images = {}
+        for kind in rng.sample(list(IMAGE_KINDS), rng.randint(1, 3)):
+            images[kind] = ["%064x" % rng.getrandbits(256)]
+
+        lineup = Lineup(
+            map=rng.choice(maps),
+            hero=rng.choice(heroes),
+            skill=rng.choice(SKILL_SLOTS),
+            side=rng.choice(sides),
+            stand=_text(rng, 1, 3),
+            stand_detail=_text(rng, 0, 6),
+            aim=_text(rng, 1, 3),
+            aim_detail=_text(rng, 0, 6),
+            land=_text(rng, 1, 3),
+            land_detail=_text(rng, 0, 6),
+            note=_text(rng, 0, 10),
+            images=images,
+        )
+        if positionRng.random() < 0.8:
+            stand = (positionRng.uniform(0.05, 0.95), positionRng.uniform(0.05, 0.95))
+            land = tuple(min(max(v + positionRng.gauss(0, 0.15), 0.0), 1.0) for v in stand)
+            lineup.set_position("stand", stand)
+            lineup.set_position("land", land)
+
+        yield lineup
+
+
+def queryWords(count: int, seed: int = 1) -> List[str]:
+    """搜索基准使用的查询词"""
+    rng = random.Random(seed)
+    return [rng.choice(WORDS) + (rng.choice(WORDS) if rng.random() < 0.3 else "") for _ in range(count)]
+
+
+def writeScreenshot(path: str, width: int = 2560, height: int = 1440, seed: int = 0):
+    """
+    画一张接近游戏截图复杂度的大图：渐变背景加大量随机图形，PNG 不容易压缩
+
+    需要已经创建 QApplication（QPainter 绘制文字和抗锯齿需要）
+    """
+    from PyQt5.QtCore import QPointF, QRectF
+    from PyQt5.QtGui import QColor, QImage, QLinearGradient, QPainter
+
+    rng = random.Random(seed)
+    image = QImage(width, height, QImage.Format_RGB32)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+
+    gradient = QLinearGradient(QPointF(0, 0), QPointF(width, height))
+    gradient.setColorAt(0, QColor(40, 60, 90))
+    gradient.setColorAt(1, QColor(200, 160, 120))
+    painter.fillRect(image.rect(), gradient)
+
+    for _ in range(3000):
+        painter.setPen(QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256), 160))
+        painter.setBrush(QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256), 90))
+        painter.drawEllipse(QRectF(rng.uniform(0, width), rng.uniform(0, height),
+                                   rng.uniform(4, 160), rng.uniform(4, 160)))
+
+    painter.end()
+    if not image.save(path):
+        raise OSError(f"无法写入截图: {path}")
+
+
+def writeHudScreenshot(path: str, mapKey: str, hero: str, width: int = 2560, height: int = 1440, seed: int = 0):
+    """
+    画一张带技能栏的游戏截图：地图封面作为场景，底部中间按游戏界面的位置画出英雄的四个技能图标和按键
+
+    需要已经创建 QApplication
+    """
+    from PyQt5.QtCore import QRectF, Qt
+    from PyQt5.QtGui import QColor, QFont, QImage, QPainter
+
+    from common.catalog import SKILL_SLOTS, catalog
+    from common.config import resource_path
+
+    rng = random.Random(seed)
+    c = catalog()
+    image = QImage(resource_path(c.map(mapKey).cover)).scaled(
+        width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation).convertToFormat(QImage.Format_RGB32)
+
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setRenderHint(QPainter.SmoothPixmapTransform)
+    for _ in range(40):
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256), 60))
+        painter.drawEllipse(QRectF(rng.uniform(0, width), rng.uniform(0, height * 0.8),
+                                   rng.uniform(20, 300), rng.uniform(20, 300)))
+
+    # 技能栏：半透明暗色底，四个图标等距排列
+    size = height * rng.uniform(0.035, 0.045)
+    spacing = size * 1.6
+    left = width / 2 - spacing * 1.5 - size / 2 + rng.uniform(-0.02, 0.02) * width
+    top = height * rng.uniform(0.895, 0.91)
+    painter.fillRect(QRectF(left - size, top - size * 0.4, spacing * 3 + size * 3, size * 2.4),
+                     QColor(10, 12, 16, 150))
+
+    font = QFont()
+    font.setPixelSize(int(size * 0.3))
+    painter.setFont(font)
+    painter.setPen(QColor(200, 200, 200))
+    skills = c.hero(hero).skills
+    for i, slot in enumerate(SKILL_SLOTS):
+        rect = QRectF(left + i * spacing, top, size, size)
+        painter.drawImage(rect, QImage(resource_path(skills[slot])))
+        painter.drawText(QRectF(rect.left(), rect.bottom() + size * 0.25, size, size * 0.4),
+                         Qt.AlignCenter, slot.upper())
+
+    painter.end()
+    if not image.save(path, quality=85):
+        raise OSError(f"无法写入截图: {path}")
+
+
+def _gifImageData(pixels: bytes) -> bytes:
+    """
+    把 8 位调色板索引编码为 GIF 图像数据
+
+    不做真正的压缩：每个像素输出一个 9 位字面量，在编码表增长到 10 位之前插入清除码，
+    解码器看到的是合法的 LZW 数据流
+    """
+    clear, end = 256, 257
+    codes = []
+    for start in range(0, len(pixels), 250):
+        codes.append(clear)
+        codes.extend(pixels[start:start + 250])
+    codes.append(end)
+    codes.extend([0] * (-len(codes) % 8))
+
+    # 8 个 9 位编码正好 9 个字节
+    packed = bytearray()
+    for i in range(0, len(codes), 8):
+        value = 0
+        for j in range(8):
+            value |= codes[i + j] << (9 * j)
+        packed += value.to_bytes(9, "little")
+
+    data = bytearray([8])
+    for start in range(0, len(packed), 255):
+        block = packed[start:start + 255]
+        data.append(len(block))
+        data += block
+    data.append(0)
+    return bytes(data)
+
+
+def writeAnimation(path: str, width: int = 320, height: int = 180, frames: int = 24, delay: int = 40,
+                   seed: int = 0):
+    """
+    写一个循环播放的 GIF 动图：色块在渐变条纹背景上移动，模拟一段点位演示短片
+
+    参数:
+        frames (int): 帧数
+        delay (int): 每帧显示的毫秒数（GIF 以 10 毫秒为单位）
+    """
+    rng = random.Random(seed)
+    # 调色板：6x6x6 颜色立方体加灰阶
+    palette = bytearray()
+    for r in range(6):
+        for g in range(6):
+            for b in range(6):
+                palette += bytes((r * 51, g * 51, b * 51))
+    for i in range(40):
+        palette += bytes((i * 6,) * 3)
+
+    background = bytearray()
+    for y in range(height):
+        background += bytes([(y * 216 // height + x // 16) % 216 for x in range(width)])
+
+    out = bytearray(b"GIF89a")
+    out += struct.pack("<HHBBB", width, height, 0xF7, 0, 0)
+    out += palette
+    out += b"\x21\xFF\x0BNETSCAPE2.0\x03\x01\x00\x00\x00"
+
+    size = max(8, min(width, height) // 4)
+    color = rng.randrange(216)
+    x, y = rng.randrange(width - size), rng.randrange(height - size)
+    dx, dy = rng.choice((-6, 6)), rng.choice((-4, 4))
+    for _ in range(frames):
+        pixels = bytearray(background)
+        for row in range(y, y + size):
+            pixels[row * width + x:row * width + x + size] = bytes([color]) * size
+
+        out += b"\x21\xF9\x04\x00" + struct.pack("<H", max(1, delay // 10)) + b"\x00\x00"
+        out += b"\x2C" + struct.pack("<HHHHB", 0, 0, width, height, 0)
+        out += _gifImageData(bytes(pixels))
+
+        if not 0 <= x + dx <= width - size:
+            dx = -dx
+        if not 0 <= y + dy <= height - size:
+            dy = -dy
+        x, y = x + dx, y + dy
+
+    out += b"\x3B"
+    with open(path, "wb") as f:
+        f.write(out)
@@ -0,0 +1,912 @@
+# coding:utf-8
+"""
+基准测试套件
+
+在无显示器的 Linux 上用 offscreen 平台运行，测量启动、页面构造、图片加载、上传图片处理、截图识别、悬停重绘、
+向导预取、动图短片播放、快速输入时的草稿保存，以及不同数据量下点位保存、查询、索引、搜索、结果页显示、相似截图查找、
+地图位置查询和增量同步的耗时。所有数据都写在临时目录，不会读写 data/ 下的真实数据库、草稿和 cache/ 下的缩略图缓存。
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/run_benchmarks.py
+    QT_QPA_PLATFORM=offscreen python benchmarks/run_benchmarks.py --quick --compare old.json
+
+结果写入 bench_output.txt（可读的表格）和 bench_output.json（用于对比）。
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QEvent, QPoint, Qt
+from PyQt5.QtGui import QMouseEvent
+from PyQt5.QtWidgets import QApplication
+
+import common.catalog as catalog_module
+import common.draft_journal as draft_journal_module
+import common.lineup_store as lineup_store_module
+import common.screen_recognition as screen_recognition_module
+from benchmarks.bench_hover import measure as measureHover
+from benchmarks.datasets import queryWords, syntheticLineups, writeAnimation, writeHudScreenshot, writeScreenshot
+from common.catalog import SKILL_SLOTS, catalog
+from common.draft_journal import DraftJournal, readDraft
+from common.image_similarity import NEAR_DISTANCE, HashIndex
+from common.lineup_index import LineupIndex
+from common.lineup_search import LineupSearch
+from common.lineup_spatial import LineupSpatialIndex
+from common.lineup_store import SIDES, LineupStore
+from common.lineup_sync import SyncServer, syncWith
+from common.pixmap_cache import pixmapCache
+from common.thumbnail_cache import thumbnailCache
+
+RESULT_VERSION = 1
+DEFAULT_SIZES = (1000, 10000, 100000)
+QUICK_SIZES = (1000, 10000)
+
+
+class Suite:
+    """收集各项测试的耗时样本"""
+
+    def __init__(self, app: QApplication, workDir: str, quick: bool = False):
+        self.app = app
+        self.workDir = workDir
+        self.quick = quick
+        self.results = []   # type: List[dict]
+
+    def record(self, name: str, samples: List[float], **extra):
+        """记录一项结果，samples 的单位是毫秒"""
+        ordered = sorted(samples)
+        result = {
+            "name": name,
+            "samples": len(samples),
+            "mean_ms": round(statistics.mean(samples), 4),
+            "median_ms": round(statistics.median(samples), 4),
+            "p95_ms": round(ordered[math.ceil(0.95 * len(ordered)) - 1], 4),
+            "min_ms": round(ordered[0], 4),
+        }
+        result.update(extra)
+        self.results.append(result)
+        print(formatResult(result), flush=True)
+
+    def time(self, name: str, fn: Callable[[], object], repeat: int, warmup: int = 1, **extra):
+        """重复调用 fn 并记录每次的耗时"""
+        for _ in range(warmup):
+            fn()
+
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+
+        self.record(name, samples, **extra)
+
+    def pump(self, seconds: float = 0.0):
+        """处理事件（包括 deleteLater 的延迟删除），可选地等待一段时间让后台任务完成"""
+        deadline = time.perf_counter() + seconds
+        while True:
+            self.app.processEvents()
+            self.app.sendPostedEvents(None, QEvent.DeferredDelete)
+            if time.perf_counter() >= deadline:
+                return
+            time.sleep(0.002)
+
+    def waitFor(self, condition: Callable[[], bool], timeout: float = 10.0):
+        deadline = time.perf_counter() + timeout
+        while not condition():
+            if time.perf_counter() > deadline:
+                raise TimeoutError("等待超时")
+            self.app.processEvents()
+            time.sleep(0.0005)
+
+
+def formatResult(result: dict) -> str:
+    return (f"{result['name']:<36} n={result['samples']:<5} mean={result['mean_ms']:10.3f} ms  "
+            f"median={result['median_ms']:10.3f} ms  p95={result['p95_ms']:10.3f} ms")
+
+
+def sizeLabel(size: int) -> str:
+    return f"{size // 1000}k" if size >= 1000 else str(size)
+
+
+# --- 界面 ---
+
+def benchWindow(suite: Suite):
+    """主窗口构造并显示第一帧"""
+    import valorant
+
+    def run():
+        window = valorant.Window(prewarm=False)
+        window.show()
+        suite.app.processEvents()
+        window.close()
+        window.deleteLater()
+
+    suite.time("window.construct_and_show", run, repeat=3 if suite.quick else 10)
+    suite.pump()
+
+
+def benchPages(suite: Suite):
+    """地图选择页和新增点位页的构造"""
+    from components.queryPageSub.map_select import MapSelect
+    from components.upload import AddPointPage
+
+    widgets = []
+    repeat = 5 if suite.quick else 20
+    suite.time("map_select.construct", lambda: widgets.append(MapSelect()), repeat)
+    suite.time("add_point_page.construct", lambda: widgets.append(AddPointPage()), repeat)
+    for widget in widgets:
+        widget.deleteLater()
+    suite.pump()
+
+
+def benchLoadImage(suite: Suite):
+    """ImageDisplayCard 加载大截图：冷启动（解码并生成缩略图）、磁盘缩略图命中、内存缓存命中"""
+    from components.upload import ImageDisplayCard
+
+    count = 3 if suite.quick else 8
+    shotDir = os.path.join(suite.workDir, "screenshots")
+    os.makedirs(shotDir)
+    paths = []
+    for i in range(count):
+        path = os.path.join(shotDir, f"shot{i}.png")
+        writeScreenshot(path, seed=i)
+        paths.append(path)
+
+    def load(path: str) -> float:
+        start = time.perf_counter()
+        card = ImageDisplayCard(path)
+        suite.waitFor(lambda: card.pixmap is not None or card.load_failed)
+        elapsed = (time.perf_counter() - start) * 1000
+        card.deleteLater()
+        return elapsed
+
+    # 截图都是新生成的，第一次加载时缩略图目录中没有它们
+    pixmapCache.clear()
+    cold = [load(path) for path in paths]
+
+    pixmapCache.clear()
+    disk = [load(path) for path in paths]
+
+    memory = [load(path) for path in paths]
+
+    size = os.path.getsize(paths[0])
+    suite.record("load_image.2560x1440.cold", cold, file_bytes=size)
+    suite.record("load_image.2560x1440.thumbnail_hit", disk)
+    suite.record("load_image.2560x1440.pixmap_hit", memory)
+    suite.pump()
+
+
+def benchIngest(suite: Suite):
+    """上传截图的处理：单张处理耗时、多张同时上传时的总耗时和界面最长卡顿、处理后缩略图的冷加载"""
+    from common.image_ingest import THUMB, discardImage, ingestFile
+    from common.image_ingestor import imageIngestor
+    from common.lineup_store import lineupStore
+    from components.upload import ImageDisplayCard, ImageUploadSection
+
+    count = 4 if suite.quick else 8
+    shotDir = os.path.join(suite.workDir, "uploads")
+    os.makedirs(shotDir)
+    paths = []
+    for i in range(count):
+        path = os.path.join(shotDir, f"shot{i}.png")
+        writeScreenshot(path, seed=100 + i)
+        paths.append(path)
+
+    blobs = lineupStore().blobs
+    images = []
+    suite.time("ingest.file.2560x1440", lambda: images.append(ingestFile(paths[0], blobs.tmpDir())),
+               repeat=2 if suite.quick else 5)
+    for image in images:
+        discardImage(image)
+
+    section = ImageUploadSection("bench")
+
+    def upload() -> List[float]:
+        """同时上传所有截图，返回 (总耗时, 事件循环最长间隔)"""
+        section.clear()
+        suite.pump()
+        start = last = time.perf_counter()
+        for path in paths:
+            section.add_image(path)
+
+        stall = 0.0
+        while section.pending_count():
+            suite.app.processEvents()
+            now = time.perf_counter()
+            stall, last = max(stall, now - last), now
+            time.sleep(0.0005)
+
+        return [(time.perf_counter() - start) * 1000, stall * 1000]
+
+    # 第一次上传包含工作进程的启动
+    upload()
+    runs = [upload() for _ in range(2 if suite.quick else 5)]
+    suite.record(f"ingest.upload{count}.total", [r[0] for r in runs], workers=imageIngestor.workers)
+    suite.record(f"ingest.upload{count}.ui_stall", [r[1] for r in runs])
+
+    # 浏览时加载处理后的缩略图，对比 load_image.2560x1440.cold 直接解码原图
+    pixmapCache.clear()
+    samples = []
+    for digest in section.images():
+        start = time.perf_counter()
+        card = ImageDisplayCard(blobs.imagePath(digest, THUMB), digest=digest)
+        suite.waitFor(lambda: card.pixmap is not None or card.load_failed)
+        samples.append((time.perf_counter() - start) * 1000)
+        card.deleteLater()
+
+    suite.record("load_image.thumb_variant.cold", samples)
+    section.clear()
+    section.deleteLater()
+    suite.pump()
+
+
+def benchRecognize(suite: Suite):
+    """截图识别：模板索引的构建和读取缓存，1440p 截图的识别（含解码）"""
+    from common.screen_recognition import loadIndex, recognizeFile
+
+    cachePath = os.path.join(suite.workDir, "recognition.pickle")
+    suite.time("recognize.build_index", lambda: loadIndex(None), repeat=1 if suite.quick else 3, warmup=0)
+    loadIndex(cachePath)
+    suite.time("recognize.load_index", lambda: loadIndex(cachePath), repeat=20)
+
+    rng = random.Random(21)
+    c = catalog()
+    screenshots = []
+    for i in range(10 if suite.quick else 30):
+        path = os.path.join(suite.workDir, f"hud-{i}.jpg")
+        expected = (rng.choice(c.maps).name, rng.choice(c.heroes).name)
+        writeHudScreenshot(path, *expected, seed=i)
+        screenshots.append((path, expected))
+
+    correct, samples = 0, []
+    for path, expected in screenshots:
+        start = time.perf_counter()
+        result = recognizeFile(path)
+        samples.append((time.perf_counter() - start) * 1000)
+        correct += (result.map, result.hero) == expected
+
+    suite.record("recognize.screenshot_1440p", samples, correct=correct, total=len(screenshots))
+
+
+def benchHover(suite: Suite):
+    """地图卡片悬停重绘"""
+    from components.queryPageSub.map_select import MapSelect
+
+    page = MapSelect()
+    samples = measureHover(suite.app, page, rounds=5 if suite.quick else 20)
+    suite.record("map_card.hover", samples)
+    page.deleteLater()
+    suite.pump()
+
+
+def benchPrefetch(suite: Suite):
+    """
+    查询向导的预取：点击地图卡片后，下一步的英雄立绘和结果第一页缩略图全部就绪的耗时，
+    对比点击前没有悬停（cold）和先悬停 400 ms、1000 ms；以及悬停预取期间界面的最长卡顿
+    """
+    from PyQt5.QtCore import QEvent
+
+    from common.image_ingest import THUMB, ingestFile, storeImage
+    from common.lineup_store import lineupStore
+    from common.pixmap_cache import imageKey
+    from common.prefetch import RESULT_PAGE_SIZE, RESULT_THUMB_SIZE, prefetcher
+    from components.queryPage import QueryPage
+    from components.queryPageSub.hero_select import AVATAR_SIZE
+
+    # 结果第一页的点位，每个点位带一张处理过的截图
+    store = lineupStore()
+    mapKey = catalog().maps[-1].name
+    shotDir = os.path.join(suite.workDir, "prefetch")
+    os.makedirs(shotDir)
+    lineups = []
+    for i, lineup in enumerate(syntheticLineups(RESULT_PAGE_SIZE, seed=22)):
+        path = os.path.join(shotDir, f"shot{i}.png")
+        writeScreenshot(path, 1280, 720, seed=200 + i)
+        image = ingestFile(path, store.blobs.tmpDir())
+        storeImage(store.blobs, image)
+        lineup.map, lineup.images = mapKey, {"stand": [image.digest]}
+        lineups.append(lineup)
+    store.add_many(lineups)
+
+    def readyKeys(page: QueryPage) -> List[tuple]:
+        dpr = page.devicePixelRatioF()
+        keys = [imageKey(hero.avatar, AVATAR_SIZE, dpr) for hero in catalog().heroes]
+        for lineup in store.query(limit=RESULT_PAGE_SIZE, map=mapKey):
+            digest = lineup.cover_image()
+            if digest is not None and store.blobs.exists(digest):
+                keys.append(imageKey(store.blobs.imagePath(digest, THUMB), RESULT_THUMB_SIZE, dpr))
+        return keys
+
+    def run(hover: float) -> List[float]:
+        """先悬停 hover 秒再点击，返回 (点击到下一步就绪的耗时, 悬停期间事件循环最长间隔)"""
+        # 每轮都从空的缩略图目录开始（目录在临时目录中，见 useTemporaryStore）
+        shutil.rmtree(thumbnailCache.cacheDir, ignore_errors=True)
+        pixmapCache.clear()
+        page = QueryPage()
+        page.resize(1200, 800)
+        page.show()
+        suite.pump()
+        prefetcher.cancel()
+        card = next(c for c in page.mapSelect.map_cards if c.key == mapKey)
+        keys = readyKeys(page)
+
+        stall = 0.0
+        if hover:
+            QApplication.sendEvent(card, QEvent(QEvent.Enter))
+            start = last = time.perf_counter()
+            while time.perf_counter() - start < hover:
+                suite.app.processEvents()
+                now = time.perf_counter()
+                stall, last = max(stall, now - last), now
+                time.sleep(0.0005)
+
+        start = time.perf_counter()
+        page.mapSelect.mapSelected.emit(mapKey)
+        suite.waitFor(lambda: all(key in pixmapCache for key in keys), timeout=30)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        page.close()
+        page.deleteLater()
+        suite.pump()
+        return [elapsed, stall * 1000]
+
+    rounds = 2 if suite.quick else 5
+    results = {hover: [run(hover) for _ in range(rounds)] for hover in (0, 0.4, 1.0)}
+
+    suite.record("prefetch.click_to_ready.cold", [r[0] for r in results[0]])
+    for hover in (0.4, 1.0):
+        suite.record(f"prefetch.click_to_ready.hover{int(hover * 1000)}", [r[0] for r in results[hover]])
+    suite.record("prefetch.hover.ui_stall", [r[1] for r in results[0.4] + results[1.0]])
+
+
+def benchClips(suite: Suite):
+    """
+    动图短片：GIF 上传处理耗时；结果页满屏短片时第一帧出现的耗时，
+    以及持续播放时每秒占用的 CPU 时间、实际帧率、解码帧数和帧缓存大小
+    """
+    import common.lineup_index as lineup_index_module
+    from common.clip_player import clipAnimator, frameCache
+    from common.image_ingest import ingestFile, storeImage
+    from components.queryPageSub.lineup_result import LineupResult
+
+    directory = os.path.join(suite.workDir, "clips")
+    store = LineupStore(os.path.join(directory, "lineups.db"), os.path.join(directory, "blobs"))
+    count = 8 if suite.quick else 20
+
+    # 每个点位一段不同的动图，48 帧、14 fps，满屏短片的帧总量超过帧缓存容量
+    lineups, ingest = [], []
+    for i, lineup in enumerate(syntheticLineups(count, seed=24)):
+        path = os.path.join(directory, f"clip{i}.gif")
+        writeAnimation(path, frames=48, delay=70, seed=i)
+        start = time.perf_counter()
+        image = ingestFile(path, store.blobs.tmpDir())
+        ingest.append((time.perf_counter() - start) * 1000)
+        storeImage(store.blobs, image)
+        lineup.map, lineup.images = "Ascent", {"stand": [image.digest]}
+        lineups.append(lineup)
+    store.add_many(lineups)
+    suite.record("clips.ingest_gif_320x180x48", ingest, file_bytes=os.path.getsize(path))
+
+    oldStore, oldIndex = lineup_store_module._store, lineup_index_module._index
+    lineup_store_module._store = store
+    lineup_index_module._index = LineupIndex.fromStore(store)
+    frameCache.clear()
+    page = LineupResult()
+    page.resize(1200, 800)
+    page.setFilters({"map": "Ascent"})
+
+    try:
+        start = time.perf_counter()
+        page.show()
+        suite.waitFor(lambda: page.view.playbacks and all(
+            p.pixmap is not None for p in page.view.playbacks.values()))
+        suite.record("clips.first_frames", [(time.perf_counter() - start) * 1000],
+                     visible_clips=len(page.view.playbacks))
+
+        # 先播放一秒填充帧缓存，再逐秒统计
+        suite.pump(1.0)
+        samples = []
+        shown, decoded = clipAnimator.shownFrames, clipAnimator.decodedFrames
+        for _ in range(3 if suite.quick else 8):
+            cpu = time.process_time()
+            suite.pump(1.0)
+            samples.append((time.process_time() - cpu) * 1000)
+        seconds = len(samples)
+        suite.record("clips.grid_playback.cpu_ms_per_s", samples,
+                     visible_clips=len(clipAnimator.playbacks),
+                     fps_per_clip=round((clipAnimator.shownFrames - shown) / seconds / len(clipAnimator.playbacks), 2),
+                     decoded_per_s=round((clipAnimator.decodedFrames - decoded) / seconds, 1),
+                     frame_cache_bytes=frameCache.totalBytes)
+    finally:
+        page.close()
+        page.deleteLater()
+        suite.pump()
+        lineup_store_module._store, lineup_index_module._index = oldStore, oldIndex
+        store.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def benchDraft(suite: Suite):
+    """
+    新增点位页快速输入时的草稿保存：每次自动保存在界面线程上的耗时、超过一帧（16 毫秒）的次数，
+    以及作为对比的在界面线程上直接追加并 fsync 同样内容的耗时
+    """
+    from PyQt5.QtTest import QTest
+    from components.upload import AddPointPage
+
+    directory = os.path.join(suite.workDir, "draft")
+    # 较小的整理阈值，测试期间会发生多次整理
+    journal = DraftJournal(os.path.join(directory, "draft.jsonl"), compactBytes=256)
+    oldJournal, draft_journal_module._journal = draft_journal_module._journal, journal
+
+    page = AddPointPage()
+    page.show()
+    suite.pump()
+
+    autosaves = []
+
+    def timedSave(save=page.save_draft):
+        start = time.perf_counter()
+        save()
+        autosaves.append((time.perf_counter() - start) * 1000)
+
+    page.draft_timer.timeout.disconnect()
+    page.draft_timer.timeout.connect(timedSave)
+
+    # 每段以每秒 100 个字符连续输入 40 个字符，然后停顿 0.6 秒，停顿时触发自动保存
+    fields = [page.position_input, page.point_input, page.drop_detail_input, page.note_text]
+    # QTest 只能模拟 ASCII 按键
+    rng = random.Random(25)
+    keys, keystrokes = 0, []
+    try:
+        for burst in range(6 if suite.quick else 20):
+            widget = fields[burst % len(fields)]
+            for char in rng.choices("abcdefghijklmnopqrstuvwxyz     ", k=40):
+                start = time.perf_counter()
+                QTest.keyClick(widget, char)
+                keystrokes.append((time.perf_counter() - start) * 1000)
+                keys += 1
+                suite.pump(0.01)
+            suite.pump(0.6)
+
+        expected = {field: page.draft_value(field) for field in ("stand", "aim", "land_detail", "note")}
+        page.close_draft()
+        restored = readDraft(journal.path)
+        suite.record("draft.typing.autosave_ms", autosaves, keys=keys,
+                     stalls_over_16ms=sum(ms > 16 for ms in autosaves),
+                     journal_writes=journal.writes, compactions=journal.compactions,
+                     journal_bytes=os.path.getsize(journal.path),
+                     restored=all(restored.get(f) == v for f, v in expected.items()))
+        suite.record("draft.typing.keystroke_ms", keystrokes,
+                     stalls_over_16ms=sum(ms > 16 for ms in keystrokes))
+
+        # 对比：在界面线程上同步写入每次自动保存的补丁
+        syncPath = os.path.join(directory, "sync.jsonl")
+        line = json.dumps(expected, ensure_ascii=False) + "\n"
+
+        def appendSync():
+            with open(syncPath, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+        suite.time("draft.sync_append_fsync_ms", appendSync, repeat=len(autosaves))
+    finally:
+        page.close()
+        page.deleteLater()
+        suite.pump()
+        journal.close()
+        draft_journal_module._journal = oldJournal
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def benchMapView(suite: Suite, markers: int = 500):
+    """地图视图：markers 个点位的站位和落点标记的整体重绘、悬停命中检测与局部重绘"""
+    from components.map_canvas import LineupMapView
+
+    mapKey = catalog().maps[0].name
+    spatial = LineupSpatialIndex()
+    for i, lineup in enumerate(l for l in syntheticLineups(markers * 2) if l.position("stand")):
+        if i == markers:
+            break
+        spatial.add(i + 1, mapKey, lineup.position("stand"), lineup.position("land"))
+
+    view = LineupMapView()
+    view.resize(1000, 563)
+    view.setMap(mapKey)
+    view.setMarkers(spatial.grid(mapKey, "stand"), spatial.grid(mapKey, "land"))
+    view.show()
+    suite.waitFor(lambda: view.cover is not None)
+    suite.pump()
+
+    repeat = 20 if suite.quick else 100
+    suite.time(f"map_view.paint[{markers}]", view.repaint, repeat, markers=view.markerCount())
+
+    # 鼠标依次移到各个标记上再移开，每次处理移动事件并完成局部重绘
+    rng = random.Random(markers)
+    targets = [view.toWidget(p).toPoint() for _, p in rng.sample(list(spatial.grid(mapKey, "land").items()), 50)]
+    targets += [QPoint(rng.randrange(view.width()), rng.randrange(view.height())) for _ in range(50)]
+    moves = iter(targets * (repeat // 10 + 1))
+
+    def move():
+        event = QMouseEvent(QEvent.MouseMove, next(moves), Qt.NoButton, Qt.NoButton, Qt.NoModifier)
+        suite.app.sendEvent(view, event)
+        suite.app.processEvents()
+
+    suite.time(f"map_view.hover[{markers}]", move, repeat * 10)
+    view.deleteLater()
+    suite.pump()
+
+
+def benchSpatial(suite: Suite, size: int):
+    """size 个点位的空间索引：构建、按半径查找落点、框选站位"""
+    label = sizeLabel(size)
+    lineups = [(i + 1, l) for i, l in enumerate(syntheticLineups(size, seed=size))]
+    spatial = None
+
+    def build():
+        nonlocal spatial
+        spatial = LineupSpatialIndex()
+        for lineupId, lineup in lineups:
+            spatial.add(lineupId, lineup.map, lineup.position("stand"), lineup.position("land"))
+
+    suite.time(f"spatial.build[{label}]", build, repeat=3, warmup=0)
+
+    rng = random.Random(size)
+    maps = [m.name for m in catalog().maps]
+    repeat = 200 if suite.quick else 1000
+
+    def within():
+        return spatial.grid(rng.choice(maps), "land").within(rng.random(), rng.random(), 0.04)
+
+    def inRect():
+        x, y = rng.uniform(0, 0.8), rng.uniform(0, 0.8)
+        return spatial.grid(rng.choice(maps), "stand").inRect(x, y, x + 0.2, y + 0.2)
+
+    suite.time(f"spatial.within[{label}]", within, repeat, radius=0.04)
+    suite.time(f"spatial.in_rect[{label}]", inRect, repeat, rect=0.2)
+
+
+# --- 数据 ---
+
+def benchStore(suite: Suite, size: int):
+    """size 个点位的保存、查询、索引与搜索"""
+    label = sizeLabel(size)
+    directory = os.path.join(suite.workDir, f"store-{label}")
+    store = LineupStore(os.path.join(directory, "lineups.db"), os.path.join(directory, "blobs"))
+    lineups = list(syntheticLineups(size, seed=size))
+
+    start = time.perf_counter()
+    store.add_many(lineups)
+    elapsed = (time.perf_counter() - start) * 1000
+    suite.record(f"store.add_many[{label}]", [elapsed], per_lineup_us=round(elapsed * 1000 / size, 3))
+
+    extra = iter(syntheticLineups(1000, seed=-size))
+    suite.time(f"store.add_single[{label}]", lambda: store.add(next(extra)), repeat=50 if suite.quick else 200)
+
+    rng = random.Random(size)
+    maps = [m.name for m in catalog().maps]
+    heroes = [h.name for h in catalog().heroes]
+
+    def randomFilters():
+        return {"map": rng.choice(maps), "hero": rng.choice(heroes),
+                "skill": rng.choice(SKILL_SLOTS), "side": rng.choice(list(SIDES))}
+
+    repeat = 50 if suite.quick else 200
+    suite.time(f"store.query_map_hero[{label}]",
+               lambda: store.query(map=rng.choice(maps), hero=rng.choice(heroes)), repeat)
+    suite.time(f"store.query_all_facets[{label}]", lambda: store.query(**randomFilters()), repeat)
+    perMap = size // len(maps)
+    suite.time(f"store.query_page50[{label}]",
+               lambda: store.query(limit=50, offset=rng.randrange(max(1, perMap - 50)), map=rng.choice(maps)), repeat)
+    suite.time(f"store.count_map[{label}]", lambda: store.count(map=rng.choice(maps)), repeat)
+
+    ids = list(range(1, size + 1))
+    suite.time(f"store.get_many500[{label}]", lambda: store.get_many(rng.sample(ids, 500)), repeat=20)
+
+    # 分面索引
+    index = None
+
+    def buildIndex():
+        nonlocal index
+        index = LineupIndex.fromStore(store)
+
+    suite.time(f"index.build[{label}]", buildIndex, repeat=3, warmup=0)
+    suite.time(f"index.match_all_facets[{label}]", lambda: index.ids(**randomFilters()), repeat)
+    suite.time(f"index.counts_hero[{label}]", lambda: index.counts("hero", map=rng.choice(maps)), repeat)
+
+    # 全文搜索
+    search = None
+
+    def buildSearch():
+        nonlocal search
+        search = LineupSearch.fromStore(store)
+
+    suite.time(f"search.build[{label}]", buildSearch, repeat=1, warmup=0)
+    words = iter(queryWords(10 * repeat))
+    suite.time(f"search.query[{label}]", lambda: search.search(next(words)), repeat)
+
+    store.close()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def benchResults(suite: Suite, size: int):
+    """size 个点位的结果页：筛选后第一屏显示的耗时（含读取第一页和绘制），以及向下滚动一屏的耗时"""
+    import common.lineup_index as lineup_index_module
+    from components.queryPageSub.lineup_result import LineupResult
+
+    label = sizeLabel(size)
+    directory = os.path.join(suite.workDir, f"results-{label}")
+    store = LineupStore(os.path.join(directory, "lineups.db"), os.path.join(directory, "blobs"))
+    store.add_many(syntheticLineups(size, seed=size))
+
+    # 结果页通过 lineupStore()/lineupIndex() 读取点位，测试期间指向这个数据库
+    oldStore, oldIndex = lineup_store_module._store, lineup_index_module._index
+    lineup_store_module._store = store
+    lineup_index_module._index = LineupIndex.fromStore(store)
+    page = LineupResult()
+    page.resize(1200, 800)
+    page.show()
+    suite.pump()
+
+    rng = random.Random(size)
+    maps = [m.name for m in catalog().maps]
+    repeat = 10 if suite.quick else 30
+
+    def firstScreen(filters: dict) -> float:
+        start = time.perf_counter()
+        page.setFilters(filters)
+        while not page.model.rowCount():
+            suite.app.processEvents()
+        page.view.viewport().repaint()
+        return (time.perf_counter() - start) * 1000
+
+    try:
+        for name, filters in (("all", lambda: {}), ("map", lambda: {"map": rng.choice(maps)})):
+            samples = [firstScreen(filters()) for _ in range(repeat)]
+            suite.record(f"results.first_screen_{name}[{label}]", samples,
+                         total=page.model.total, rows_loaded=page.model.rowCount())
+
+        page.setFilters({})
+        suite.pump()
+        bar = page.view.verticalScrollBar()
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            bar.setValue(bar.value() + page.view.viewport().height())
+            suite.app.processEvents()
+            page.view.viewport().repaint()
+            samples.append((time.perf_counter() - start) * 1000)
+        suite.record(f"results.scroll_screen[{label}]", samples, rows_loaded=page.model.rowCount())
+    finally:
+        page.close()
+        page.deleteLater()
+        suite.pump()
+        lineup_store_module._store, lineup_index_module._index = oldStore, oldIndex
+        store.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def benchSimilar(suite: Suite, size: int):
+    """size 张图片的感知哈希索引：构建、近似查找（一半查询有相近的哈希）"""
+    label = sizeLabel(size)
+    rng = random.Random(size)
+    hashes = [rng.getrandbits(64) for _ in range(size)]
+
+    index = None
+
+    def build():
+        nonlocal index
+        index = HashIndex()
+        for i, dhash in enumerate(hashes):
+            index.add(f"{i:064x}", dhash)
+
+    suite.time(f"similar.build[{label}]", build, repeat=3, warmup=0)
+
+    def nearQuery() -> int:
+        dhash = rng.choice(hashes)
+        if rng.random() < 0.5:
+            for bit in rng.sample(range(64), rng.randint(1, NEAR_DISTANCE)):
+                dhash ^= 1 << bit
+        else:
+            dhash = rng.getrandbits(64)
+        return dhash
+
+    queries = [nearQuery() for _ in range(2000)]
+    found = iter(queries)
+    suite.time(f"similar.near[{label}]", lambda: index.near(next(found)), repeat=1000,
+               max_distance=NEAR_DISTANCE)
+
+
+def benchSync(suite: Suite, size: int):
+    """
+    两台机器各 size 个点位的增量同步：第一次同步交换全部点位，之后一方修改几个点位再同步，
+    记录耗时和传输的字节数。虚构的图片摘要没有对应的文件，同步前清空
+    """
+    label = sizeLabel(size)
+    directory = os.path.join(suite.workDir, f"sync-{label}")
+
+    def openStore(name: str) -> LineupStore:
+        return LineupStore(os.path.join(directory, name, "lineups.db"), os.path.join(directory, name, "blobs"))
+
+    def lineups(count: int, seed: int):
+        for lineup in syntheticLineups(count, seed=seed):
+            lineup.images = {}
+            yield lineup
+
+    local = openStore("local")
+    local.add_many(lineups(size, seed=size))
+    remote = openStore("remote")
+    remote.add_many(lineups(size, seed=-size))
+    remote.close()
+
+    ready = threading.Event()
+    servers = []
+
+    def serve():
+        store = openStore("remote")
+        servers.append(SyncServer(store, ("127.0.0.1", 0)))
+        ready.set()
+        servers[0].serve_forever()
+        store.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    ready.wait()
+    url = "http://127.0.0.1:%d" % servers[0].server_address[1]
+
+    def timedSync(name: str):
+        start = time.perf_counter()
+        result = syncWith(local, url)
+        elapsed = (time.perf_counter() - start) * 1000
+        suite.record(name, [elapsed], received=len(result.pulled.added), pushed=result.pushed,
+                     kilobytes=round((result.bytes_received + result.bytes_sent) / 1024, 1))
+
+    try:
+        timedSync(f"sync.initial[{label}]")
+        timedSync(f"sync.noop[{label}]")
+
+        local.add_many(lineups(5, seed=size + 1))
+        local.delete(local.query(limit=1)[0].id)
+        timedSync(f"sync.delta_6[{label}]")
+    finally:
+        servers[0].shutdown()
+        thread.join()
+        local.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def useTemporaryStore(workDir: str):
+    """
+    界面代码通过 lineupStore()、draftJournal() 访问数据库和草稿，通过 thumbnailCache、catalog()、
+    templateIndex() 读写 cache/ 下的缓存，测试期间让它们全部指向临时目录
+    """
+    thumbnailCache.cacheDir = os.path.join(workDir, "thumbnails")
+    catalog_module.CATALOG_CACHE = os.path.join(workDir, "catalog.pickle")
+    screen_recognition_module.RECOGNITION_CACHE = os.path.join(workDir, "recognition.pickle")
+
+    directory = os.path.join(workDir, "ui-store")
+    lineup_store_module._store = LineupStore(os.path.join(directory, "lineups.db"),
+                                             os.path.join(directory, "blobs"))
+    draft_journal_module._journal = DraftJournal(os.path.join(directory, "draft.jsonl"))
+
+
+# --- 输出 ---
+
+def writeOutputs(suite: Suite, textPath: str, jsonPath: str, compare: Dict[str, dict]):
+    report = {
+        "version": RESULT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "qt_platform": os.environ.get("QT_QPA_PLATFORM", ""),
+        "quick": suite.quick,
+        "results": suite.results,
+    }
+    with open(jsonPath, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    lines = [f"# {report['created_at']}  python {report['python']}  {report['platform']}"]
+    for result in suite.results:
+        line = formatResult(result)
+        old = compare.get(result["name"])
+        if old and old["median_ms"] > 0:
+            line += f"  ({result['median_ms'] / old['median_ms']:.2f}x vs baseline)"
+        lines.append(line)
+
+    with open(textPath, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def loadBaseline(path: str) -> Dict[str, dict]:
+    if not path:
+        return {}
+
+    with open(path, encoding="utf-8") as f:
+        return {r["name"]: r for r in json.load(f)["results"]}
+
+
+GROUPS = ("window", "pages", "load_image", "ingest", "recognize", "hover", "prefetch", "clips", "draft", "map_view",
+          "store", "results", "similar", "sync")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="offscreen 基准测试套件")
+    parser.add_argument("--quick", action="store_true", help="减少重复次数，只测 1k 和 10k 数据量")
+    parser.add_argument("--sizes", type=int, nargs="+", help="点位数据量，默认 1000 10000 100000")
+    parser.add_argument("--only", nargs="+", choices=GROUPS, help="只运行指定的测试组")
+    parser.add_argument("--output", default=os.path.join(ROOT, "bench_output.txt"), help="文本结果路径")
+    parser.add_argument("--json", default=os.path.join(ROOT, "bench_output.json"), help="JSON 结果路径")
+    parser.add_argument("--compare", help="上一次的 JSON 结果，在文本结果中显示中位数的变化")
+    args = parser.parse_args()
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    groups = args.only or GROUPS
+    baseline = loadBaseline(args.compare)
+
+    QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
+    QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
+    app = QApplication(sys.argv)
+
+    workDir = tempfile.mkdtemp(prefix="valorant-bench-")
+    try:
+        useTemporaryStore(workDir)
+        suite = Suite(app, workDir, args.quick)
+
+        if "window" in groups:
+            benchWindow(suite)
+        if "pages" in groups:
+            benchPages(suite)
+        if "load_image" in groups:
+            benchLoadImage(suite)
+        if "ingest" in groups:
+            benchIngest(suite)
+        if "recognize" in groups:
+            benchRecognize(suite)
+        if "hover" in groups:
+            benchHover(suite)
+        if "prefetch" in groups:
+            benchPrefetch(suite)
+        if "clips" in groups:
+            benchClips(suite)
+        if "draft" in groups:
+            benchDraft(suite)
+        if "map_view" in groups:
+            benchMapView(suite)
+            for size in sizes:
+                benchSpatial(suite, size)
+        if "store" in groups:
+            for size in sizes:
+                benchStore(suite, size)
+        if "results" in groups:
+            for size in sizes:
+                benchResults(suite, size)
+        if "similar" in groups:
+            for size in sizes:
+                benchSimilar(suite, size)
+        if "sync" in groups:
+            for size in sizes:
+                benchSync(suite, size)
+
+        writeOutputs(suite, args.output, args.json, baseline)
+        print(f"results written to {os.path.relpath(args.output)} and {os.path.relpath(args.json)}")
+    finally:
+        lineup_store_module._store.close()
+        draft_journal_module._journal.close()
+        shutil.rmtree(workDir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+# coding:utf-8
+"""
+内容寻址的图片存储
+
+上传的图片按内容的 SHA-256 摘要保存在 data/blobs/<前两位>/<摘要> 下，
+复制时分块读取并同时计算摘要，不需要把整个文件读进内存。
+相同的截图只保存一份，通过引用计数决定何时删除文件。
+图片的缩小版本和动图的短片版本（见 common.image_ingest）保存在原图旁边的 <摘要>.<版本名> 中，随原图一起删除。
+图片的感知哈希按写入顺序编号，内存中的相似图片索引可以只读取新增的部分。
+"""
+import hashlib
+import os
+import sqlite3
+import uuid
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest   TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    refcount INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS blob_images (
+    digest TEXT PRIMARY KEY,
+    width  INTEGER NOT NULL,
+    height INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS blob_variants (
+    digest  TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    width   INTEGER NOT NULL,
+    height  INTEGER NOT NULL,
+    size    INTEGER NOT NULL,
+    PRIMARY KEY (digest, variant)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS blob_hashes (
+    id     INTEGER PRIMARY KEY AUTOINCREMENT,
+    digest TEXT NOT NULL UNIQUE,
+    dhash  INTEGER NOT NULL     -- 64 位感知哈希，按有符号整数保存
+);
+"""
+
+_HASH_SIGN = 1 << 63
+
+
+class BlobStore:
+    """内容寻址存储，引用计数保存在点位数据库中"""
+
+    def __init__(self, root: str, conn: sqlite3.Connection):
+        """
+        参数:
+            root (str): 存放图片文件的目录
+            conn: 点位数据库连接（自动提交模式）
+        """
+        self.root = root
+        self.conn = conn
+        self.conn.executescript(SCHEMA)
+
+    def path(self, digest: str) -> str:
+        """摘要对应的文件路径"""
+        return os.path.join(self.root, digest[:2], digest)
+
+    def variantPath(self, digest: str, variant: str) -> str:
+        """缩小版本的文件路径"""
+        return f"{self.path(digest)}.{variant}"
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def put(self, path: str) -> str:
+        """
+        复制文件到存储中并增加一次引用，返回内容摘要
+
+        参数:
+            path (str): 源文件路径
+        """
+        with open(path, "rb") as f:
+            return self.putStream(f)
+
+    def tmpDir(self) -> str:
+        """临时文件目录，与存储在同一个文件系统中，写完后可以直接重命名"""
+        tmpDir = os.path.join(self.root, "tmp")
+        os.makedirs(tmpDir, exist_ok=True)
+        return tmpDir
+
+    def putStream(self, stream: BinaryIO) -> str:
+        """从文件流写入并增加一次引用，返回内容摘要"""
+        tmpPath = os.path.join(self.tmpDir(), uuid.uuid4().hex)
+
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmpPath, "wb") as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+
+            digest = hasher.hexdigest()
+        except BaseException:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+            raise
+
+        self.adopt(tmpPath, digest, size)
+        return digest
+
+    def adopt(self, tmpPath: str, digest: str, size: int, refs: int = 1):
+        """
+        把已经算好摘要的临时文件移入存储，并增加 refs 次引用
+
+        参数:
+            tmpPath (str): tmpDir() 中的临时文件，调用后不再存在
+            digest (str): 文件内容的 SHA-256 摘要
+            size (int): 文件大小
+            refs (int): 增加的引用次数
+        """
+        target = self.path(digest)
+        if os.path.exists(target):
+            os.remove(tmpPath)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmpPath, target)
+
+        self.conn.execute(
+            "INSERT INTO blobs (digest, size, refcount) VALUES (?, ?, ?) "
+            "ON CONFLICT (digest) DO UPDATE SET refcount = refcount + excluded.refcount",
+            (digest, size, refs))
+
+    def adoptVariants(self, digest: str, width: int, height: int, variants: Dict[str, tuple]):
+        """
+        移入图片的缩小版本并记录尺寸，已有的版本会被替换
+
+        参数:
+            digest (str): 原图摘要
+            width (int): 原图宽度
+            height (int): 原图高度
+            variants (dict): 版本名 -> (临时文件, 宽, 高, 文件大小)，临时文件调用后不再存在
+        """
+        for variant, (tmpPath, vWidth, vHeight, size) in variants.items():
+            os.replace(tmpPath, self.variantPath(digest, variant))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO blob_variants (digest, variant, width, height, size) "
+                "VALUES (?, ?, ?, ?, ?)", (digest, variant, vWidth, vHeight, size))
+
+        self.conn.execute("INSERT OR REPLACE INTO blob_images (digest, width, height) VALUES (?, ?, ?)",
+                          (digest, width, height))
+
+    def imagePath(self, digest: str, variant: str) -> str:
+        """
+        浏览时使用的图片路径：有缩小版本时返回缩小版本，否则返回原图
+
+        参数:
+            digest (str): 原图摘要
+            variant (str): 版本名，如 image_ingest.THUMB
+        """
+        return self.findVariant(digest, variant) or self.path(digest)
+
+    def findVariant(self, digest: str, variant: str) -> Optional[str]:
+        """已经生成的版本的路径，没有这个版本时返回 None"""
+        row = self.conn.execute("SELECT 1 FROM blob_variants WHERE digest = ? AND variant = ?",
+                                (digest, variant)).fetchone()
+        return self.variantPath(digest, variant) if row else None
+
+    def dimensions(self, digest: str) -> Optional[Tuple[int, int]]:
+        """原图的 (宽, 高)，还没有处理过的图片返回 None"""
+        row = self.conn.execute(
+            "SELECT width, height FROM blob_images WHERE digest = ?", (digest,)).fetchone()
+        return tuple(row) if row else None
+
+    def variants(self, digest: str) -> Dict[str, Tuple[int, int]]:
+        """已有的缩小版本，版本名 -> (宽, 高)"""
+        return {variant: (width, height) for variant, width, height in self.conn.execute(
+            "SELECT variant, width, height FROM blob_variants WHERE digest = ?", (digest,))}
+
+    def setHash(self, digest: str, dhash: int):
+        """记录图片的 64 位感知哈希"""
+        self.conn.execute("INSERT OR REPLACE INTO blob_hashes (digest, dhash) VALUES (?, ?)",
+                          (digest, dhash - (dhash & _HASH_SIGN) * 2))
+
+    def iterHashes(self, afterId: int = 0) -> Iterator[Tuple[int, str, int]]:
+        """按写入顺序遍历编号大于 afterId 的感知哈希，返回 (编号, 摘要, 哈希)"""
+        for hashId, digest, dhash in self.conn.execute(
+                "SELECT id, digest, dhash FROM blob_hashes WHERE id > ? ORDER BY id", (afterId,)):
+            yield hashId, digest, dhash & (_HASH_SIGN * 2 - 1)
+
+    def missingVariants(self) -> List[str]:
+        """还没有生成缩小版本或感知哈希的图片摘要"""
+        return [digest for digest, in self.conn.execute(
+            "SELECT digest FROM blobs WHERE refcount > 0 AND ("
+            "digest NOT IN (SELECT digest FROM blob_images) OR digest NOT IN (SELECT digest FROM blob_hashes))")]
+
+    def refcount(self, digest: str) -> int:
+        row = self.conn.execute(
+            "SELECT refcount FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        return row[0] if row else 0
+
+    def incref(self, digest: str, count: int = 1):
+        """增加 count 次引用，摘要必须已经存在"""
+        cursor = self.conn.execute(
+            "UPDATE blobs SET refcount = refcount + ? WHERE digest = ?", (count, digest))
+        if cursor.rowcount == 0:
+            raise KeyError(digest)
+
+    def decref(self, digest: str) -> bool:
+        """减少一次引用，没有引用时删除文件，返回文件是否被删除"""
+        self.conn.execute(
+            "UPDATE blobs SET refcount = refcount - 1 WHERE digest = ? AND refcount > 0",
+            (digest,))
+        if self.refcount(digest) > 0:
+            return False
+
+        variants = [variant for variant, in self.conn.execute(
+            "SELECT variant FROM blob_variants WHERE digest = ?", (digest,))]
+        self.conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        self.conn.execute("DELETE FROM blob_images WHERE digest = ?", (digest,))
+        self.conn.execute("DELETE FROM blob_variants WHERE digest = ?", (digest,))
+        self.conn.execute("DELETE FROM blob_hashes WHERE digest = ?", (digest,))
+
+        for path in [self.path(digest)] + [self.variantPath(digest, v) for v in variants]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+        return True
+
+    def size(self, digest: str) -> Optional[int]:
+        row = self.conn.execute("SELECT size FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        return row[0] if row else None
@@ -0,0 +1,206 @@
+# coding:utf-8
+"""
+英雄与地图目录
+
+解析 resource/heroes/hero.json 和 resource/maps/maps.json，检查其中引用的图片是否存在，
+并建立各种查找表。解析结果缓存为二进制文件，两个 JSON 文件的修改时间变化时自动重新生成。
+整个进程通过 catalog() 共享同一个实例。本模块不依赖 Qt，命令行工具也可以使用。
+"""
+import json
+import os
+import pickle
+import warnings
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from common.config import CACHE_DIR, RESOURCE_DIR, ROOT_DIR
+
+HERO_JSON = os.path.join(RESOURCE_DIR, "heroes", "hero.json")
+MAP_JSON = os.path.join(RESOURCE_DIR, "maps", "maps.json")
+CATALOG_CACHE = os.path.join(CACHE_DIR, "catalog.pickle")
+
+# 缓存格式版本，修改数据结构时加一
+CACHE_VERSION = 1
+
+# 技能按键
+SKILL_SLOTS = ("c", "q", "e", "x")
+SKILL_NAMES = {"c": "C 技能", "q": "Q 技能", "e": "E 技能", "x": "X 大招"}
+
+# 英雄定位
+ROLE_NAMES = {
+    "Duelers": "决斗者",
+    "Controllers": "控场者",
+    "Sentinels": "哨卫",
+    "Guardians": "先锋",
+}
+
+
+class CatalogError(Exception):
+    """目录文件格式错误"""
+
+
+@dataclass(frozen=True)
+class Hero:
+    """英雄，图片路径都相对于项目根目录"""
+    number: str
+    name: str
+    chinese_name: str
+    role: str
+    avatar: str
+    skills: Dict[str, str] = field(hash=False)
+
+
+@dataclass(frozen=True)
+class GameMap:
+    """地图，图片路径相对于项目根目录"""
+    name: str
+    chinese_name: str
+    cover: str
+
+
+class Catalog:
+    """英雄与地图的查找表"""
+
+    def __init__(self, heroes: List[Hero], maps: List[GameMap], missingAssets: List[str] = None):
+        self.heroes = heroes
+        self.maps = maps
+        self.missingAssets = missingAssets or []
+
+        self.heroByNumber = {h.number: h for h in heroes}
+        self.heroByName = {h.name: h for h in heroes}
+        self.heroByChineseName = {h.chinese_name: h for h in heroes}
+
+        self.heroesByRole = {}  # type: Dict[str, List[Hero]]
+        for hero in heroes:
+            self.heroesByRole.setdefault(hero.role, []).append(hero)
+
+        self.mapByName = {m.name: m for m in maps}
+
+    def hero(self, key: str) -> Optional[Hero]:
+        """按编号、英文名或中文名查找英雄"""
+        return (self.heroByName.get(key) or self.heroByNumber.get(key)
+                or self.heroByChineseName.get(key))
+
+    def map(self, key: str) -> Optional[GameMap]:
+        """按英文名或中文名查找地图"""
+        gameMap = self.mapByName.get(key)
+        if gameMap is None:
+            gameMap = next((m for m in self.maps if m.chinese_name == key), None)
+
+        return gameMap
+
+    def skills(self, hero: str) -> Dict[str, str]:
+        """英雄的技能图标，按键 (c/q/e/x) -> 图片路径"""
+        h = self.hero(hero)
+        return dict(h.skills) if h else {}
+
+    def mapLabel(self, key: str) -> str:
+        gameMap = self.map(key)
+        return gameMap.chinese_name if gameMap else key
+
+    def heroLabel(self, key: str) -> str:
+        hero = self.hero(key)
+        return hero.chinese_name if hero else key
+
+    @staticmethod
+    def skillLabel(slot: str) -> str:
+        return SKILL_NAMES.get(slot, slot)
+
+
+def _resourcePath(path: str) -> str:
+    """hero.json 中的路径相对于 resource 目录，统一转换为相对于项目根目录"""
+    return os.path.relpath(os.path.join(RESOURCE_DIR, path), ROOT_DIR).replace(os.sep, "/")
+
+
+def compileCatalog(heroJson: str = HERO_JSON, mapJson: str = MAP_JSON) -> Catalog:
+    """解析两个 JSON 文件并检查图片是否存在"""
+    try:
+        with open(heroJson, encoding="utf-8") as f:
+            heroData = json.load(f)["heroes"]
+
+        with open(mapJson, encoding="utf-8") as f:
+            mapData = json.load(f)["maps"]
+
+        heroes = [
+            Hero(
+                number=item["number"],
+                name=item["name"],
+                chinese_name=item["Chinese_name"],
+                role=role,
+                avatar=_resourcePath(item["avatar"]),
+                skills={slot: _resourcePath(item["skill"][slot]) for slot in SKILL_SLOTS},
+            )
+            for role, items in heroData.items()
+            for item in items
+        ]
+        maps = [GameMap(item["name"], item["chinese_name"], item["url"]) for item in mapData]
+    except (KeyError, TypeError, ValueError) as e:
+        raise CatalogError(f"目录文件格式错误: {e!r}") from e
+
+    for kind, keys in (("英雄编号", [h.number for h in heroes]),
+                       ("英雄名称", [h.name for h in heroes]),
+                       ("地图名称", [m.name for m in maps])):
+        duplicates = sorted({k for k in keys if keys.count(k) > 1})
+        if duplicates:
+            raise CatalogError(f"{kind}重复: {', '.join(duplicates)}")
+
+    assets = [m.cover for m in maps]
+    for hero in heroes:
+        assets.append(hero.avatar)
+        assets.extend(hero.skills.values())
+
+    missing = [path for path in assets if not os.path.exists(os.path.join(ROOT_DIR, path))]
+    if missing:
+        warnings.warn(f"目录中引用的 {len(missing)} 个图片不存在: {', '.join(missing[:5])}")
+
+    return Catalog(heroes, maps, missing)
+
+
+def _sourceStamp(paths) -> Dict[str, int]:
+    return {path: os.stat(path).st_mtime_ns for path in paths}
+
+
+def loadCatalog(heroJson: str = HERO_JSON, mapJson: str = MAP_JSON,
+                cachePath: Optional[str] = CATALOG_CACHE) -> Catalog:
+    """
+    读取目录，优先使用缓存
+
+    参数:
+        heroJson (str): hero.json 路径
+        mapJson (str): maps.json 路径
+        cachePath (str): 缓存文件路径，None 表示不使用缓存
+    """
+    stamp = {"version": CACHE_VERSION, "sources": _sourceStamp((heroJson, mapJson))}
+
+    if cachePath and os.path.exists(cachePath):
+        try:
+            with open(cachePath, "rb") as f:
+                cachedStamp, catalog = pickle.load(f)
+            if cachedStamp == stamp:
+                return catalog
+        except Exception:
+            # 缓存损坏或格式过期，重新生成
+            pass
+
+    catalog = compileCatalog(heroJson, mapJson)
+
+    if cachePath:
+        os.makedirs(os.path.dirname(cachePath), exist_ok=True)
+        tmpPath = f"{cachePath}.{os.getpid()}.tmp"
+        with open(tmpPath, "wb") as f:
+            pickle.dump((stamp, catalog), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpPath, cachePath)
+
+    return catalog
+
+
+_catalog = None     # type: Optional[Catalog]
+
+
+def catalog() -> Catalog:
+    """返回进程内共享的目录"""
+    global _catalog
+    if _catalog is None:
+        _catalog = loadCatalog(cachePath=CATALOG_CACHE)
+
+    return _catalog
@@ -0,0 +1,184 @@
+# coding:utf-8
+"""
+点位短片（动图）的存储格式
+
+上传的 GIF/WebP 动图在工作进程中转换为缩小的短片版本（见 common.image_ingest）：
+每一帧缩小到 CLIP_SIZE 以内、合成到黑色背景后单独编码为 JPEG，帧率降到 CLIP_MAX_FPS 以内，
+最多保留 CLIP_MAX_FRAMES 帧。文件结构：
+
+    MAGIC | 头部长度 (uint32 小端) | 头部 JSON | 各帧的 JPEG 数据
+
+头部记录短片尺寸和每一帧的 (偏移, 长度, 显示时长毫秒)。每一帧都可以单独读取、单独解码，
+播放时只解码需要显示的帧，并且可以直接按显示尺寸缩小解码（见 common.clip_player）。
+
+本模块不导入 Qt，图片处理函数在调用时才导入 QtGui，可以直接交给进程池执行。
+"""
+import json
+import os
+import struct
+from typing import List, NamedTuple, Tuple
+
+MAGIC = b"VCLIP1\n"
+_HEADER_LENGTH = struct.Struct("<I")
+
+# 短片的最大像素尺寸、最高帧率、最多帧数
+CLIP_SIZE = (480, 270)
+CLIP_MAX_FPS = 15
+CLIP_MAX_FRAMES = 150
+CLIP_QUALITY = 80
+CLIP_FORMAT = "jpg"
+
+# 浏览器把 0 和过短的帧间隔当作 100 毫秒，这里保持一致
+MIN_DELAY = 20
+DEFAULT_DELAY = 100
+
+
+class ClipError(Exception):
+    """短片无法读取"""
+
+
+class ClipInfo(NamedTuple):
+    """短片头部"""
+    width: int
+    height: int
+    frames: List[Tuple[int, int, int]]     # (相对数据开头的偏移, 长度, 显示时长毫秒)
+    dataStart: int
+
+    @property
+    def frameCount(self) -> int:
+        return len(self.frames)
+
+    def delay(self, index: int) -> int:
+        return self.frames[index][2]
+
+
+def isAnimated(path: str) -> bool:
+    """图片是否是多帧动图"""
+    from PyQt5.QtGui import QImageReader
+
+    reader = QImageReader(path)
+    return reader.supportsAnimation() and reader.imageCount() > 1
+
+
+def _frameDelay(delay: int) -> int:
+    return DEFAULT_DELAY if delay < MIN_DELAY else delay
+
+
+def _encodeFrame(image) -> bytes:
+    from PyQt5.QtCore import QBuffer, QByteArray, QIODevice
+    from PyQt5.QtGui import QImageWriter
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    writer = QImageWriter(buffer, CLIP_FORMAT.encode())
+    writer.setQuality(CLIP_QUALITY)
+    if not writer.write(image):
+        raise ClipError(f"无法编码短片帧: {writer.errorString()}")
+
+    buffer.close()
+    return bytes(data)
+
+
+def writeClip(sourcePath: str, path: str) -> Tuple[int, int, int]:
+    """
+    把动图转换为短片文件，返回 (宽, 高, 文件大小)
+
+    参数:
+        sourcePath (str): GIF/WebP 动图路径
+        path (str): 输出路径
+    """
+    from PyQt5.QtCore import QSize, Qt
+    from PyQt5.QtGui import QImage, QImageReader
+
+    reader = QImageReader(sourcePath)
+    interval = 1000 // CLIP_MAX_FPS
+
+    # 按时间轴降低帧率：保留每个 interval 内的第一帧，被丢弃的帧的时长并入前一帧
+    frames = []     # [编码后的数据, 开始时间]
+    elapsed, nextSlot, size = 0, 0, None
+    while len(frames) < CLIP_MAX_FRAMES and reader.canRead():
+        image = reader.read()
+        if image.isNull():
+            break
+
+        if elapsed >= nextSlot:
+            if size is None:
+                size = image.size()
+                if size.width() > CLIP_SIZE[0] or size.height() > CLIP_SIZE[1]:
+                    size = size.scaled(QSize(*CLIP_SIZE), Qt.KeepAspectRatio)
+
+            # 透明像素预乘后为 0，直接去掉透明通道即为合成到黑色背景
+            image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied).convertToFormat(QImage.Format_RGB32)
+            if image.size() != size:
+                image = image.scaled(size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+            frames.append([_encodeFrame(image), elapsed])
+            nextSlot = elapsed + interval
+
+        elapsed += _frameDelay(reader.nextImageDelay())
+
+    if not frames:
+        raise ClipError(f"动图无法解码: {reader.errorString()}")
+
+    table, offset = [], 0
+    for i, (data, start) in enumerate(frames):
+        end = frames[i + 1][1] if i + 1 < len(frames) else elapsed
+        table.append((offset, len(data), max(end - start, MIN_DELAY)))
+        offset += len(data)
+
+    header = json.dumps({"width": size.width(), "height": size.height(), "frames": table}).encode()
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        for data, _ in frames:
+            f.write(data)
+
+    return size.width(), size.height(), os.path.getsize(path)
+
+
+def readClipInfo(path: str) -> ClipInfo:
+    """读取短片头部"""
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ClipError("不是短片文件")
+
+            length, = _HEADER_LENGTH.unpack(f.read(_HEADER_LENGTH.size))
+            header = json.loads(f.read(length))
+    except (OSError, ValueError, struct.error) as e:
+        raise ClipError(f"短片无法读取: {e}")
+
+    frames = [tuple(frame) for frame in header["frames"]]
+    return ClipInfo(header["width"], header["height"], frames, len(MAGIC) + _HEADER_LENGTH.size + length)
+
+
+def decodeFrame(path: str, info: ClipInfo, index: int, width: int = 0, height: int = 0):
+    """
+    读取并解码一帧，返回 QImage（失败时为空图片），可以在任意线程调用
+
+    参数:
+        path (str): 短片路径
+        info: readClipInfo() 的结果
+        index (int): 帧序号
+        width, height (int): 按比例缩小到这个像素尺寸以内，JPEG 在解码时直接缩小；为 0 时不缩放
+    """
+    from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, QSize, Qt
+    from PyQt5.QtGui import QImage, QImageReader
+
+    offset, length, _ = info.frames[index]
+    try:
+        with open(path, "rb") as f:
+            f.seek(info.dataStart + offset)
+            data = QByteArray(f.read(length))
+    except OSError:
+        return QImage()
+
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.ReadOnly)
+    reader = QImageReader(buffer, CLIP_FORMAT.encode())
+    if width and height and (info.width > width or info.height > height):
+        reader.setScaledSize(QSize(info.width, info.height).scaled(QSize(width, height), Qt.KeepAspectRatio))
+
+    return reader.read()
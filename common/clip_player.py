@@ -0,0 +1,224 @@
+# coding:utf-8
+"""
+短片播放
+
+所有正在播放的短片（见 common.clip）共用一个定时器、一个解码线程池和一个有容量上限的帧缓存：
+    - 只有可见的卡片才播放：卡片显示或滚入可见区域时 play()，隐藏或滚出时 stop()，接收方销毁时自动停止
+    - 帧在需要显示时才在后台线程中按显示尺寸解码，同时预先解码下一帧
+    - 解码的帧放入共享的 frameCache，按字节数淘汰，循环播放时第二遍直接命中
+    - 同时解码的帧数和每秒解码的帧数都有上限，可见的短片太多时降低帧率，而不是占满 CPU
+"""
+import time
+from collections import OrderedDict, deque
+from typing import Callable, List, Optional
+
+from PyQt5.QtCore import QObject, QRunnable, QSize, QThreadPool, QTimer, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+
+from common.clip import ClipError, ClipInfo, decodeFrame, readClipInfo
+from common.pixmap_cache import PixmapCache, imageKey
+
+FRAME_CACHE_BYTES = 48 * 1024 * 1024
+MAX_DECODING = 2                # 同时解码的帧数（解码线程数）
+MAX_DECODES_PER_SECOND = 120    # 所有短片每秒最多解码的帧数
+MAX_INFOS = 256                 # 缓存的短片头部数量
+MAX_LAG = 0.05                  # 落后超过这个时间（秒）时重新计时
+
+# 短片帧缓存，键为 imageKey(短片路径, 逻辑尺寸, 设备像素比) + (帧序号,)
+frameCache = PixmapCache(FRAME_CACHE_BYTES)
+
+
+class ClipPlayback:
+    """一个正在播放的短片"""
+
+    def __init__(self, path: str, info: ClipInfo, size: QSize, dpr: float, receiver: QObject,
+                 callback: Callable[[QPixmap], None]):
+        self.path = path
+        self.info = info
+        self.size = size
+        self.dpr = dpr
+        self.receiverId = id(receiver)
+        self.callback = callback
+        self.frame = -1         # 当前显示的帧，-1 表示还没有显示
+        self.pixmap = None      # type: Optional[QPixmap]
+        self.due = 0.0          # 下一帧应该显示的时间 (time.perf_counter)
+        self._key = imageKey(path, size, dpr)
+
+    def frameKey(self, index: int) -> tuple:
+        return self._key + (index,)
+
+    def nextFrame(self) -> int:
+        return (self.frame + 1) % self.info.frameCount
+
+
+class FrameDecodeTask(QRunnable):
+    """在线程池中读取并解码一帧"""
+
+    def __init__(self, key: tuple, playback: ClipPlayback, index: int, animator: "ClipAnimator"):
+        super().__init__()
+        self.key = key
+        self.path = playback.path
+        self.info = playback.info
+        self.index = index
+        self.width = int(playback.size.width() * playback.dpr)
+        self.height = int(playback.size.height() * playback.dpr)
+        self.dpr = playback.dpr
+        self.animator = animator
+
+    def run(self):
+        image = decodeFrame(self.path, self.info, self.index, self.width, self.height)
+        image.setDevicePixelRatio(self.dpr)
+        try:
+            self.animator._frameDecoded.emit(self.key, image)
+        except RuntimeError:
+            # 程序退出时播放器可能已经被销毁
+            pass
+
+
+class ClipAnimator(QObject):
+    """短片播放调度器，只能在主线程使用"""
+
+    _frameDecoded = pyqtSignal(object, QImage)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(MAX_DECODING)
+        self.playbacks = []         # type: List[ClipPlayback]
+        self.decodedFrames = 0      # 累计解码的帧数
+        self.shownFrames = 0        # 累计显示的帧数
+
+        self._receivers = set()         # 已经连接 destroyed 信号的接收方
+        self._infos = OrderedDict()     # 短片路径 -> ClipInfo
+        self._decoding = set()          # 正在解码的帧
+        self._failed = set()            # 解码失败的帧，不再重试
+        self._decodeTimes = deque()     # 最近一秒内开始解码的时间
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._tick)
+        self._frameDecoded.connect(self._onFrameDecoded)
+
+    def play(self, path: str, size: QSize, dpr: float, receiver: QObject,
+             callback: Callable[[QPixmap], None]) -> Optional[ClipPlayback]:
+        """
+        开始播放短片，第一帧解码完成后开始调用回调；短片无法读取时返回 None
+
+        参数:
+            path (str): 短片路径
+            size (QSize): 显示的逻辑尺寸，帧按比例缩小到以内
+            dpr (float): 设备像素比
+            receiver (QObject): 显示短片的控件，销毁时自动停止播放
+            callback: 每显示一帧调用一次，参数为这一帧的 QPixmap
+        """
+        info = self._info(path)
+        if info is None:
+            return None
+
+        playback = ClipPlayback(path, info, size, dpr, receiver, callback)
+        if playback.receiverId not in self._receivers:
+            self._receivers.add(playback.receiverId)
+            receiver.destroyed.connect(lambda *_, rid=playback.receiverId: self._stopReceiver(rid))
+
+        playback.due = time.perf_counter()
+        self.playbacks.append(playback)
+        self.timer.start(0)
+        return playback
+
+    def stop(self, playback: Optional[ClipPlayback]):
+        """停止播放，已经在解码的帧仍会放入缓存"""
+        if playback in self.playbacks:
+            self.playbacks.remove(playback)
+        if not self.playbacks:
+            self.timer.stop()
+
+    def _stopReceiver(self, receiverId: int):
+        self._receivers.discard(receiverId)
+        for playback in [p for p in self.playbacks if p.receiverId == receiverId]:
+            self.stop(playback)
+
+    def _info(self, path: str) -> Optional[ClipInfo]:
+        info = self._infos.get(path)
+        if info is None:
+            try:
+                info = readClipInfo(path)
+            except ClipError:
+                return None
+
+            self._infos[path] = info
+            if len(self._infos) > MAX_INFOS:
+                self._infos.popitem(last=False)
+
+        self._infos.move_to_end(path)
+        return info
+
+    def _tick(self):
+        """显示到时间的帧，预先解码下一帧，并安排下一次唤醒"""
+        now = time.perf_counter()
+        wake = float("inf")
+        for playback in list(self.playbacks):
+            index = playback.nextFrame()
+            if playback.frame == index or playback.frameKey(index) in self._failed:
+                # 只有一帧的短片显示后不再更新，无法解码的短片停在当前帧
+                continue
+
+            if now >= playback.due:
+                pixmap = frameCache.find(playback.frameKey(index))
+                if pixmap is None:
+                    # 解码完成时会再次唤醒
+                    if not self._decode(playback, index):
+                        wake = min(wake, self._decodeSlotTime())
+                    continue
+
+                playback.frame, playback.pixmap = index, pixmap
+                # 落后太多时从现在重新计时，不追赶丢掉的时间
+                if now - playback.due > MAX_LAG:
+                    playback.due = now
+                playback.due += playback.info.delay(index) / 1000
+                self.shownFrames += 1
+                playback.callback(pixmap)
+                index = playback.nextFrame()
+
+            if playback.frameKey(index) not in frameCache:
+                self._decode(playback, index)
+            wake = min(wake, playback.due)
+
+        if wake < float("inf") and self.playbacks:
+            self.timer.start(max(0, int((wake - now) * 1000)))
+
+    def _decodeSlotTime(self) -> float:
+        """解码数量达到上限时，下一次可以开始解码的时间"""
+        if len(self._decodeTimes) >= MAX_DECODES_PER_SECOND:
+            return self._decodeTimes[0] + 1.0
+        return float("inf")
+
+    def _decode(self, playback: ClipPlayback, index: int) -> bool:
+        """在后台解码一帧，已经在解码时返回 True，达到上限时返回 False"""
+        key = playback.frameKey(index)
+        if key in self._decoding:
+            return True
+
+        now = time.perf_counter()
+        while self._decodeTimes and self._decodeTimes[0] < now - 1.0:
+            self._decodeTimes.popleft()
+        if len(self._decoding) >= MAX_DECODING or len(self._decodeTimes) >= MAX_DECODES_PER_SECOND:
+            return False
+
+        self._decoding.add(key)
+        self._decodeTimes.append(now)
+        self.pool.start(FrameDecodeTask(key, playback, index, self))
+        return True
+
+    def _onFrameDecoded(self, key: tuple, image: QImage):
+        self._decoding.discard(key)
+        self.decodedFrames += 1
+        if image.isNull():
+            self._failed.add(key)
+        else:
+            frameCache.insert(key, QPixmap.fromImage(image))
+
+        if self.playbacks:
+            self._tick()
+
+
+clipAnimator = ClipAnimator()
@@ -0,0 +1,29 @@
+# coding:utf-8
+"""全局路径配置"""
+import os
+
+# 项目根目录（resource 等资源路径都相对于它）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 资源目录
+RESOURCE_DIR = os.path.join(ROOT_DIR, "resource")
+
+# 构建生成的英雄图集（python -m common.hero_atlas）
+ATLAS_DIR = os.path.join(RESOURCE_DIR, "atlas")
+
+# 可随时删除的缓存目录（缩略图等）
+CACHE_DIR = os.path.join(ROOT_DIR, "cache")
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, "thumbnails")
+
+# 用户数据目录（点位数据库等）
+DATA_DIR = os.path.join(ROOT_DIR, "data")
+LINEUP_DB = os.path.join(DATA_DIR, "lineups.db")
+BLOB_DIR = os.path.join(DATA_DIR, "blobs")
+DRAFT_JOURNAL = os.path.join(DATA_DIR, "draft.jsonl")
+
+
+def resource_path(path: str) -> str:
+    """将相对于项目根目录的资源路径转换为绝对路径"""
+    if os.path.isabs(path):
+        return path
+    return os.path.join(ROOT_DIR, path)
@@ -0,0 +1,220 @@
+# coding:utf-8
+"""
+新增点位表单的草稿日志
+
+表单的每次修改合并成一条补丁（字段名 -> 新值）追加到 JSON Lines 文件末尾，读取时按顺序合并即得到草稿。
+写文件在独立的后台线程中进行，界面线程只把补丁放入队列，输入时不会等待磁盘：
+    - 后台线程每次取出队列中所有的补丁，用一次 write 追加
+    - 文件超过 compactBytes（并且超过上次整理后大小的两倍）时把合并后的草稿写成只有一行的新文件，再原子替换旧文件
+    - 启动写线程时如果文件有多行或者末尾有不完整的一行（上次写到一半退出），先整理一次
+    - clear() 删除文件，保存点位后表单的草稿不再需要
+
+本模块不导入 Qt。
+"""
+import json
+import os
+import queue
+import threading
+from typing import Dict, Optional, Tuple
+
+from common.config import DRAFT_JOURNAL
+
+# 文件超过这个大小（字节）时整理
+COMPACT_BYTES = 64 * 1024
+
+_CLEAR = object()
+_STOP = object()
+
+
+def _readRecords(path: str) -> Tuple[Dict[str, object], int, bool]:
+    """读取日志，返回 (合并后的草稿, 记录条数, 是否有无法解析的行)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except FileNotFoundError:
+        return {}, 0, False
+    except (OSError, UnicodeDecodeError):
+        return {}, 0, True
+
+    draft, records, broken = {}, 0, not text.endswith("\n") and bool(text)
+    for line in text.splitlines():
+        try:
+            patch = json.loads(line)
+        except ValueError:
+            broken = True
+            continue
+
+        if isinstance(patch, dict):
+            draft.update(patch)
+            records += 1
+        else:
+            broken = True
+
+    return draft, records, broken
+
+
+def readDraft(path: str = DRAFT_JOURNAL) -> Dict[str, object]:
+    """读取草稿，没有草稿时返回空字典；写到一半的最后一行被忽略"""
+    return _readRecords(path)[0]
+
+
+class DraftJournal:
+    """追加写入的草稿日志，append()/clear() 可以在任意线程调用，不会阻塞"""
+
+    def __init__(self, path: str = DRAFT_JOURNAL, compactBytes: int = COMPACT_BYTES):
+        """
+        参数:
+            path (str): 日志文件路径
+            compactBytes (int): 文件超过这个大小时整理成一行
+        """
+        self.path = path
+        self.compactBytes = compactBytes
+        self.writes = 0         # 写文件的次数
+        self.compactions = 0    # 整理的次数
+        self.error = None       # type: Optional[str]   # 最近一次写文件的错误
+
+        self._queue = queue.SimpleQueue()
+        self._thread = None     # type: Optional[threading.Thread]
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, object]:
+        """读取草稿，应在第一次 append() 之前调用"""
+        return readDraft(self.path)
+
+    def append(self, patch: Dict[str, object]):
+        """追加一条补丁，值需要能转换成 JSON"""
+        if patch:
+            self._put(dict(patch))
+
+    def clear(self):
+        """删除草稿"""
+        self._put(_CLEAR)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待之前的补丁写入文件，超时返回 False"""
+        if self._thread is None:
+            return True
+
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """写完队列中的补丁后结束写线程，之后再 append() 会重新启动"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(_STOP)
+
+        if thread is not None:
+            thread.join(timeout)
+
+    def _put(self, item):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="DraftJournal", daemon=True)
+                self._thread.start()
+            self._queue.put(item)
+
+    # --- 写线程 ---
+
+    def _run(self):
+        draft, records, broken = _readRecords(self.path)
+        size = self._size()
+        if records > 1 or broken:
+            size = self._compact(draft)
+        # 上次整理后的大小，草稿本身很大时不必每次写入都整理
+        compacted = size
+
+        while True:
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines, done, stop = [], [], False
+            for item in items:
+                if item is _STOP:
+                    stop = True
+                elif item is _CLEAR:
+                    draft.clear()
+                    lines.clear()
+                    size = self._remove()
+                elif isinstance(item, threading.Event):
+                    done.append(item)
+                else:
+                    draft.update(item)
+                    lines.append(json.dumps(item, ensure_ascii=False) + "\n")
+
+            if lines:
+                size = self._write("".join(lines), size)
+            if size > max(self.compactBytes, 2 * compacted):
+                size = compacted = self._compact(draft)
+
+            for event in done:
+                event.set()
+            if stop:
+                return
+
+    def _size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def _write(self, text: str, size: int) -> int:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(text)
+        except OSError as e:
+            self.error = str(e)
+            return size
+
+        self.writes += 1
+        return size + len(text.encode("utf-8"))
+
+    def _compact(self, draft: Dict[str, object]) -> int:
+        """把草稿写成一行的新文件并替换旧文件，返回新文件大小"""
+        if not draft:
+            return self._remove()
+
+        text = json.dumps(draft, ensure_ascii=False) + "\n"
+        tmpPath = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmpPath, "w", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmpPath, self.path)
+        except OSError as e:
+            self.error = str(e)
+            return self._size()
+
+        self.compactions += 1
+        return len(text.encode("utf-8"))
+
+    def _remove(self) -> int:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.error = str(e)
+            return self._size()
+        return 0
+
+
+_journal = None     # type: Optional[DraftJournal]
+
+
+def draftJournal() -> DraftJournal:
+    """返回进程内共享的草稿日志"""
+    global _journal
+    if _journal is None:
+        _journal = DraftJournal()
+
+    return _journal
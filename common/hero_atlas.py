@@ -0,0 +1,328 @@
+# coding:utf-8
+"""
+英雄图片图集
+
+每个英雄有 1 张立绘和 4 个技能图标，全部显示需要打开并解码 135 个文件。
+构建步骤把它们缩放后打包成一张（或几张）大图，并生成记录子区域位置的 JSON 索引：
+
+    python -m common.hero_atlas
+
+运行时通过 heroAtlas().pixmap(英雄编号, 槽位) 取出子图。
+图集不存在、过期或缺少某张图片时，自动回退到 resource/heroes 下的原始文件，开发时无需构建。
+"""
+import argparse
+import json
+import os
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from PyQt5.QtCore import QRect, QSize, Qt
+from PyQt5.QtGui import QIcon, QImage, QImageReader, QPainter, QPixmap
+
+from common.catalog import SKILL_SLOTS, Catalog, catalog
+from common.config import ATLAS_DIR, ROOT_DIR, resource_path
+from common.pixmap_cache import imageKey, pixmapCache
+from common.thumbnail_cache import thumbnailCache
+
+# 索引格式版本，修改图集布局或索引结构时加一
+ATLAS_VERSION = 1
+
+ATLAS_NAME = "heroes"
+ATLAS_INDEX = os.path.join(ATLAS_DIR, f"{ATLAS_NAME}.json")
+
+# 单页最大边长和子图之间的间隔（避免缩放采样时混入相邻子图的像素）
+PAGE_SIZE = 2048
+PADDING = 2
+
+# 槽位：立绘和四个技能
+AVATAR_SLOT = "avatar"
+SLOTS = (AVATAR_SLOT,) + SKILL_SLOTS
+
+# 图集中子图的最大像素尺寸，按 2 倍设备像素比准备
+AVATAR_CELL = QSize(192, 280)
+SKILL_CELL = QSize(64, 64)
+
+
+class Sprite(NamedTuple):
+    """图集中的一张子图"""
+    page: int
+    rect: QRect
+    source: str         # 原始文件路径（相对于项目根目录）
+
+
+def _sourcePath(hero, slot: str) -> str:
+    return hero.avatar if slot == AVATAR_SLOT else hero.skills[slot]
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(resource_path(path)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _readScaled(path: str, cell: QSize) -> QImage:
+    """解码图片并等比缩放到 cell 以内"""
+    reader = QImageReader(resource_path(path))
+    reader.setAutoTransform(True)
+    sourceSize = reader.size()
+    if sourceSize.isValid():
+        scaledSize = sourceSize.scaled(cell, Qt.KeepAspectRatio)
+        if scaledSize.width() < sourceSize.width():
+            reader.setScaledSize(scaledSize)
+
+    image = reader.read()
+    return image.convertToFormat(QImage.Format_ARGB32_Premultiplied) if not image.isNull() else image
+
+
+def packShelves(sizes: List[QSize], pageSize: int = PAGE_SIZE,
+                padding: int = PADDING) -> List[Tuple[int, int, int]]:
+    """
+    按高度从大到小逐行（货架）摆放矩形
+
+    参数:
+        sizes (List[QSize]): 各矩形的尺寸
+        pageSize (int): 每页的最大边长
+        padding (int): 矩形之间的间隔
+
+    返回:
+        与 sizes 一一对应的 (页号, x, y)
+    """
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i].height(), -sizes[i].width()))
+    placements = [None] * len(sizes)   # type: List[Tuple[int, int, int]]
+
+    page, x, y, shelfHeight = 0, padding, padding, 0
+    for i in order:
+        w, h = sizes[i].width(), sizes[i].height()
+        if w + 2 * padding > pageSize or h + 2 * padding > pageSize:
+            raise ValueError(f"图片尺寸 {w}x{h} 超过图集页面大小 {pageSize}")
+
+        # 当前行放不下就换行，当前页放不下就换页
+        if x + w + padding > pageSize:
+            x, y, shelfHeight = padding, y + shelfHeight + padding, 0
+        if y + h + padding > pageSize:
+            page, x, y, shelfHeight = page + 1, padding, padding, 0
+
+        placements[i] = (page, x, y)
+        x += w + padding
+        shelfHeight = max(shelfHeight, h)
+
+    return placements
+
+
+def buildAtlas(outputDir: str = ATLAS_DIR, heroCatalog: Catalog = None) -> dict:
+    """
+    把所有英雄立绘和技能图标打包成图集，返回写入的索引
+
+    参数:
+        outputDir (str): 输出目录
+        heroCatalog (Catalog): 英雄目录，默认为 catalog()
+    """
+    heroCatalog = heroCatalog or catalog()
+
+    keys, sources, images = [], [], []
+    for hero in heroCatalog.heroes:
+        for slot in SLOTS:
+            path = _sourcePath(hero, slot)
+            image = _readScaled(path, AVATAR_CELL if slot == AVATAR_SLOT else SKILL_CELL)
+            if image.isNull():
+                print(f"跳过无法读取的图片: {path}")
+                continue
+
+            keys.append(f"{hero.number}/{slot}")
+            sources.append(path)
+            images.append(image)
+
+    placements = packShelves([image.size() for image in images])
+
+    # 每页只保留实际用到的区域
+    pageCount = max((p[0] for p in placements), default=-1) + 1
+    extents = [[0, 0] for _ in range(pageCount)]
+    for image, (page, x, y) in zip(images, placements):
+        extents[page][0] = max(extents[page][0], x + image.width() + PADDING)
+        extents[page][1] = max(extents[page][1], y + image.height() + PADDING)
+
+    os.makedirs(outputDir, exist_ok=True)
+    pageFiles = []
+    for page, (width, height) in enumerate(extents):
+        canvas = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+        canvas.fill(Qt.transparent)
+        painter = QPainter(canvas)
+        for image, (p, x, y) in zip(images, placements):
+            if p == page:
+                painter.drawImage(x, y, image)
+        painter.end()
+
+        fileName = f"{ATLAS_NAME}-{page}.png"
+        _saveAtomic(canvas, os.path.join(outputDir, fileName))
+        pageFiles.append(fileName)
+
+    index = {
+        "version": ATLAS_VERSION,
+        "pages": pageFiles,
+        "sprites": {
+            key: {
+                "page": page,
+                "rect": [x, y, image.width(), image.height()],
+                "source": source,
+                "mtime_ns": _mtime(source),
+            }
+            for key, source, image, (page, x, y) in zip(keys, sources, images, placements)
+        },
+    }
+
+    indexPath = os.path.join(outputDir, f"{ATLAS_NAME}.json")
+    tmpPath = f"{indexPath}.{os.getpid()}.tmp"
+    with open(tmpPath, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    os.replace(tmpPath, indexPath)
+
+    return index
+
+
+def _saveAtomic(image: QImage, path: str):
+    tmpPath = f"{path}.{os.getpid()}.tmp.png"
+    if not image.save(tmpPath, "PNG"):
+        raise OSError(f"无法写入图集: {path}")
+    os.replace(tmpPath, path)
+
+
+class HeroAtlas:
+    """
+    运行时的图集访问器
+    图集页面在第一次用到时才解码，之后常驻内存
+    """
+
+    def __init__(self, indexPath: str = ATLAS_INDEX):
+        self.directory = os.path.dirname(indexPath)
+        self.pageFiles = []     # type: List[str]
+        self.pages = {}         # type: Dict[int, QImage]
+        self.sprites = {}       # type: Dict[Tuple[str, str], Sprite]
+        self._loadIndex(indexPath)
+
+    def _loadIndex(self, indexPath: str):
+        """读取索引，丢弃源文件在构建之后被修改过的子图"""
+        try:
+            with open(indexPath, encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if index.get("version") != ATLAS_VERSION:
+            return
+
+        self.pageFiles = index["pages"]
+        for key, item in index["sprites"].items():
+            if _mtime(item["source"]) != item["mtime_ns"]:
+                continue
+
+            number, slot = key.split("/")
+            self.sprites[(number, slot)] = Sprite(item["page"], QRect(*item["rect"]), item["source"])
+
+    def isAvailable(self) -> bool:
+        """是否找到了可用的图集"""
+        return bool(self.sprites)
+
+    def _sprite(self, number: str, slot: str) -> Optional[Sprite]:
+        sprite = self.sprites.get((number, slot))
+        hero = catalog().heroByNumber.get(number)
+
+        # hero.json 修改后图片路径可能已经变化，以目录中的路径为准
+        if sprite is None or hero is None or _sourcePath(hero, slot) != sprite.source:
+            return None
+
+        return sprite
+
+    def contains(self, number: str, slot: str) -> bool:
+        """图集中是否有这张子图，没有时 image() 会读取原始文件"""
+        return self._sprite(number, slot) is not None
+
+    def _page(self, page: int) -> QImage:
+        image = self.pages.get(page)
+        if image is None:
+            image = QImage(os.path.join(self.directory, self.pageFiles[page]))
+            self.pages[page] = image
+
+        return image
+
+    def image(self, number: str, slot: str, size: QSize = None, dpr: float = 1.0) -> QImage:
+        """
+        读取子图，找不到英雄或图片时返回空 QImage
+
+        参数:
+            number (str): 英雄编号
+            slot (str): "avatar" 或技能按键 c/q/e/x
+            size (QSize): 逻辑尺寸上限，None 表示保持图集中的原始尺寸
+            dpr (float): 设备像素比
+        """
+        sprite = self._sprite(number, slot)
+        if sprite is None:
+            return self._looseImage(number, slot, size, dpr)
+
+        page = self._page(sprite.page)
+        if page.isNull():
+            return self._looseImage(number, slot, size, dpr)
+
+        image = page.copy(sprite.rect)
+        if size is not None:
+            target = image.size().scaled(size * dpr, Qt.KeepAspectRatio)
+            if target.width() < image.width():
+                image = image.scaled(target, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+        image.setDevicePixelRatio(dpr)
+        return image
+
+    def _looseImage(self, number: str, slot: str, size: Optional[QSize], dpr: float) -> QImage:
+        """回退：读取 resource/heroes 下的原始文件"""
+        hero = catalog().heroByNumber.get(number)
+        if hero is None or (slot != AVATAR_SLOT and slot not in hero.skills):
+            return QImage()
+
+        path = _sourcePath(hero, slot)
+        if size is None:
+            size = AVATAR_CELL if slot == AVATAR_SLOT else SKILL_CELL
+            dpr = 1.0
+
+        return thumbnailCache.load(path, size, dpr)
+
+    def pixmap(self, number: str, slot: str, size: QSize = None, dpr: float = 1.0) -> QPixmap:
+        """
+        读取子图并转换为 QPixmap（只能在主线程调用），参数同 image()
+        结果按原始文件路径放入共享的 QPixmap 缓存，与直接加载原始文件共用缓存项
+        """
+        hero = catalog().heroByNumber.get(number)
+        if hero is None or slot not in SLOTS:
+            return QPixmap()
+
+        key = imageKey(_sourcePath(hero, slot), size or QSize(), dpr)
+        pixmap = pixmapCache.find(key)
+        if pixmap is None:
+            pixmap = QPixmap.fromImage(self.image(number, slot, size, dpr))
+            pixmapCache.insert(key, pixmap)
+
+        return pixmap
+
+    def icon(self, number: str, slot: str) -> QIcon:
+        """子图对应的图标，由 QIcon 按需缩放"""
+        return QIcon(self.pixmap(number, slot))
+
+
+_atlas = None   # type: Optional[HeroAtlas]
+
+
+def heroAtlas() -> HeroAtlas:
+    """返回进程内共享的图集"""
+    global _atlas
+    if _atlas is None:
+        _atlas = HeroAtlas()
+
+    return _atlas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="把英雄立绘和技能图标打包成图集")
+    parser.add_argument("-o", "--output", default=ATLAS_DIR, help="输出目录")
+    args = parser.parse_args()
+
+    result = buildAtlas(args.output)
+    print(f"已写入 {len(result['sprites'])} 张子图，共 {len(result['pages'])} 页: "
+          f"{os.path.relpath(args.output, ROOT_DIR)}")
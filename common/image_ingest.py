@@ -0,0 +1,311 @@
+# coding:utf-8
+"""
+上传截图的预处理
+
+游戏截图通常是 1440p/4K 的 PNG，界面上却只以 180x140 显示。上传时在工作进程中：
+    1. 按 EXIF 方向旋转图片，丢弃 EXIF、文本块、色彩配置等元数据后重新编码，作为原图保存
+    2. 生成适合预览的 display 版本和卡片使用的 thumb 版本（WebP，不支持时用 JPEG）
+    3. 记录原图和各版本的尺寸，并计算 64 位感知哈希（dHash）用于查找相似截图
+    4. 需要时从截图识别地图和英雄（见 common.screen_recognition）
+    5. GIF/WebP 动图的原图原样保存（重新编码只会留下第一帧），另外生成缩小的短片版本（见 common.clip）
+浏览时只读取小尺寸版本，不再解码原图。
+
+本模块不导入 Qt，图片处理函数在调用时才导入 QtGui，可以直接交给进程池执行。
+
+    python -m common.image_ingest     为还没有预览版本或感知哈希的旧图片补生成
+"""
+import hashlib
+import multiprocessing
+import os
+import shutil
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from common.clip import ClipError, isAnimated, writeClip
+
+if TYPE_CHECKING:
+    from PyQt5.QtGui import QImage
+
+    from common.screen_recognition import Recognition
+
+CHUNK_SIZE = 1024 * 1024
+
+# 版本名 -> 最大像素尺寸（按比例缩放到以内，不放大）
+DISPLAY, THUMB = "display", "thumb"
+VARIANTS = {
+    DISPLAY: (1280, 720),
+    THUMB: (360, 280),      # 卡片 180x140，覆盖 2 倍缩放
+}
+VARIANT_QUALITY = {DISPLAY: 85, THUMB: 80}
+
+# 动图的短片版本，尺寸和帧率限制见 common.clip
+CLIP = "clip"
+
+# dHash 比较 (HASH_SIZE + 1) x HASH_SIZE 灰度图中相邻像素的亮度，得到 HASH_SIZE² 位
+HASH_SIZE = 8
+
+# 原图重新编码的格式：有损格式保持有损，其余一律保存为 PNG（使用默认压缩级别）
+ORIGINAL_FORMATS = {"jpeg": "jpg", "jpg": "jpg", "webp": "webp"}
+ORIGINAL_QUALITY = {"jpg": 95, "webp": 95, "png": -1}
+
+
+class IngestError(Exception):
+    """图片无法读取或处理"""
+
+
+class Variant(NamedTuple):
+    """一个预览版本"""
+    path: str       # 临时文件路径
+    width: int
+    height: int
+    size: int       # 文件大小
+
+
+@dataclass
+class IngestedImage:
+    """处理完成的图片，文件都在存储的临时目录中，需要交给 storeImage() 移入存储"""
+    digest: str                 # 重新编码后的原图摘要
+    path: str
+    size: int
+    width: int
+    height: int
+    variants: Dict[str, Variant] = field(default_factory=dict)
+    dhash: int = 0              # 感知哈希
+    recognition: Optional["Recognition"] = None    # 地图和英雄的识别结果，见 common.screen_recognition
+
+    def tmpPaths(self) -> List[str]:
+        return [self.path] + [v.path for v in self.variants.values()]
+
+
+def variantFormat() -> str:
+    """预览版本的编码格式，Qt 缺少 WebP 插件时退回 JPEG"""
+    from PyQt5.QtGui import QImageWriter
+
+    formats = {bytes(f).decode() for f in QImageWriter.supportedImageFormats()}
+    return "webp" if "webp" in formats else "jpg"
+
+
+def _readImage(path: str) -> Tuple["QImage", str]:
+    """解码图片并按 EXIF 方向旋转，返回 (不带元数据的图片, 源格式)"""
+    from PyQt5.QtGui import QColorSpace, QImage, QImageReader
+
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    sourceFormat = bytes(reader.format()).decode().lower()
+    image = reader.read()
+    if image.isNull():
+        raise IngestError(f"图片无法解码: {reader.errorString()}")
+
+    if image.colorSpace().isValid() and image.colorSpace() != QColorSpace(QColorSpace.SRgb):
+        image.convertToColorSpace(QColorSpace(QColorSpace.SRgb))
+
+    image = image.convertToFormat(
+        QImage.Format_ARGB32 if image.hasAlphaChannel() else QImage.Format_RGB32)
+
+    # 转换格式会保留文本块等元数据，直接用像素数据构造一张新图片
+    clean = QImage(image.constBits(), image.width(), image.height(),
+                   image.bytesPerLine(), image.format()).copy()
+    return clean, sourceFormat
+
+
+def _write(image, path: str, fmt: str, quality: int) -> int:
+    """编码写入文件，返回文件大小"""
+    from PyQt5.QtGui import QImageWriter
+
+    writer = QImageWriter(path, fmt.encode())
+    writer.setQuality(quality)
+    if not writer.write(image):
+        if os.path.exists(path):
+            os.remove(path)
+        raise IngestError(f"无法写入图片: {writer.errorString()}")
+
+    return os.path.getsize(path)
+
+
+def _fileDigest(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+
+def dHash(image) -> int:
+    """
+    计算图片的 dHash：缩小为 9x8 灰度图，每行相邻像素左暗右亮记 1
+
+    重新压缩、缩放几乎不改变哈希，轻微裁剪只改变少数几位。
+    输入应该是已经缩小的图片（如 thumb 版本），从原图直接缩小更慢
+    """
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QImage
+
+    gray = image.scaled(HASH_SIZE + 1, HASH_SIZE, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    gray = gray.convertToFormat(QImage.Format_Grayscale8)
+
+    value = 0
+    for y in range(HASH_SIZE):
+        row = gray.constScanLine(y).asstring(HASH_SIZE + 1)
+        for x in range(HASH_SIZE):
+            value = (value << 1) | (row[x + 1] > row[x])
+
+    return value
+
+
+def _writeVariants(image, tmpDir: str) -> Tuple[Dict[str, Variant], int]:
+    """依次缩小生成各个版本，每个版本从上一个版本缩放，避免重复处理原图；返回 (版本, 感知哈希)"""
+    from PyQt5.QtCore import QSize, Qt
+
+    fmt = variantFormat()
+    variants = {}
+    source = image
+    for name, (width, height) in sorted(VARIANTS.items(), key=lambda item: -item[1][0]):
+        if source.width() > width or source.height() > height:
+            source = source.scaled(QSize(width, height), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+        path = os.path.join(tmpDir, uuid.uuid4().hex)
+        size = _write(source, path, fmt, VARIANT_QUALITY[name])
+        variants[name] = Variant(path, source.width(), source.height(), size)
+
+    return variants, dHash(source)
+
+
+def _writeClip(path: str, tmpDir: str) -> Variant:
+    clipPath = os.path.join(tmpDir, uuid.uuid4().hex)
+    try:
+        return Variant(clipPath, *writeClip(path, clipPath))
+    except BaseException as e:
+        if os.path.exists(clipPath):
+            os.remove(clipPath)
+        if isinstance(e, ClipError):
+            raise IngestError(str(e))
+        raise
+
+
+def ingestFile(path: str, tmpDir: str, recognize: bool = False) -> IngestedImage:
+    """
+    处理一张上传的图片，可以在工作进程中运行
+
+    参数:
+        path (str): 源图片路径
+        tmpDir (str): 输出临时文件的目录，应与存储在同一个文件系统
+        recognize (bool): 是否从截图识别地图和英雄
+
+    出错时抛出 IngestError，不留下临时文件
+    """
+    image, sourceFormat = _readImage(path)
+    animated = isAnimated(path)
+    recognition = None
+    if recognize:
+        from common.screen_recognition import recognizeImage
+        recognition = recognizeImage(image)
+
+    fmt = ORIGINAL_FORMATS.get(sourceFormat, "png")
+
+    tmpPath = os.path.join(tmpDir, uuid.uuid4().hex)
+    variants = {}
+    try:
+        if animated:
+            shutil.copyfile(path, tmpPath)
+            size = os.path.getsize(tmpPath)
+        else:
+            size = _write(image, tmpPath, fmt, ORIGINAL_QUALITY[fmt])
+        digest = _fileDigest(tmpPath)
+        variants, dhash = _writeVariants(image, tmpDir)
+        if animated:
+            variants[CLIP] = _writeClip(path, tmpDir)
+    except BaseException:
+        for p in [tmpPath] + [v.path for v in variants.values()]:
+            if os.path.exists(p):
+                os.remove(p)
+        raise
+
+    return IngestedImage(digest, tmpPath, size, image.width(), image.height(), variants, dhash, recognition)
+
+
+def makeVariants(path: str, tmpDir: str) -> Tuple[int, int, Dict[str, Variant], int]:
+    """
+    为已经在存储中的图片生成预览版本，原图不重新编码，可以在工作进程中运行
+
+    返回 (原图宽, 原图高, 预览版本, 感知哈希)
+    """
+    image, _ = _readImage(path)
+    variants, dhash = _writeVariants(image, tmpDir)
+    if isAnimated(path):
+        try:
+            variants[CLIP] = _writeClip(path, tmpDir)
+        except BaseException:
+            for variant in variants.values():
+                os.remove(variant.path)
+            raise
+
+    return image.width(), image.height(), variants, dhash
+
+
+def storeImage(blobs, image: IngestedImage, refs: int = 1):
+    """
+    把处理好的图片移入存储并增加 refs 次引用
+
+    参数:
+        blobs: BlobStore
+        image: ingestFile() 的结果
+        refs (int): 增加的引用次数
+    """
+    blobs.adopt(image.path, image.digest, image.size, refs)
+    blobs.adoptVariants(image.digest, image.width, image.height, image.variants)
+    blobs.setHash(image.digest, image.dhash)
+
+
+def discardImage(image: IngestedImage):
+    """删除没有用到的处理结果"""
+    for path in image.tmpPaths():
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def backfill(store, workers: int = None, progress: Callable[[int, int], None] = None) -> int:
+    """
+    为还没有预览版本或感知哈希的图片补生成，返回处理的图片数量
+
+    参数:
+        store: LineupStore
+        workers (int): 进程数，默认为 CPU 核数
+        progress: 每处理一张调用一次，参数为 (已处理数量, 总数)
+    """
+    blobs = store.blobs
+    digests = [d for d in blobs.missingVariants() if blobs.exists(d)]
+    if not digests:
+        return 0
+
+    tmpDir = blobs.tmpDir()
+    workers = min(workers or os.cpu_count() or 1, len(digests))
+
+    done = 0
+    with ProcessPoolExecutor(workers, multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(makeVariants, blobs.path(d), tmpDir) for d in digests]
+        for digest, future in zip(digests, futures):
+            try:
+                width, height, variants, dhash = future.result()
+            except IngestError:
+                continue
+
+            blobs.adoptVariants(digest, width, height, variants)
+            blobs.setHash(digest, dhash)
+            done += 1
+            if progress:
+                progress(done, len(digests))
+
+    return done
+
+
+if __name__ == '__main__':
+    from common.lineup_store import lineupStore
+
+    count = backfill(lineupStore(), progress=lambda i, n: print(f"\r{i}/{n}", end="", flush=True))
+    print(f"\n已为 {count} 张图片生成预览版本和感知哈希")
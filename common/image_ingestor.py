@@ -0,0 +1,130 @@
+# coding:utf-8
+"""
+后台图片处理队列
+
+上传的截图交给进程池处理（见 common.image_ingest），完成后回到 GUI 线程移入图片存储并调用回调。
+大图的解码、旋转、重新编码都不在 GUI 进程中进行，同时上传多张图片也不会卡住界面。
+"""
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional, Set
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from common.image_ingest import IngestError, IngestedImage, discardImage, ingestFile, storeImage
+from common.lineup_store import lineupStore
+from common.screen_recognition import Recognition
+
+
+class IngestRequest:
+    """一次图片处理请求"""
+
+    def __init__(self, path: str, callback: Callable[[Optional[str], str], None]):
+        self.path = path
+        self.callback = callback
+        self.recognition = None     # type: Optional[Recognition]   # 处理完成后设置
+        self.cancelled = False
+
+    def cancel(self):
+        """取消请求，处理结果会被丢弃，回调不再调用"""
+        self.cancelled = True
+
+
+class ImageIngestor(QObject):
+    """图片处理队列，工作进程在第一次使用时启动"""
+
+    # (请求, IngestedImage 或 None, 错误信息)，从进程池的管理线程发出
+    _finished = pyqtSignal(object, object, str)
+
+    def __init__(self, workers: int = None, parent=None):
+        """
+        参数:
+            workers (int): 工作进程数，默认为 CPU 核数，最多 4 个
+            parent: 父对象，默认为None
+        """
+        super().__init__(parent)
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.pool = None        # type: Optional[ProcessPoolExecutor]
+        self._pending = set()   # type: Set[IngestRequest]
+        self._broken = False    # 有工作进程异常退出，下次请求时重新创建进程池
+        self._finished.connect(self._onFinished)
+
+    def ingest(self, path: str, callback: Callable[[Optional[str], str], None],
+               recognize: bool = False) -> IngestRequest:
+        """
+        处理一张图片并保存到存储中，图片持有一次引用
+
+        参数:
+            path (str): 源图片路径
+            callback: 在 GUI 线程中调用，参数为 (摘要, 错误信息)，失败时摘要为 None
+            recognize (bool): 是否同时识别截图中的地图和英雄，结果在回调前写入 request.recognition
+        """
+        if self.pool is None or self._broken:
+            # Qt 程序中 fork 不安全，使用 spawn 启动工作进程
+            self._broken = False
+            self.pool = ProcessPoolExecutor(self.workers, multiprocessing.get_context("spawn"))
+
+        request = IngestRequest(path, callback)
+        self._pending.add(request)
+
+        future = self.pool.submit(ingestFile, path, lineupStore().blobs.tmpDir(), recognize)
+        future.add_done_callback(lambda f, r=request: self._onDone(r, f))
+        return request
+
+    def pendingCount(self) -> int:
+        return len(self._pending)
+
+    def shutdown(self):
+        """停止工作进程，未开始的请求被丢弃"""
+        if self.pool is not None:
+            for request in self._pending:
+                request.cancel()
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def _onDone(self, request: IngestRequest, future: Future):
+        """在进程池的管理线程中调用，把结果转交给 GUI 线程"""
+        if future.cancelled():
+            return
+
+        image, error = None, ""
+        try:
+            image = future.result()
+        except IngestError as e:
+            error = str(e)
+        except BrokenProcessPool as e:
+            self._broken = True
+            error = f"图片处理失败: {e}"
+        except Exception as e:
+            error = f"图片处理失败: {e}"
+
+        try:
+            self._finished.emit(request, image, error)
+        except RuntimeError:
+            # 程序退出时队列可能已经被销毁
+            if image is not None:
+                discardImage(image)
+
+    def _onFinished(self, request: IngestRequest, image: Optional[IngestedImage], error: str):
+        self._pending.discard(request)
+
+        if request.cancelled:
+            if image is not None:
+                discardImage(image)
+        else:
+            digest = None
+            if image is not None:
+                try:
+                    storeImage(lineupStore().blobs, image)
+                    digest = image.digest
+                    request.recognition = image.recognition
+                except OSError as e:
+                    discardImage(image)
+                    error = f"无法保存图片: {e}"
+
+            request.callback(digest, error)
+
+
+imageIngestor = ImageIngestor()
@@ -0,0 +1,223 @@
+# coding:utf-8
+"""
+后台图片加载器
+
+在 QThreadPool 中解码 QImage（经过缩略图缓存），完成后回到 GUI 线程调用回调。
+每个请求都绑定一个接收控件：控件被销毁或隐藏时，排队中的请求会被取消；
+控件在滚动区域中时，滚动到可见区域以外也会取消，控件再次绘制时自行重新请求（见 isPending()）。
+请求可以指定优先级，预取（见 common.prefetch）使用较低的优先级，不会挡住界面正在等待的图片。
+loadPixmap() 额外经过进程内共享的 QPixmap 缓存，命中时不再解码。
+"""
+from typing import Callable, Dict, List, Optional
+
+from PyQt5.QtCore import QObject, QRunnable, QSize, QThreadPool, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QPixmap
+from PyQt5.QtWidgets import QAbstractScrollArea, QWidget
+
+from common.pixmap_cache import imageKey, pixmapCache
+from common.thumbnail_cache import thumbnailCache
+
+
+class ImageRequest:
+    """一次图片加载请求"""
+
+    def __init__(self, key: tuple, receiver: QWidget, callback: Callable[[QImage], None]):
+        self.key = key
+        self.receiverId = id(receiver)
+        self.callback = callback
+        self.cancelled = False
+
+
+class ImageLoadTask(QRunnable):
+    """在线程池中解码缩略图的任务，相同图片的请求共享一个任务"""
+
+    def __init__(self, key: tuple, loader: "ImageLoader"):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.key = key
+        self.loader = loader
+        self.priority = 0
+        self.requests = []  # type: List[ImageRequest]
+
+    def run(self):
+        path, size, dpr = self.key
+        image = thumbnailCache.load(path, QSize(*size), dpr)
+        try:
+            self.loader._taskFinished.emit(self, image)
+        except RuntimeError:
+            # 程序退出时加载器可能已经被销毁
+            pass
+
+
+class ImageLoader(QObject):
+    """异步图片加载器"""
+
+    _taskFinished = pyqtSignal(object, QImage)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(2, QThreadPool.globalInstance().maxThreadCount() - 1))
+
+        self._tasks = {}        # type: Dict[tuple, ImageLoadTask]
+        self._receivers = {}    # type: Dict[int, List[ImageRequest]]
+        self._widgets = {}      # type: Dict[int, QWidget]   # 有未完成请求、位于滚动区域中的控件
+        self._scrollAreas = set()   # 已经连接滚动信号的滚动区域
+        self._connected = set()     # 已经连接 destroyed 信号的控件
+        self._taskFinished.connect(self._onTaskFinished)
+
+        # 滚动后在下一次事件循环中检查一次，连续滚动时不重复检查
+        self._sweepTimer = QTimer(self)
+        self._sweepTimer.setSingleShot(True)
+        self._sweepTimer.timeout.connect(self._cancelScrolledAway)
+
+    def load(self, path: str, size: QSize, dpr: float, receiver: QWidget,
+             callback: Callable[[QImage], None], priority: int = 0) -> ImageRequest:
+        """
+        请求加载一张缩略图
+
+        参数:
+            path (str): 源图片路径
+            size (QSize): 目标逻辑尺寸
+            dpr (float): 设备像素比
+            receiver (QWidget): 接收图片的控件，销毁时自动取消请求
+            callback: 在 GUI 线程中调用，参数为解码后的 QImage（失败时为空图片）
+            priority (int): 线程池中的优先级，越大越先执行
+        """
+        key = imageKey(path, size, dpr)
+        request = ImageRequest(key, receiver, callback)
+
+        if request.receiverId not in self._connected:
+            # 滚动取消后控件会反复请求，destroyed 信号只连接一次
+            self._connected.add(request.receiverId)
+            receiver.destroyed.connect(
+                lambda *_, rid=request.receiverId: self._onReceiverDestroyed(rid))
+
+        self._receivers.setdefault(request.receiverId, []).append(request)
+        if isinstance(receiver, QWidget) and self._watchScrollAreas(receiver):
+            self._widgets[request.receiverId] = receiver
+
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = ImageLoadTask(key, self)
+            task.priority = priority
+            self.pool.start(task, priority)
+        elif priority > task.priority and self.pool.tryTake(task):
+            # 低优先级的预取任务还在排队，界面需要同一张图片时提到前面
+            task.priority = priority
+            self.pool.start(task, priority)
+
+        task.requests.append(request)
+        return request
+
+    def loadPixmap(self, path: str, size: QSize, dpr: float, receiver: QWidget,
+                   callback: Callable[[QPixmap], None], priority: int = 0) -> Optional[ImageRequest]:
+        """
+        请求加载一张缩略图并转换为 QPixmap，结果放入共享缓存
+
+        缓存命中时直接调用回调并返回 None，否则参数同 load()，
+        回调的参数为 QPixmap（失败时为空图片）
+        """
+        key = imageKey(path, size, dpr)
+        pixmap = pixmapCache.find(key)
+        if pixmap is not None:
+            callback(pixmap)
+            return None
+
+        def onImageLoaded(image: QImage):
+            # 同一张图片可能被多个请求方同时加载，只转换一次
+            if key in pixmapCache:
+                cached = pixmapCache.find(key)
+            else:
+                cached = QPixmap.fromImage(image)
+                pixmapCache.insert(key, cached)
+
+            callback(cached)
+
+        return self.load(path, size, dpr, receiver, onImageLoaded, priority)
+
+    def cancel(self, receiver: QWidget):
+        """取消控件所有未完成的请求"""
+        self._cancelReceiver(id(receiver))
+
+    def isPending(self, receiver: QWidget) -> bool:
+        """控件是否有未完成的请求"""
+        return bool(self._receivers.get(id(receiver)))
+
+    def _watchScrollAreas(self, receiver: QWidget) -> bool:
+        """连接控件所在滚动区域的滚动信号，返回控件是否在滚动区域中"""
+        found = False
+        parent = receiver.parentWidget()
+        while parent is not None:
+            if isinstance(parent, QAbstractScrollArea):
+                found = True
+                if id(parent) not in self._scrollAreas:
+                    self._scrollAreas.add(id(parent))
+                    parent.destroyed.connect(lambda *_, aid=id(parent): self._scrollAreas.discard(aid))
+                    for bar in (parent.horizontalScrollBar(), parent.verticalScrollBar()):
+                        bar.valueChanged.connect(self._scheduleSweep)
+            parent = parent.parentWidget()
+
+        return found
+
+    def _scheduleSweep(self):
+        if self._widgets and not self._sweepTimer.isActive():
+            self._sweepTimer.start(0)
+
+    def _cancelScrolledAway(self):
+        """取消已经滚动到可见区域以外的控件的请求"""
+        for receiverId, widget in list(self._widgets.items()):
+            if widget.visibleRegion().isEmpty():
+                self._cancelReceiver(receiverId)
+
+    def _onReceiverDestroyed(self, receiverId: int):
+        self._connected.discard(receiverId)
+        self._cancelReceiver(receiverId)
+
+    def _cancelReceiver(self, receiverId: int):
+        self._widgets.pop(receiverId, None)
+        for request in self._receivers.pop(receiverId, []):
+            request.cancelled = True
+
+            task = self._tasks.get(request.key)
+            if task is None:
+                continue
+
+            task.requests.remove(request)
+
+            if task.requests:
+                continue
+
+            # 没有请求方的任务如果还在排队就直接移出线程池
+            try:
+                if self.pool.tryTake(task):
+                    del self._tasks[request.key]
+            except RuntimeError:
+                # 程序退出时线程池可能已经被销毁
+                return
+
+    def _onTaskFinished(self, task: ImageLoadTask, image: QImage):
+        self._tasks.pop(task.key, None)
+
+        for request in task.requests:
+            if request.cancelled:
+                continue
+
+            requests = self._receivers.get(request.receiverId, [])
+            if request in requests:
+                requests.remove(request)
+            if not requests:
+                self._widgets.pop(request.receiverId, None)
+
+            request.callback(image)
+
+
+def placeholderImage(size: QSize, dpr: float = 1.0, color=QColor(0, 0, 0, 15)) -> QImage:
+    """生成纯色占位图，在真正的图片加载完成前显示"""
+    image = QImage(size * dpr, QImage.Format_ARGB32_Premultiplied)
+    image.fill(color)
+    image.setDevicePixelRatio(dpr)
+    return image
+
+
+imageLoader = ImageLoader()
@@ -0,0 +1,152 @@
+# coding:utf-8
+"""
+相似截图索引
+
+每张图片有一个 64 位感知哈希（见 image_ingest.dHash），两张图片哈希的汉明距离越小越相似。
+索引使用多索引哈希（multi-index hashing）：把哈希切成 4 段 16 位，每段一张哈希表。
+距离不超过 d 的两个哈希，至少有一段的距离不超过 d // 4（抽屉原理），
+所以查询时只需要在每张表中枚举距离不超过 d // 4 的段值，再对候选逐个计算完整距离。
+d = 10 时每次查询约 550 次字典查找，与图片总数基本无关。
+"""
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+from common.lineup_store import LineupStore, lineupStore
+
+HASH_BITS = 64
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+# 汉明距离不超过这个值视为近似重复（轻微裁剪、重新压缩、缩放）
+NEAR_DISTANCE = 10
+
+
+# Python 3.10 起 int 自带 bit_count()，比 bin().count() 快得多
+_popcount = getattr(int, "bit_count", None) or (lambda value: bin(value).count("1"))
+
+
+def hammingDistance(a: int, b: int) -> int:
+    return _popcount(a ^ b)
+
+
+def _chunks(dhash: int) -> List[int]:
+    return [(dhash >> (i * CHUNK_BITS)) & CHUNK_MASK for i in range(CHUNKS)]
+
+
+def _flipMasks(radius: int) -> List[int]:
+    """16 位内翻转不超过 radius 位的所有掩码，包括 0"""
+    masks = [0]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), r):
+            masks.append(sum(1 << b for b in bits))
+    return masks
+
+
+class HashIndex:
+    """内存中的感知哈希索引，支持按汉明距离查找"""
+
+    def __init__(self):
+        self._hashes = {}   # type: Dict[str, int]
+        # 每段一张表：段值 -> {摘要: 哈希}，候选直接带上完整哈希，不用再查一次
+        self._tables = [{} for _ in range(CHUNKS)]  # type: List[Dict[int, Dict[str, int]]]
+        self._masks = {}    # type: Dict[int, List[int]]    # 半径 -> 翻转掩码
+        self.lastId = 0     # 已读取的最大哈希编号
+
+    @classmethod
+    def fromStore(cls, store: LineupStore) -> "HashIndex":
+        """从数据库构建索引"""
+        index = cls()
+        index.refresh(store)
+        return index
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, digest: str):
+        return digest in self._hashes
+
+    def refresh(self, store: LineupStore):
+        """读取上次之后新写入的哈希（包括导入点位包等其它连接写入的）"""
+        for hashId, digest, dhash in store.blobs.iterHashes(self.lastId):
+            self.add(digest, dhash)
+            self.lastId = hashId
+
+    def hash(self, digest: str) -> Optional[int]:
+        return self._hashes.get(digest)
+
+    def add(self, digest: str, dhash: int):
+        """添加图片，已存在时按新的哈希更新"""
+        if digest in self._hashes:
+            self.remove(digest)
+
+        self._hashes[digest] = dhash
+        for table, chunk in zip(self._tables, _chunks(dhash)):
+            table.setdefault(chunk, {})[digest] = dhash
+
+    def remove(self, digest: str):
+        dhash = self._hashes.pop(digest, None)
+        if dhash is None:
+            return
+
+        for table, chunk in zip(self._tables, _chunks(dhash)):
+            bucket = table[chunk]
+            del bucket[digest]
+            if not bucket:
+                del table[chunk]
+
+    def near(self, dhash: int, maxDistance: int = NEAR_DISTANCE) -> List[Tuple[int, str]]:
+        """
+        查找汉明距离不超过 maxDistance 的图片
+
+        返回 (距离, 摘要) 列表，按距离排序
+        """
+        radius = maxDistance // CHUNKS
+        masks = self._masks.get(radius)
+        if masks is None:
+            masks = self._masks[radius] = _flipMasks(radius)
+
+        # 逐个探测的 Python 循环开销比查找本身大，批量交给 map/filter
+        candidates = {}
+        for table, chunk in zip(self._tables, _chunks(dhash)):
+            for bucket in filter(None, map(table.get, [chunk ^ mask for mask in masks])):
+                candidates.update(bucket)
+
+        results = [(_popcount(dhash ^ h), digest) for digest, h in candidates.items()]
+        return sorted(r for r in results if r[0] <= maxDistance)
+
+
+def nearDuplicateLineups(digest: str, map: str = None, hero: str = None,
+                         maxDistance: int = NEAR_DISTANCE) -> List[Tuple[int, int]]:
+    """
+    查找同一地图、同一英雄下图片与 digest 相似的已保存点位，地图或英雄为 None 时不限制
+
+    返回 (点位 id, 最小距离) 列表，按距离排序；图片还没有哈希时返回空列表
+    """
+    index = imageHashIndex()
+    dhash = index.hash(digest)
+    if dhash is None:
+        return []
+
+    distances = {d: distance for distance, d in index.near(dhash, maxDistance)}
+    store = lineupStore()
+    results = []
+    for lineupId in store.ids_with_images(distances, map=map, hero=hero):
+        images = store.get(lineupId).images.values()
+        results.append((lineupId, min(distances[d] for kind in images for d in kind if d in distances)))
+
+    results.sort(key=lambda item: (item[1], item[0]))
+    return results
+
+
+_index = None   # type: Optional[HashIndex]
+
+
+def imageHashIndex() -> HashIndex:
+    """全局相似图片索引，第一次使用时从数据库构建，之后每次访问时读取新增的哈希"""
+    global _index
+    if _index is None:
+        _index = HashIndex.fromStore(lineupStore())
+    else:
+        _index.refresh(lineupStore())
+    return _index
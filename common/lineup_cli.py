@@ -0,0 +1,307 @@
+# coding:utf-8
+"""
+点位查询命令行工具
+
+与图形界面使用同一份目录（hero.json / maps.json）和点位数据库，但不导入 PyQt5 和 qfluentwidgets，
+启动只需要几十毫秒，可以在脚本或直播叠加层中调用：
+
+    python -m common.lineup_cli query --map 亚海悬城 --hero Sova -t 天台 --format json
+    python -m common.lineup_cli count --by hero --map Ascent
+    python -m common.lineup_cli show 42
+    python -m common.lineup_cli export out.zip --map Ascent
+    python -m common.lineup_cli maps
+
+地图和英雄可以写英文名或中文名，攻防可以写 attack/defend 或 进攻/防守。
+结果默认输出为表格，--format json 输出一个 JSON 数组，--format jsonl 每行一个点位。
+"""
+import argparse
+import json
+import os
+import sys
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from common.catalog import SKILL_SLOTS, catalog
+from common.config import LINEUP_DB
+from common.lineup_store import (FACETS, IMAGE_KINDS, POSITION_KINDS, SIDES, TEXT_FIELDS,
+                                 Lineup, LineupStore)
+
+FORMATS = ("table", "json", "jsonl")
+
+# 表格中文本列的最大显示宽度（半角字符数）
+MAX_CELL_WIDTH = 24
+
+
+class CliError(Exception):
+    """参数无法解析，错误信息直接显示给用户"""
+
+
+# --- 参数 ---
+
+def resolveFilters(args) -> Dict[str, str]:
+    """把命令行的筛选参数转换为数据库中的取值"""
+    filters = {}
+    if args.map:
+        gameMap = catalog().map(args.map)
+        if gameMap is None:
+            raise CliError(f"未知地图: {args.map}")
+        filters["map"] = gameMap.name
+
+    if args.hero:
+        hero = catalog().hero(args.hero)
+        if hero is None:
+            raise CliError(f"未知英雄: {args.hero}")
+        filters["hero"] = hero.name
+
+    if args.skill:
+        filters["skill"] = args.skill.lower()
+
+    if args.side:
+        side = {text: key for key, text in SIDES.items()}.get(args.side, args.side)
+        if side not in SIDES:
+            raise CliError(f"未知攻防: {args.side}")
+        filters["side"] = side
+
+    return filters
+
+
+def findLineups(store: LineupStore, filters: dict, text: str = None,
+                limit: int = -1, offset: int = 0) -> List[Lineup]:
+    """
+    按筛选条件和搜索文本查找点位
+
+    有搜索文本时只为符合筛选条件且包含查询词的点位建立全文索引，结果按相关度排列；否则按 id 排列
+    """
+    if not text:
+        return store.query(limit=limit, offset=offset, **filters)
+
+    from common.lineup_search import LineupSearch
+
+    search = LineupSearch.fromStore(store, text, **filters)
+    results = search.search(text, limit=len(search) if limit < 0 else offset + limit)
+    return store.get_many(lineupId for lineupId, _ in results[offset:])
+
+
+# --- 输出 ---
+
+def lineupRecord(lineup: Lineup, store: LineupStore) -> dict:
+    """点位的 JSON 表示，附带中文名称和图片文件路径"""
+    c = catalog()
+    record = {"id": lineup.id}
+    record.update((f, getattr(lineup, f)) for f in FACETS)
+    record["labels"] = {
+        "map": c.mapLabel(lineup.map),
+        "hero": c.heroLabel(lineup.hero),
+        "skill": c.skillLabel(lineup.skill),
+        "side": SIDES.get(lineup.side, lineup.side),
+    }
+    record.update((f, getattr(lineup, f)) for f in TEXT_FIELDS)
+    record["positions"] = {kind: lineup.position(kind) for kind in POSITION_KINDS if lineup.position(kind)}
+    record["images"] = {kind: [{"digest": d, "path": store.blobs.path(d)} for d in digests]
+                        for kind, digests in lineup.images.items() if digests}
+    record["created_at"] = lineup.created_at
+    record["updated_at"] = lineup.updated_at
+    return record
+
+
+def displayWidth(text: str) -> int:
+    """终端中的显示宽度，全角字符占两列"""
+    return sum(2 if unicodedata.east_asian_width(ch) in "WF" else 1 for ch in text)
+
+
+def truncate(text: str, width: int) -> str:
+    if displayWidth(text) <= width:
+        return text
+
+    result, used = "", 0
+    for ch in text:
+        w = displayWidth(ch)
+        if used + w > width - 1:
+            break
+        result += ch
+        used += w
+    return result + "…"
+
+
+def formatTable(headers: Sequence[str], rows: Iterable[Sequence]) -> str:
+    """按显示宽度对齐的纯文本表格"""
+    rows = [[truncate(str(cell), MAX_CELL_WIDTH) for cell in row] for row in rows]
+    widths = [max([displayWidth(h)] + [displayWidth(row[i]) for row in rows]) for i, h in enumerate(headers)]
+
+    def line(cells):
+        return "  ".join(cell + " " * (w - displayWidth(cell)) for cell, w in zip(cells, widths)).rstrip()
+
+    return "\n".join([line(headers), line(["-" * w for w in widths])] + [line(row) for row in rows])
+
+
+def writeRecords(records: Iterable[dict], fmt: str, out):
+    """以 JSON 数组或 JSON Lines 输出，jsonl 逐行写出不需要先收集全部结果"""
+    if fmt == "jsonl":
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    else:
+        json.dump(list(records), out, ensure_ascii=False, indent=2)
+        out.write("\n")
+
+
+def writeLineups(lineups: List[Lineup], store: LineupStore, fmt: str, out):
+    if fmt != "table":
+        writeRecords((lineupRecord(lineup, store) for lineup in lineups), fmt, out)
+        return
+
+    c = catalog()
+    headers = ["ID", "地图", "英雄", "技能", "攻防"] + [IMAGE_KINDS[k] for k in ("stand", "aim", "land")]
+    rows = [[lineup.id, c.mapLabel(lineup.map), c.heroLabel(lineup.hero), c.skillLabel(lineup.skill),
+             SIDES.get(lineup.side, lineup.side), lineup.stand, lineup.aim, lineup.land]
+            for lineup in lineups]
+    out.write(formatTable(headers, rows) + "\n")
+
+
+# --- 子命令 ---
+
+def cmdQuery(args, store: LineupStore, out):
+    lineups = findLineups(store, resolveFilters(args), args.text, args.limit, args.offset)
+    writeLineups(lineups, store, args.format, out)
+
+
+def cmdShow(args, store: LineupStore, out):
+    lineups = store.get_many(args.ids)
+    missing = sorted(set(args.ids) - {lineup.id for lineup in lineups})
+    if missing:
+        raise CliError(f"点位不存在: {', '.join(map(str, missing))}")
+
+    if args.format != "table":
+        writeRecords((lineupRecord(lineup, store) for lineup in lineups), args.format, out)
+        return
+
+    for lineup in lineups:
+        record = lineupRecord(lineup, store)
+        labels = record["labels"]
+        out.write(f"#{lineup.id}  {labels['map']} · {labels['hero']} · {labels['skill']} · {labels['side']}\n")
+        for field in TEXT_FIELDS:
+            if record[field]:
+                out.write(f"  {field:<13}{record[field]}\n")
+        for kind, point in record["positions"].items():
+            out.write(f"  {kind + '_pos':<13}{point[0]:.3f}, {point[1]:.3f}\n")
+        for kind, images in record["images"].items():
+            for image in images:
+                out.write(f"  {kind + '_image':<13}{image['path']}\n")
+
+
+def cmdCount(args, store: LineupStore, out):
+    filters = resolveFilters(args)
+    if not args.by:
+        total = store.count(**filters)
+        if args.format == "table":
+            out.write(f"{total}\n")
+        else:
+            writeRecords([{"count": total}], args.format, out)
+        return
+
+    counts = store.count_by(args.by, **filters)
+    if args.format != "table":
+        writeRecords(({"value": k, "count": v} for k, v in counts.items()), args.format, out)
+        return
+
+    c = catalog()
+    label = {"map": c.mapLabel, "hero": c.heroLabel, "skill": c.skillLabel,
+             "side": lambda v: SIDES.get(v, v)}.get(args.by, str)
+    rows = sorted(counts.items(), key=lambda item: -item[1])
+    out.write(formatTable([args.by, "数量"], [[label(k), v] for k, v in rows]) + "\n")
+
+
+def cmdExport(args, store: LineupStore, out):
+    from common.lineup_pack import exportPack
+
+    filters = resolveFilters(args)
+    lineups = findLineups(store, filters, args.text) if args.text else None
+    try:
+        count = exportPack(args.path, store, lineups, **filters)
+    except OSError as e:
+        # 例如数据库引用的图片文件缺失，导出的临时文件已经删除
+        raise CliError(f"导出失败: {e}") from e
+    out.write(f"导出 {count} 个点位到 {args.path}\n")
+
+
+def cmdMaps(args, store: LineupStore, out):
+    counts = store.count_by("map")
+    records = [{"name": m.name, "chinese_name": m.chinese_name, "lineups": counts.get(m.name, 0)}
+               for m in catalog().maps]
+    if args.format != "table":
+        writeRecords(records, args.format, out)
+    else:
+        out.write(formatTable(["名称", "中文名", "点位"],
+                              [[r["name"], r["chinese_name"], r["lineups"]] for r in records]) + "\n")
+
+
+def cmdHeroes(args, store: LineupStore, out):
+    counts = store.count_by("hero")
+    records = [{"name": h.name, "chinese_name": h.chinese_name, "role": h.role,
+                "lineups": counts.get(h.name, 0)} for h in catalog().heroes]
+    if args.format != "table":
+        writeRecords(records, args.format, out)
+    else:
+        out.write(formatTable(["名称", "中文名", "定位", "点位"],
+                              [[r["name"], r["chinese_name"], r["role"], r["lineups"]] for r in records]) + "\n")
+
+
+def buildParser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m common.lineup_cli", description="查询和导出点位")
+    parser.add_argument("--db", default=LINEUP_DB, help="点位数据库路径，图片目录为同一目录下的 blobs")
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--format", choices=FORMATS, default="table", help="输出格式")
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("--map", help="地图（英文名或中文名）")
+    filters.add_argument("--hero", help="英雄（英文名、中文名或编号）")
+    filters.add_argument("--skill", type=str.lower, choices=SKILL_SLOTS, help="技能按键")
+    filters.add_argument("--side", help="attack/defend 或 进攻/防守")
+
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    query = commands.add_parser("query", parents=[common, filters], help="查询点位")
+    query.add_argument("-t", "--text", help="在站位、描点、落点和备注中搜索")
+    query.add_argument("--limit", type=int, default=50, help="最多输出的数量，-1 表示不限制")
+    query.add_argument("--offset", type=int, default=0)
+    query.set_defaults(run=cmdQuery)
+
+    show = commands.add_parser("show", parents=[common], help="显示点位详情")
+    show.add_argument("ids", type=int, nargs="+", metavar="ID")
+    show.set_defaults(run=cmdShow)
+
+    count = commands.add_parser("count", parents=[common, filters], help="统计点位数量")
+    count.add_argument("--by", choices=FACETS, help="按字段分组统计")
+    count.set_defaults(run=cmdCount)
+
+    export = commands.add_parser("export", parents=[filters], help="导出点位包")
+    export.add_argument("path", help="输出的 .zip 文件")
+    export.add_argument("-t", "--text", help="只导出搜索到的点位")
+    export.set_defaults(run=cmdExport)
+
+    commands.add_parser("maps", parents=[common], help="列出地图").set_defaults(run=cmdMaps)
+    commands.add_parser("heroes", parents=[common], help="列出英雄").set_defaults(run=cmdHeroes)
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None, out=None) -> int:
+    parser = buildParser()
+    args = parser.parse_args(argv)
+    out = out or sys.stdout
+
+    store = LineupStore(args.db, os.path.join(os.path.dirname(os.path.abspath(args.db)), "blobs"))
+    try:
+        args.run(args, store, out)
+    except CliError as e:
+        parser.error(str(e))
+    except BrokenPipeError:
+        # 输出被 head 等命令提前关闭
+        sys.stderr.close()
+    finally:
+        store.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+# coding:utf-8
+"""
+点位分面索引
+
+每个筛选字段 (map/hero/skill/side) 的每个取值对应一个位图（用 Python 整数表示，
+第 i 位为 1 表示 id 为 i 的点位具有该取值）。任意筛选组合都只是几次按位与，
+各取值的数量统计也不需要重新扫描数据库。
+"""
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from common.lineup_store import FACETS, LineupStore, lineupStore
+
+
+class LineupIndex:
+    """内存中的点位分面索引，启动时从数据库加载一次，保存点位时增量更新"""
+
+    def __init__(self):
+        # 字段 -> 取值 -> 位图
+        self._postings = {facet: {} for facet in FACETS}   # type: Dict[str, Dict[str, int]]
+        # 点位 id -> (map, hero, skill, side)
+        self._facets = {}   # type: Dict[int, Tuple[str, str, str, str]]
+        self._all = 0
+
+    @classmethod
+    def fromStore(cls, store: LineupStore) -> "LineupIndex":
+        """从数据库构建索引"""
+        index = cls()
+
+        # 先按取值收集 id，再一次性转换成位图，避免逐个置位时反复复制大整数
+        ids = {facet: {} for facet in FACETS}
+        for lineupId, *values in store.iter_facets():
+            index._facets[lineupId] = tuple(values)
+            for facet, value in zip(FACETS, values):
+                ids[facet].setdefault(value, []).append(lineupId)
+
+        for facet in FACETS:
+            for value, valueIds in ids[facet].items():
+                index._postings[facet][value] = bitmapFromIds(valueIds)
+
+        index._all = bitmapFromIds(index._facets)
+        return index
+
+    def __len__(self):
+        return len(self._facets)
+
+    def add(self, lineupId: int, map: str, hero: str, skill: str, side: str):
+        """添加点位，已存在时按新的取值更新"""
+        if lineupId in self._facets:
+            self.remove(lineupId)
+
+        bit = 1 << lineupId
+        values = (map, hero, skill, side)
+        for facet, value in zip(FACETS, values):
+            postings = self._postings[facet]
+            postings[value] = postings.get(value, 0) | bit
+
+        self._facets[lineupId] = values
+        self._all |= bit
+
+    def remove(self, lineupId: int):
+        """移除点位"""
+        values = self._facets.pop(lineupId, None)
+        if values is None:
+            return
+
+        mask = ~(1 << lineupId)
+        for facet, value in zip(FACETS, values):
+            postings = self._postings[facet]
+            postings[value] &= mask
+            if not postings[value]:
+                del postings[value]
+
+        self._all &= mask
+
+    def match(self, **filters) -> int:
+        """
+        返回符合筛选条件的点位位图
+
+        参数:
+            filters: map/hero/skill/side 的取值，值为 None 的条件会被忽略
+        """
+        bitmap = self._all
+        for facet, value in filters.items():
+            if value is None:
+                continue
+
+            if facet not in self._postings:
+                raise ValueError(f"不支持的筛选条件: {facet}")
+
+            bitmap &= self._postings[facet].get(value, 0)
+            if not bitmap:
+                break
+
+        return bitmap
+
+    def count(self, **filters) -> int:
+        """统计符合条件的点位数量"""
+        return self.match(**filters).bit_count()
+
+    def ids(self, **filters) -> List[int]:
+        """符合条件的点位 id，从小到大排列"""
+        return list(iterBits(self.match(**filters)))
+
+    def counts(self, facet: str, **filters) -> Dict[str, int]:
+        """
+        在其余筛选条件下，统计 facet 每个取值的点位数量
+
+        例如 counts("hero", map="Ascent") 返回该地图上每个英雄的点位数；
+        facet 自身的筛选条件会被忽略，数量为 0 的取值不会出现在结果中
+        """
+        filters.pop(facet, None)
+        base = self.match(**filters)
+
+        result = {}
+        for value, bitmap in self._postings[facet].items():
+            n = (bitmap & base).bit_count()
+            if n:
+                result[value] = n
+
+        return result
+
+
+def bitmapFromIds(ids) -> int:
+    """把一组 id 转换成位图"""
+    ids = list(ids)
+    if not ids:
+        return 0
+
+    data = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        data[i >> 3] |= 1 << (i & 7)
+
+    return int.from_bytes(data, "little")
+
+
+def iterBits(bitmap: int) -> Iterator[int]:
+    """按从小到大的顺序遍历位图中为 1 的位"""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for offset, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            yield (offset << 3) + low.bit_length() - 1
+            byte ^= low
+
+
+_index = None   # type: Optional[LineupIndex]
+
+
+def lineupIndex() -> LineupIndex:
+    """返回进程内共享的点位索引，第一次调用时从数据库加载"""
+    global _index
+    if _index is None:
+        _index = LineupIndex.fromStore(lineupStore())
+
+    return _index
@@ -0,0 +1,440 @@
+# coding:utf-8
+"""
+点位包的导入与导出
+
+点位包是一个 zip 文件：
+    manifest.jsonl     第一行是包头，之后每行一个点位（JSON）
+    images/<摘要>      站位、描点、落点图片，按内容的 SHA-256 命名，同一张图片只保存一份
+
+导出和导入都是流式的：图片逐个分块复制，清单逐行读写，几个 GB 的点位包也不会整个读进内存。
+导入时图片的摘要校验、解码和缩小版本的生成在多个进程中并行进行，所有新点位在一个事务中批量写入；
+本地已经有的点位（内容完全相同）和图片不会重复保存。
+
+本模块不导入 Qt，图片解码只在工作进程中按需导入 QtGui。
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from common.catalog import SKILL_SLOTS, catalog
+from common.image_ingest import IngestError, makeVariants
+from common.lineup_store import FACETS, IMAGE_KINDS, POSITION_KINDS, SIDES, TEXT_FIELDS, Lineup, LineupStore
+
+PACK_FORMAT = "valorant-lineup-pack"
+PACK_VERSION = 1
+
+MANIFEST_NAME = "manifest.jsonl"
+IMAGE_PREFIX = "images/"
+
+CHUNK_SIZE = 1024 * 1024
+
+# 导入时每批处理的点位数量，每批的新图片并行校验
+IMPORT_BATCH_SIZE = 256
+
+# 清单超过这个大小时写到临时文件中
+MANIFEST_SPOOL_SIZE = 8 * 1024 * 1024
+
+_DIGEST_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+class PackError(Exception):
+    """点位包格式错误"""
+
+
+@dataclass
+class ImportResult:
+    """导入结果"""
+    imported: List[int] = field(default_factory=list)    # 新点位的 id
+    duplicates: int = 0                                  # 本地已有或包内重复的点位
+    invalid: List[Tuple[int, str]] = field(default_factory=list)   # (清单行号, 原因)
+    images_added: int = 0                                # 新保存的图片
+    images_reused: int = 0                               # 本地已有的图片
+
+    def summary(self) -> str:
+        text = f"导入 {len(self.imported)} 个点位，跳过重复 {self.duplicates} 个"
+        if self.invalid:
+            text += f"，无效 {len(self.invalid)} 个"
+        return text + f"；新增图片 {self.images_added} 张，复用 {self.images_reused} 张"
+
+
+def lineupFingerprint(lineup: Lineup) -> str:
+    """点位内容的指纹，分面、文本和图片都相同的点位视为同一个"""
+    data = [getattr(lineup, f) for f in FACETS + TEXT_FIELDS]
+    data.append(sorted((kind, list(images)) for kind, images in lineup.images.items() if images))
+    return hashlib.sha1(json.dumps(data, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+# --- 导出 ---
+
+def lineupRecord(lineup: Lineup) -> dict:
+    record = {f: getattr(lineup, f) for f in FACETS + TEXT_FIELDS}
+    record["created_at"] = lineup.created_at
+    record["images"] = {kind: images for kind, images in lineup.images.items() if images}
+
+    positions = {kind: list(lineup.position(kind)) for kind in POSITION_KINDS if lineup.position(kind)}
+    if positions:
+        record["positions"] = positions
+    return record
+
+
+def exportPack(path: str, store: LineupStore, lineups: Iterable[Lineup] = None,
+               progress: Callable[[int], None] = None, **filters) -> int:
+    """
+    导出点位包，返回导出的点位数量
+
+    参数:
+        path (str): 输出文件路径，写完后才替换已有文件
+        store: 点位数据库
+        lineups: 要导出的点位，默认导出符合 filters 的所有点位
+        progress: 每导出一个点位调用一次，参数为已导出的数量
+        filters: 筛选条件，同 LineupStore.query()
+    """
+    if lineups is None:
+        lineups = store.iter_lineups(**filters)
+
+    tmpPath = f"{path}.{os.getpid()}.tmp"
+    count = 0
+    written = set()     # type: Set[str]
+    try:
+        with zipfile.ZipFile(tmpPath, "w") as pack, \
+                tempfile.SpooledTemporaryFile(MANIFEST_SPOOL_SIZE) as manifest:
+            for lineup in lineups:
+                for images in lineup.images.values():
+                    for digest in images:
+                        if digest not in written:
+                            _writeImage(pack, store, digest)
+                            written.add(digest)
+
+                manifest.write(json.dumps(lineupRecord(lineup), ensure_ascii=False).encode("utf-8") + b"\n")
+                count += 1
+                if progress:
+                    progress(count)
+
+            # 包头需要点位数量，所以清单最后写入
+            header = {"format": PACK_FORMAT, "version": PACK_VERSION,
+                      "created_at": time.time(), "lineups": count, "images": len(written)}
+            info = zipfile.ZipInfo(MANIFEST_NAME, time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with pack.open(info, "w", force_zip64=True) as out:
+                out.write(json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n")
+                manifest.seek(0)
+                shutil.copyfileobj(manifest, out, CHUNK_SIZE)
+
+        os.replace(tmpPath, path)
+    except BaseException:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+
+    return count
+
+
+def _writeImage(pack: zipfile.ZipFile, store: LineupStore, digest: str):
+    """图片已经是压缩格式，直接存储不再压缩"""
+    info = zipfile.ZipInfo(IMAGE_PREFIX + digest, time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    with open(store.blobs.path(digest), "rb") as src, pack.open(info, "w", force_zip64=True) as out:
+        shutil.copyfileobj(src, out, CHUNK_SIZE)
+
+
+# --- 导入 ---
+
+def parseRecord(record) -> Lineup:
+    """校验清单中的一行并转换为点位，格式错误时抛出 ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError("不是 JSON 对象")
+
+    values = {}
+    for name in FACETS + TEXT_FIELDS:
+        value = record.get(name, "")
+        if not isinstance(value, str):
+            raise ValueError(f"字段 {name} 不是字符串")
+        values[name] = value
+
+    if catalog().map(values["map"]) is None:
+        raise ValueError(f"未知地图 {values['map']}")
+    if catalog().hero(values["hero"]) is None:
+        raise ValueError(f"未知英雄 {values['hero']}")
+    if values["skill"] not in SKILL_SLOTS:
+        raise ValueError(f"未知技能 {values['skill']}")
+    if values["side"] not in SIDES:
+        raise ValueError(f"未知攻防 {values['side']}")
+
+    images = record.get("images") or {}
+    if not isinstance(images, dict):
+        raise ValueError("images 不是对象")
+    for kind, digests in images.items():
+        if kind not in IMAGE_KINDS:
+            raise ValueError(f"未知图片类型 {kind}")
+        if not isinstance(digests, list) or not all(
+                isinstance(d, str) and _DIGEST_PATTERN.fullmatch(d) for d in digests):
+            raise ValueError(f"图片 {kind} 的摘要格式错误")
+
+    createdAt = record.get("created_at") or 0.0
+    if not isinstance(createdAt, (int, float)):
+        raise ValueError("created_at 不是数字")
+
+    lineup = Lineup(images={k: list(v) for k, v in images.items() if v}, created_at=float(createdAt), **values)
+
+    # 旧版本的点位包没有坐标
+    positions = record.get("positions") or {}
+    if not isinstance(positions, dict):
+        raise ValueError("positions 不是对象")
+    for kind, position in positions.items():
+        if kind not in POSITION_KINDS:
+            raise ValueError(f"未知坐标类型 {kind}")
+        if not (isinstance(position, list) and len(position) == 2 and all(
+                isinstance(v, (int, float)) and 0 <= v <= 1 for v in position)):
+            raise ValueError(f"坐标 {kind} 格式错误")
+        lineup.set_position(kind, (float(position[0]), float(position[1])))
+
+    return lineup
+
+
+_packs = {}     # 工作进程中打开的点位包，路径 -> ZipFile
+
+
+def _validateImage(packPath: str, digest: str, tmpDir: str) -> Tuple[str, Optional[tuple], str]:
+    """
+    在工作进程中运行：把图片解压到 tmpDir，校验摘要，解码并生成缩小版本
+
+    返回 (摘要, 暂存信息, 错误信息)，暂存信息为 (临时文件, 文件大小, 宽, 高, 缩小版本, 感知哈希)，
+    失败时为 None
+    """
+    pack = _packs.get(packPath)
+    if pack is None:
+        pack = _packs[packPath] = zipfile.ZipFile(packPath)
+
+    tmpPath = os.path.join(tmpDir, uuid.uuid4().hex)
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with pack.open(IMAGE_PREFIX + digest) as src, open(tmpPath, "wb") as out:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+
+        if hasher.hexdigest() != digest:
+            raise IngestError("图片内容与摘要不符")
+
+        width, height, variants, dhash = makeVariants(tmpPath, tmpDir)
+    except IngestError as e:
+        error = str(e)
+    except (KeyError, OSError, zipfile.BadZipFile) as e:
+        error = f"无法读取图片: {e}"
+    else:
+        return digest, (tmpPath, size, width, height, variants, dhash), ""
+
+    if os.path.exists(tmpPath):
+        os.remove(tmpPath)
+    return digest, None, error
+
+
+def _readHeader(manifest) -> dict:
+    try:
+        header = json.loads(manifest.readline())
+    except ValueError as e:
+        raise PackError("清单第一行不是有效的包头") from e
+
+    if not isinstance(header, dict) or header.get("format") != PACK_FORMAT:
+        raise PackError("不是点位包")
+    try:
+        version, header["lineups"] = int(header.get("version", 0)), int(header.get("lineups", 0))
+    except (TypeError, ValueError) as e:
+        raise PackError("点位包头部无效") from e
+    if version > PACK_VERSION:
+        raise PackError(f"点位包版本 {version} 过新，请升级程序")
+
+    return header
+
+
+def importPack(path: str, store: LineupStore, workers: int = None,
+               progress: Callable[[int, int], None] = None) -> ImportResult:
+    """
+    导入点位包
+
+    参数:
+        path (str): 点位包路径
+        store: 点位数据库（只能在创建它的线程中使用）
+        workers (int): 校验图片的进程数，默认为 CPU 核数，1 表示在当前进程中校验
+        progress: 每处理一批点位调用一次，参数为 (已处理的点位数, 点位总数)
+    """
+    try:
+        pack = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as e:
+        raise PackError("点位包不是有效的 zip 文件") from e
+
+    try:
+        manifest = pack.open(MANIFEST_NAME)
+    except KeyError as e:
+        pack.close()
+        raise PackError("不是点位包") from e
+
+    result = ImportResult()
+    with pack, manifest:
+        header = _readHeader(manifest)
+        total = header["lineups"]
+
+        # 本地已有点位的指纹，用于去重
+        known = {lineupFingerprint(lineup) for lineup in store.iter_lineups()}
+
+        importer = _Importer(path, store, workers or os.cpu_count() or 1, result)
+        try:
+            lineNo, batch = 1, []
+            for line in manifest:
+                lineNo += 1
+                if not line.strip():
+                    continue
+
+                try:
+                    lineup = parseRecord(json.loads(line))
+                except ValueError as e:
+                    result.invalid.append((lineNo, str(e)))
+                    continue
+
+                fingerprint = lineupFingerprint(lineup)
+                if fingerprint in known:
+                    result.duplicates += 1
+                    continue
+
+                known.add(fingerprint)
+                batch.append((lineNo, lineup))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    importer.validate(batch)
+                    batch = []
+                    if progress:
+                        progress(lineNo - 1, total)
+
+            importer.validate(batch)
+            importer.commit()
+        finally:
+            importer.close()
+
+    result.invalid.sort()
+
+    if progress:
+        progress(total, total)
+
+    return result
+
+
+class _Importer:
+    """
+    导入过程的状态
+
+    每批点位的新图片交给进程池并行校验，校验通过的图片和它的缩小版本先放在存储的临时目录中，
+    所有点位和图片引用最后在一个事务中写入
+    """
+
+    def __init__(self, packPath: str, store: LineupStore, workers: int, result: ImportResult):
+        self.packPath = packPath
+        self.store = store
+        self.workers = workers
+        self.result = result
+        self.pool = None    # type: Optional[ProcessPoolExecutor]
+
+        self.lineups = []   # type: List[Lineup]
+        self.staged = {}    # type: Dict[str, tuple]              # 摘要 -> _validateImage() 的暂存信息
+        self.failed = {}    # type: Dict[str, str]                # 摘要 -> 错误信息
+        self.local = set()  # type: Set[str]                      # 本地已有的摘要
+
+    def _isLocal(self, digest: str) -> bool:
+        if digest in self.local:
+            return True
+        if self.store.blobs.refcount(digest) > 0 and self.store.blobs.exists(digest):
+            self.local.add(digest)
+            return True
+        return False
+
+    def validate(self, batch: List[Tuple[int, Lineup]]):
+        """校验一批点位引用的新图片，图片有问题的点位记为无效"""
+        pending = {
+            digest
+            for _, lineup in batch
+            for images in lineup.images.values()
+            for digest in images
+            if digest not in self.staged and digest not in self.failed and not self._isLocal(digest)
+        }
+
+        tmpDir = self.store.blobs.tmpDir()
+        if len(pending) > 1 and self.workers > 1:
+            if self.pool is None:
+                # Qt 程序中 fork 不安全，使用 spawn 启动工作进程
+                self.pool = ProcessPoolExecutor(self.workers, multiprocessing.get_context("spawn"))
+            outcomes = self.pool.map(_validateImage, *zip(*[(self.packPath, d, tmpDir) for d in pending]))
+        else:
+            outcomes = (_validateImage(self.packPath, d, tmpDir) for d in pending)
+
+        for digest, staged, error in outcomes:
+            if error:
+                self.failed[digest] = error
+            else:
+                self.staged[digest] = staged
+
+        for lineNo, lineup in batch:
+            errors = [self.failed[d] for images in lineup.images.values() for d in images if d in self.failed]
+            if errors:
+                self.result.invalid.append((lineNo, errors[0]))
+            else:
+                self.lineups.append(lineup)
+
+    def commit(self):
+        """在一个事务中写入所有点位、移入新图片并更新引用计数"""
+        refs = Counter(digest for lineup in self.lineups
+                       for images in lineup.images.values() for digest in images)
+
+        adopted = []
+        try:
+            with self.store.transaction() as cursor:
+                for digest, count in refs.items():
+                    if digest in self.staged:
+                        tmpPath, size, width, height, variants, dhash = self.staged.pop(digest)
+                        adopted.append((digest, variants))
+                        self.store.blobs.adopt(tmpPath, digest, size, count)
+                        self.store.blobs.adoptVariants(digest, width, height, variants)
+                        self.store.blobs.setHash(digest, dhash)
+                    else:
+                        self.store.blobs.incref(digest, count)
+
+                self.result.imported = self.store.insert_rows(cursor, self.lineups)
+        except BaseException:
+            # 事务已回滚，移入的图片没有引用记录，删除文件
+            for digest, variants in adopted:
+                if self.store.blobs.refcount(digest) == 0:
+                    paths = [self.store.blobs.path(digest)]
+                    paths += [self.store.blobs.variantPath(digest, v) for v in variants]
+                    paths += [v.path for v in variants.values()]
+                    for path in paths:
+                        if os.path.exists(path):
+                            os.remove(path)
+            self.result.imported = []
+            raise
+
+        self.result.images_added = len(adopted)
+        self.result.images_reused = len(refs) - len(adopted)
+
+    def close(self):
+        """关闭进程池，删除没有用到的临时文件"""
+        if self.pool is not None:
+            self.pool.shutdown()
+
+        for tmpPath, _, _, _, variants, _ in self.staged.values():
+            for path in [tmpPath] + [v.path for v in variants.values()]:
+                if os.path.exists(path):
+                    os.remove(path)
+        self.staged.clear()
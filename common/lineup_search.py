@@ -0,0 +1,237 @@
+# coding:utf-8
+"""
+点位全文搜索
+
+站位、描点、落点及其详情和备注都是中文自由文本，这里不依赖分词库，
+直接按字符二元组 (bigram) 建立倒排索引：查询词拆成二元组后求倒排表交集，
+再用原文校验子串确实出现，按 BM25 打分排序。单个字符的查询使用一元组索引。
+"""
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from common.lineup_store import Lineup, LineupStore, lineupStore
+
+# 参与搜索的字段及其权重，名称比详情和备注更重要
+FIELD_WEIGHTS = {
+    "stand": 2.0,
+    "stand_detail": 1.0,
+    "aim": 2.0,
+    "aim_detail": 1.0,
+    "land": 2.0,
+    "land_detail": 1.0,
+    "note": 1.0,
+}
+
+# BM25 参数
+K1 = 1.2
+B = 0.75
+
+_RUN_PATTERN = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """全角转半角、统一小写"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def ngrams(run: str) -> List[str]:
+    """一段连续文字的一元组和二元组"""
+    grams = list(run)
+    grams.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+
+def queryGrams(term: str) -> List[str]:
+    """查询词用于求交集的 n-gram：长度为 1 时用一元组，否则用二元组"""
+    if len(term) == 1:
+        return [term]
+    return list(dict.fromkeys(term[i:i + 2] for i in range(len(term) - 1)))
+
+
+class LineupSearch:
+    """点位全文索引，支持增量添加和删除"""
+
+    def __init__(self):
+        # n-gram -> {点位 id: 加权词频}
+        self._postings = {}     # type: Dict[str, Dict[int, float]]
+        # 点位 id -> 该点位的 n-gram 集合，用于删除
+        self._docGrams = {}     # type: Dict[int, Set[str]]
+        # 点位 id -> 规范化后的各字段文本，每个字段前加换行符拼成一个字符串
+        self._docTexts = {}     # type: Dict[int, str]
+        self._docLengths = {}   # type: Dict[int, float]
+        self._totalLength = 0.0
+
+    @classmethod
+    def fromStore(cls, store: LineupStore, query: str = None, **filters) -> "LineupSearch":
+        """
+        从数据库构建索引
+
+        参数:
+            store: 点位数据库
+            query (str): 只执行一次搜索时传入查询文本，只索引包含全部查询词的点位，
+                建立索引的开销与匹配数量成正比；相关度的统计量也只在这些点位中计算
+            filters: 筛选条件，同 LineupStore.query()，只索引符合条件的点位
+        """
+        search = cls()
+        terms = _RUN_PATTERN.findall(normalize(query)) if query else []
+        for lineupId, *texts in store.iter_texts(FIELD_WEIGHTS, **filters):
+            if terms:
+                joined = normalize("\n".join(t or "" for t in texts))
+                if not all(term in joined for term in terms):
+                    continue
+
+            search.add(lineupId, dict(zip(FIELD_WEIGHTS, texts)))
+
+        return search
+
+    def __len__(self):
+        return len(self._docTexts)
+
+    def addLineup(self, lineup: Lineup):
+        self.add(lineup.id, {f: getattr(lineup, f) for f in FIELD_WEIGHTS})
+
+    def add(self, lineupId: int, fields: Dict[str, str]):
+        """
+        添加或更新一个点位
+
+        参数:
+            lineupId (int): 点位 id
+            fields (dict): 字段名 -> 文本，只索引 FIELD_WEIGHTS 中的字段
+        """
+        if lineupId in self._docTexts:
+            self.remove(lineupId)
+
+        texts = tuple(normalize(fields.get(f) or "") for f in FIELD_WEIGHTS)
+        freqs = Counter()
+        for text, weight in zip(texts, FIELD_WEIGHTS.values()):
+            for run in _RUN_PATTERN.findall(text):
+                for gram in ngrams(run):
+                    freqs[gram] += weight
+
+        for gram, tf in freqs.items():
+            self._postings.setdefault(gram, {})[lineupId] = tf
+
+        length = sum(freqs.values())
+        self._docGrams[lineupId] = set(freqs)
+        self._docTexts[lineupId] = "".join("\n" + text for text in texts)
+        self._docLengths[lineupId] = length
+        self._totalLength += length
+
+    def remove(self, lineupId: int):
+        """从索引中删除点位"""
+        grams = self._docGrams.pop(lineupId, None)
+        if grams is None:
+            return
+
+        for gram in grams:
+            postings = self._postings[gram]
+            del postings[lineupId]
+            if not postings:
+                del self._postings[gram]
+
+        del self._docTexts[lineupId]
+        self._totalLength -= self._docLengths.pop(lineupId)
+
+    def search(self, query: str, limit: int = 50,
+               within: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """
+        搜索点位，返回按相关度从高到低排列的 (点位 id, 分数)
+
+        参数:
+            query (str): 查询文本，空格分隔的多个词需要同时匹配；每个词按子串匹配，
+                因此也支持前缀匹配，字段以查询词开头的点位排名更靠前
+            limit (int): 最多返回的数量
+            within: 只在这些点位中搜索，例如分面索引筛选出的结果
+        """
+        terms = _RUN_PATTERN.findall(normalize(query))
+        if not terms or not self._docTexts:
+            return []
+
+        scores = None   # type: Optional[Dict[int, float]]
+        for term in terms:
+            if scores is None:
+                candidates = set(within) if within is not None else None
+                scores = self._searchTerm(term, candidates)
+            else:
+                termScores = self._searchTerm(term, scores.keys())
+                scores = {doc: scores[doc] + score for doc, score in termScores.items()}
+
+            if not scores:
+                return []
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    def _searchTerm(self, term: str, candidates) -> Dict[int, float]:
+        """单个查询词的匹配与打分，candidates 为 None 表示不限制"""
+        grams = queryGrams(term)
+        postings = [self._postings.get(gram) for gram in grams]
+        if not all(postings):
+            return {}
+
+        # 从最短的倒排表开始求交集
+        postings.sort(key=len)
+        docs = set(postings[0])
+        for p in postings[1:]:
+            docs.intersection_update(p)
+            if not docs:
+                return {}
+
+        if candidates is not None:
+            docs.intersection_update(candidates)
+            if not docs:
+                return {}
+
+        n = len(self._docTexts)
+        avgLength = self._totalLength / n if n else 1.0
+        idfs = [math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for p in postings]
+
+        # 按词长判断：重复字符的词（如“烟烟烟”）去重后只剩一个二元组，同样需要校验
+        verify = len(term) > 2
+        prefix = "\n" + term
+        docTexts, docLengths = self._docTexts, self._docLengths
+        weighted = list(zip(postings, [idf * (K1 + 1) for idf in idfs]))
+        normA, normB = K1 * (1 - B), K1 * B / avgLength
+
+        scores = {}
+        for doc in docs:
+            text = docTexts[doc]
+
+            # 二元组都出现不代表整个词连续出现，用原文校验
+            if verify and term not in text:
+                continue
+
+            norm = normA + normB * docLengths[doc]
+            score = 0.0
+            for p, idf in weighted:
+                tf = p[doc]
+                score += idf * tf / (tf + norm)
+
+            # 某个字段以查询词开头时提高排名
+            if prefix in text:
+                score *= 1.5
+
+            scores[doc] = score
+
+        return scores
+
+
+_search = None  # type: Optional[LineupSearch]
+
+
+def lineupSearch() -> LineupSearch:
+    """返回进程内共享的全文索引，第一次调用时从数据库加载"""
+    global _search
+    if _search is None:
+        _search = LineupSearch.fromStore(lineupStore())
+
+    return _search
+
+
+def indexLineup(lineup: Lineup):
+    """保存点位后增量更新全文索引；索引还没加载时不需要处理，加载时会读到新点位"""
+    if _search is not None:
+        _search.addLineup(lineup)
@@ -0,0 +1,189 @@
+# coding:utf-8
+"""
+点位坐标的空间索引
+
+每张地图的站位和落点各有一个均匀网格：地图图片划分为 GRID_SIZE x GRID_SIZE 个格子，
+每个格子记录坐标落在其中的点位。圆形或矩形范围查询只检查与范围相交的格子，
+鼠标悬停、点击时查找最近的标记也不需要遍历地图上的所有点位。
+
+坐标是相对地图图片宽高的 0~1。地图图片都是 16:9，计算距离时 y 乘以 MAP_ASPECT，
+所以距离和半径都以地图宽度为单位。本模块不依赖 Qt。
+"""
+import math
+from typing import Container, Dict, Iterator, List, Optional, Tuple
+
+from common.lineup_store import POSITION_KINDS, Lineup, LineupStore, lineupStore
+
+GRID_SIZE = 32
+
+# 地图图片的高宽比
+MAP_ASPECT = 9 / 16
+
+Point = Tuple[float, float]
+
+
+class PositionGrid:
+    """一张地图上一种坐标的均匀网格"""
+
+    def __init__(self, size: int = GRID_SIZE):
+        self.size = size
+        self._cells = {}    # type: Dict[Tuple[int, int], Dict[int, Point]]
+        self._points = {}   # type: Dict[int, Point]
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return (min(max(int(x * self.size), 0), self.size - 1),
+                min(max(int(y * self.size), 0), self.size - 1))
+
+    def add(self, lineupId: int, x: float, y: float):
+        """添加点位，已存在时移动到新坐标"""
+        if lineupId in self._points:
+            self.remove(lineupId)
+
+        self._points[lineupId] = (x, y)
+        self._cells.setdefault(self._cell(x, y), {})[lineupId] = (x, y)
+
+    def remove(self, lineupId: int):
+        point = self._points.pop(lineupId, None)
+        if point is None:
+            return
+
+        cell = self._cell(*point)
+        del self._cells[cell][lineupId]
+        if not self._cells[cell]:
+            del self._cells[cell]
+
+    def position(self, lineupId: int) -> Optional[Point]:
+        return self._points.get(lineupId)
+
+    def items(self) -> Iterator[Tuple[int, Point]]:
+        """所有点位的 (id, 坐标)"""
+        return iter(self._points.items())
+
+    def _candidates(self, x0: float, y0: float, x1: float, y1: float) -> Iterator[Tuple[int, Point]]:
+        """与矩形相交的格子中的所有点位"""
+        cx0, cy0 = self._cell(x0, y0)
+        cx1, cy1 = self._cell(x1, y1)
+        cells = self._cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    yield from cell.items()
+
+    def inRect(self, x0: float, y0: float, x1: float, y1: float,
+               allowed: Container[int] = None) -> List[int]:
+        """
+        坐标在矩形内的点位 id，按 id 排序
+
+        参数:
+            x0, y0, x1, y1 (float): 矩形的两个对角，0~1 坐标
+            allowed: 只返回其中的点位，None 表示不限制
+        """
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        return sorted(
+            lineupId for lineupId, (x, y) in self._candidates(x0, y0, x1, y1)
+            if x0 <= x <= x1 and y0 <= y <= y1 and (allowed is None or lineupId in allowed))
+
+    def within(self, x: float, y: float, radius: float,
+               allowed: Container[int] = None) -> List[Tuple[float, int]]:
+        """
+        与 (x, y) 距离不超过 radius 的点位
+
+        参数:
+            x, y (float): 圆心，0~1 坐标
+            radius (float): 半径，以地图宽度为单位
+            allowed: 只返回其中的点位，None 表示不限制
+
+        返回 (距离, id) 列表，按距离排序
+        """
+        dy = radius / MAP_ASPECT
+        results = []
+        for lineupId, (px, py) in self._candidates(x - radius, y - dy, x + radius, y + dy):
+            if allowed is not None and lineupId not in allowed:
+                continue
+
+            distance = math.hypot(px - x, (py - y) * MAP_ASPECT)
+            if distance <= radius:
+                results.append((distance, lineupId))
+
+        results.sort()
+        return results
+
+    def nearest(self, x: float, y: float, radius: float, allowed: Container[int] = None) -> Optional[int]:
+        """距离 (x, y) 最近且不超过 radius 的点位，没有时返回 None"""
+        results = self.within(x, y, radius, allowed)
+        return results[0][1] if results else None
+
+
+class LineupSpatialIndex:
+    """所有地图的站位、落点网格"""
+
+    def __init__(self):
+        self._grids = {}    # type: Dict[Tuple[str, str], PositionGrid]   # (地图, 坐标类型) -> 网格
+        self._maps = {}     # type: Dict[int, str]                        # 点位 id -> 地图
+
+    @classmethod
+    def fromStore(cls, store: LineupStore) -> "LineupSpatialIndex":
+        """从数据库构建索引"""
+        index = cls()
+        for lineupId, mapKey, standX, standY, landX, landY in store.iter_positions():
+            index.add(lineupId, mapKey, _point(standX, standY), _point(landX, landY))
+        return index
+
+    def __len__(self):
+        return len(self._maps)
+
+    def grid(self, mapKey: str, kind: str) -> PositionGrid:
+        """地图上站位 (stand) 或落点 (land) 的网格，没有点位时返回空网格"""
+        grid = self._grids.get((mapKey, kind))
+        return grid if grid is not None else PositionGrid()
+
+    def add(self, lineupId: int, mapKey: str, stand: Optional[Point], land: Optional[Point]):
+        """添加点位，已存在时按新的坐标更新；两个坐标都没有时只移除旧记录"""
+        self.remove(lineupId)
+        if stand is None and land is None:
+            return
+
+        self._maps[lineupId] = mapKey
+        for kind, point in zip(POSITION_KINDS, (stand, land)):
+            if point is not None:
+                self._grids.setdefault((mapKey, kind), PositionGrid()).add(lineupId, *point)
+
+    def addLineup(self, lineup: Lineup):
+        self.add(lineup.id, lineup.map, lineup.position("stand"), lineup.position("land"))
+
+    def remove(self, lineupId: int):
+        mapKey = self._maps.pop(lineupId, None)
+        if mapKey is None:
+            return
+
+        for kind in POSITION_KINDS:
+            grid = self._grids.get((mapKey, kind))
+            if grid is not None:
+                grid.remove(lineupId)
+
+
+def _point(x: Optional[float], y: Optional[float]) -> Optional[Point]:
+    return None if x is None or y is None else (x, y)
+
+
+_spatial = None     # type: Optional[LineupSpatialIndex]
+
+
+def lineupSpatial() -> LineupSpatialIndex:
+    """返回进程内共享的空间索引，第一次调用时从数据库加载"""
+    global _spatial
+    if _spatial is None:
+        _spatial = LineupSpatialIndex.fromStore(lineupStore())
+
+    return _spatial
+
+
+def indexLineupPosition(lineup: Lineup):
+    """保存点位后增量更新空间索引；索引还没加载时不需要处理，加载时会读到新点位"""
+    if _spatial is not None:
+        _spatial.addLineup(lineup)
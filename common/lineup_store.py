@@ -0,0 +1,514 @@
+# coding:utf-8
+"""
+点位数据存储
+
+使用 SQLite（WAL 模式）保存点位及其图片。所有查询都使用固定的参数化 SQL，
+sqlite3 会缓存编译好的语句，重复查询不需要重新解析。
+表结构的后续修改写在 MIGRATIONS 中，按 PRAGMA user_version 记录的版本依次执行。
+
+每个点位有全局唯一的 uid 和版本号，新增、删除都追加到变更日志 lineup_changes 中，
+团队成员之间的同步（见 common.lineup_sync）只需要交换各自日志中新增的部分。
+"""
+import os
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from common.blob_store import BlobStore
+from common.config import BLOB_DIR, LINEUP_DB
+
+# 可用于筛选的字段，顺序与复合索引一致
+FACETS = ("map", "hero", "skill", "side")
+
+# 攻防
+SIDES = {"attack": "进攻", "defend": "防守"}
+
+# 图片类型：站位、描点、落点
+IMAGE_KINDS = {"stand": "站位", "aim": "描点", "land": "落点"}
+
+# 点位的文本字段
+TEXT_FIELDS = ("stand", "stand_detail", "aim", "aim_detail",
+               "land", "land_detail", "note")
+
+# 站位和落点在地图图片上的坐标，x、y 都是相对图片宽高的 0~1，没有标注时为 NULL
+POSITION_KINDS = ("stand", "land")
+POSITION_FIELDS = ("stand_x", "stand_y", "land_x", "land_y")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lineups (
+    id           INTEGER PRIMARY KEY,
+    map          TEXT NOT NULL,
+    hero         TEXT NOT NULL,
+    skill        TEXT NOT NULL,
+    side         TEXT NOT NULL,
+    stand        TEXT NOT NULL DEFAULT '',
+    stand_detail TEXT NOT NULL DEFAULT '',
+    aim          TEXT NOT NULL DEFAULT '',
+    aim_detail   TEXT NOT NULL DEFAULT '',
+    land         TEXT NOT NULL DEFAULT '',
+    land_detail  TEXT NOT NULL DEFAULT '',
+    note         TEXT NOT NULL DEFAULT '',
+    created_at   REAL NOT NULL,
+    updated_at   REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_lineups_facets ON lineups (map, hero, skill, side);
+
+CREATE TABLE IF NOT EXISTS lineup_images (
+    lineup_id INTEGER NOT NULL REFERENCES lineups (id) ON DELETE CASCADE,
+    kind      TEXT NOT NULL,
+    seq       INTEGER NOT NULL,
+    image     TEXT NOT NULL,  -- 图片在 BlobStore 中的摘要
+    PRIMARY KEY (lineup_id, kind, seq)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_lineup_images_image ON lineup_images (image);
+"""
+
+# 表结构升级脚本，第 i 个脚本把 user_version 从 i 升级到 i + 1
+MIGRATIONS = [
+    # 1: 站位和落点坐标
+    """
+    ALTER TABLE lineups ADD COLUMN stand_x REAL;
+    ALTER TABLE lineups ADD COLUMN stand_y REAL;
+    ALTER TABLE lineups ADD COLUMN land_x REAL;
+    ALTER TABLE lineups ADD COLUMN land_y REAL;
+    """,
+    # 2: 全局 uid、行版本号和变更日志，已有点位作为本机的变更写入日志
+    """
+    ALTER TABLE lineups ADD COLUMN uid TEXT;
+    ALTER TABLE lineups ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+    UPDATE lineups SET uid = lower(hex(randomblob(16)));
+    CREATE UNIQUE INDEX idx_lineups_uid ON lineups (uid);
+
+    CREATE TABLE sync_meta (
+        key   TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    ) WITHOUT ROWID;
+    INSERT INTO sync_meta VALUES ('replica', lower(hex(randomblob(16))));
+
+    CREATE TABLE lineup_changes (
+        seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+        uid        TEXT NOT NULL,
+        version    INTEGER NOT NULL,
+        deleted    INTEGER NOT NULL DEFAULT 0,
+        origin     TEXT NOT NULL,               -- 最初做出修改的数据库的 replica
+        via        TEXT NOT NULL DEFAULT '',    -- 从哪个数据库同步来的，本机的修改为空
+        changed_at REAL NOT NULL
+    );
+    CREATE INDEX idx_lineup_changes_uid ON lineup_changes (uid);
+    INSERT INTO lineup_changes (uid, version, origin, changed_at)
+        SELECT uid, version, (SELECT value FROM sync_meta WHERE key = 'replica'), updated_at
+        FROM lineups ORDER BY id;
+    """,
+]
+
+_COLUMNS = ("id",) + FACETS + TEXT_FIELDS + POSITION_FIELDS + ("uid", "version", "created_at", "updated_at")
+
+_INSERT_LINEUP = (
+    f"INSERT INTO lineups ({', '.join(_COLUMNS[1:])}) "
+    f"VALUES ({', '.join(':' + c for c in _COLUMNS[1:])})"
+)
+
+_INSERT_IMAGE = "INSERT INTO lineup_images (lineup_id, kind, seq, image) VALUES (?, ?, ?, ?)"
+
+
+@dataclass
+class Lineup:
+    """一个点位"""
+    map: str
+    hero: str
+    skill: str
+    side: str
+    stand: str = ""
+    stand_detail: str = ""
+    aim: str = ""
+    aim_detail: str = ""
+    land: str = ""
+    land_detail: str = ""
+    note: str = ""
+    stand_x: Optional[float] = None
+    stand_y: Optional[float] = None
+    land_x: Optional[float] = None
+    land_y: Optional[float] = None
+    # 图片类型 -> 图片摘要列表
+    images: Dict[str, List[str]] = field(default_factory=dict)
+    id: Optional[int] = None
+    uid: str = ""           # 全局唯一，保存时生成，各台电脑之间同步时用它识别同一个点位
+    version: int = 1        # 每次修改加一，同步时版本高的一方胜出
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+    def facets(self) -> Tuple[str, str, str, str]:
+        return self.map, self.hero, self.skill, self.side
+
+    def position(self, kind: str) -> Optional[Tuple[float, float]]:
+        """站位 (stand) 或落点 (land) 的坐标，没有标注时返回 None"""
+        x, y = getattr(self, kind + "_x"), getattr(self, kind + "_y")
+        return None if x is None or y is None else (x, y)
+
+    def set_position(self, kind: str, position: Optional[Tuple[float, float]]):
+        x, y = position if position is not None else (None, None)
+        setattr(self, kind + "_x", x)
+        setattr(self, kind + "_y", y)
+
+    def cover_image(self) -> Optional[str]:
+        """列表中代表这个点位的图片摘要：依次取站位、描点、落点的第一张，没有图片时返回 None"""
+        for kind in IMAGE_KINDS:
+            if self.images.get(kind):
+                return self.images[kind][0]
+        return None
+
+
+@lru_cache(maxsize=None)
+def _select_sql(keys: Tuple[str, ...], what: str, paged: bool) -> str:
+    """
+    按筛选字段组合生成 SQL
+
+    同一组合总是得到同一条语句，配合 sqlite3 的语句缓存实现预编译查询
+    """
+    sql = f"SELECT {what} FROM lineups"
+    if keys:
+        sql += " WHERE " + " AND ".join(f"{k} = :{k}" for k in keys)
+    if paged:
+        sql += " ORDER BY id LIMIT :limit OFFSET :offset"
+    return sql
+
+
+class LineupStore:
+    """点位数据库"""
+
+    def __init__(self, path: str = LINEUP_DB, blob_dir: str = BLOB_DIR):
+        """
+        打开（必要时创建）点位数据库
+
+        参数:
+            path (str): 数据库文件路径，":memory:" 表示内存数据库
+            blob_dir (str): 图片文件的存放目录
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None, cached_statements=256)
+        self.conn.row_factory = sqlite3.Row
+
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA temp_store = MEMORY")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+
+        # 点位的图片保存在内容寻址存储中，引用计数与点位数据在同一个数据库
+        self.blobs = BlobStore(blob_dir, self.conn)
+
+        # 本数据库的标识，写入变更日志的 origin
+        self.replica = self.conn.execute("SELECT value FROM sync_meta WHERE key = 'replica'").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def _migrate(self):
+        """依次执行还没有执行过的升级脚本，每个脚本和版本号在同一个事务中提交"""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, script in enumerate(MIGRATIONS[version:], version + 1):
+            self.conn.executescript(f"BEGIN IMMEDIATE; {script}; PRAGMA user_version = {number}; COMMIT;")
+
+    # --- 写入 ---
+
+    def add(self, lineup: Lineup) -> int:
+        """保存单个点位，返回新点位的 id"""
+        return self.add_many([lineup])[0]
+
+    def add_many(self, lineups: Iterable[Lineup], batch_size: int = 1000) -> List[int]:
+        """
+        批量保存点位，每 batch_size 个点位放在一个事务里提交
+
+        参数:
+            lineups: 要保存的点位，保存后会写回 id 和时间戳
+            batch_size (int): 每个事务包含的点位数量
+        """
+        ids = []
+        batch = []
+        for lineup in lineups:
+            batch.append(lineup)
+            if len(batch) >= batch_size:
+                ids.extend(self._insert_batch(batch))
+                batch = []
+
+        if batch:
+            ids.extend(self._insert_batch(batch))
+
+        return ids
+
+    def _insert_batch(self, lineups: List[Lineup]) -> List[int]:
+        with self.transaction() as cursor:
+            return self.insert_rows(cursor, lineups)
+
+    def insert_rows(self, cursor: sqlite3.Cursor, lineups: Iterable[Lineup],
+                    origin: str = None, via: str = "") -> List[int]:
+        """
+        在调用方已经开启的事务中写入点位，用于需要和其他修改一起提交的批量写入
+
+        参数:
+            cursor: transaction() 返回的游标
+            lineups: 要保存的点位，保存后会写回 id、uid 和时间戳
+            origin (str): 从其他数据库同步来的点位传入最初创建它的 replica，保留点位原有的 uid、版本和时间戳
+            via (str): 同步来的点位传入对方的 replica
+        """
+        now = time.time()
+        ids = []
+        for lineup in lineups:
+            if origin is None:
+                lineup.uid = lineup.uid or uuid.uuid4().hex
+                lineup.created_at = lineup.created_at or now
+                lineup.updated_at = now
+
+            cursor.execute(_INSERT_LINEUP, self._row_params(lineup))
+            lineup.id = cursor.lastrowid
+            ids.append(lineup.id)
+
+            cursor.executemany(_INSERT_IMAGE, [
+                (lineup.id, kind, seq, image)
+                for kind, images in lineup.images.items()
+                for seq, image in enumerate(images)
+            ])
+            self.journal(cursor, lineup.uid, lineup.version, False, origin, lineup.updated_at, via)
+
+        return ids
+
+    def delete(self, lineup_id: int):
+        """删除点位及其图片记录，并释放对图片的引用"""
+        with self.transaction() as cursor:
+            digests = self.delete_rows(cursor, [lineup_id])
+
+        for digest in digests:
+            self.blobs.decref(digest)
+
+    def delete_rows(self, cursor: sqlite3.Cursor, lineup_ids: Iterable[int], journal: bool = True) -> List[str]:
+        """
+        在调用方已经开启的事务中删除点位，返回它们引用的图片摘要，由调用方在提交后释放
+
+        参数:
+            cursor: transaction() 返回的游标
+            lineup_ids: 要删除的点位 id
+            journal (bool): 是否在变更日志中记录删除（版本号加一）
+        """
+        digests = []
+        for lineup_id in lineup_ids:
+            row = cursor.execute("SELECT uid, version FROM lineups WHERE id = ?", (lineup_id,)).fetchone()
+            if row is None:
+                continue
+
+            digests.extend(image for image, in cursor.execute(
+                "SELECT image FROM lineup_images WHERE lineup_id = ?", (lineup_id,)))
+            cursor.execute("DELETE FROM lineups WHERE id = ?", (lineup_id,))
+            if journal:
+                self.journal(cursor, row[0], row[1] + 1, True)
+
+        return digests
+
+    def journal(self, cursor: sqlite3.Cursor, uid: str, version: int, deleted: bool,
+                origin: str = None, changed_at: float = None, via: str = ""):
+        """
+        追加一条变更记录
+
+        参数:
+            uid (str): 点位 uid
+            version (int): 修改后的版本号
+            deleted (bool): 是否是删除
+            origin (str): 最初做出修改的数据库，默认为本数据库
+            changed_at (float): 修改时间，默认为当前时间
+            via (str): 同步来的修改传入对方的 replica
+        """
+        cursor.execute(
+            "INSERT INTO lineup_changes (uid, version, deleted, origin, via, changed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (uid, version, int(deleted), origin or self.replica, via, changed_at or time.time()))
+
+    def transaction(self):
+        """显式事务（BEGIN IMMEDIATE），with 语句块正常结束时提交，出现异常时回滚"""
+        return _Transaction(self.conn)
+
+    @staticmethod
+    def _row_params(lineup: Lineup) -> dict:
+        return {c: getattr(lineup, c) for c in _COLUMNS[1:]}
+
+    # --- 查询 ---
+
+    def get(self, lineup_id: int) -> Optional[Lineup]:
+        """按 id 读取点位"""
+        row = self.conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM lineups WHERE id = ?", (lineup_id,)).fetchone()
+        if row is None:
+            return None
+
+        return self._attach_images([self._to_lineup(row)])[0]
+
+    def query(self, limit: int = -1, offset: int = 0, **filters) -> List[Lineup]:
+        """
+        按 map/hero/skill/side 筛选点位，结果按 id 排序
+
+        参数:
+            limit (int): 最多返回的数量，-1 表示不限制
+            offset (int): 跳过的数量
+            filters: 筛选条件，值为 None 的条件会被忽略
+        """
+        keys, params = self._filter_params(filters)
+        params.update(limit=limit, offset=offset)
+
+        sql = _select_sql(keys, ", ".join(_COLUMNS), True)
+        lineups = [self._to_lineup(row) for row in self.conn.execute(sql, params)]
+        return self._attach_images(lineups)
+
+    def get_many(self, lineup_ids: Iterable[int]) -> List[Lineup]:
+        """按 id 读取多个点位，保持传入的顺序，不存在的 id 会被跳过"""
+        lineup_ids = list(lineup_ids)
+        byId = {}
+        for start in range(0, len(lineup_ids), 500):
+            chunk = lineup_ids[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM lineups "
+                f"WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+            for row in rows:
+                byId[row["id"]] = self._to_lineup(row)
+
+        return self._attach_images([byId[i] for i in lineup_ids if i in byId])
+
+    def iter_lineups(self, batch_size: int = 500, **filters) -> Iterator[Lineup]:
+        """
+        按 id 顺序分批读取符合条件的点位，不会一次把所有点位读进内存
+
+        参数:
+            batch_size (int): 每批读取的点位数量
+            filters: 筛选条件，同 query()
+        """
+        keys, params = self._filter_params(filters)
+        ids = [row[0] for row in self.conn.execute(_select_sql(keys, "id", False) + " ORDER BY id", params)]
+        for start in range(0, len(ids), batch_size):
+            yield from self.get_many(ids[start:start + batch_size])
+
+    def ids_with_images(self, digests: Iterable[str], **filters) -> List[int]:
+        """
+        引用了任意一张图片且符合筛选条件的点位 id，按 id 排序
+
+        参数:
+            digests: 图片摘要
+            filters: 筛选条件，同 query()
+        """
+        digests = list(digests)
+        if not digests:
+            return []
+
+        keys, params = self._filter_params(filters)
+        ids = set()
+        for start in range(0, len(digests), 500):
+            chunk = digests[start:start + 500]
+            sql = (f"SELECT DISTINCT l.id FROM lineup_images i JOIN lineups l ON l.id = i.lineup_id "
+                   f"WHERE i.image IN ({', '.join('?' * len(chunk))})")
+            sql += "".join(f" AND l.{k} = ?" for k in keys)
+            ids.update(row[0] for row in self.conn.execute(sql, chunk + [params[k] for k in keys]))
+
+        return sorted(ids)
+
+    def count(self, **filters) -> int:
+        """统计符合条件的点位数量"""
+        keys, params = self._filter_params(filters)
+        return self.conn.execute(_select_sql(keys, "COUNT(*)", False), params).fetchone()[0]
+
+    def count_by(self, facet: str, **filters) -> Dict[str, int]:
+        """
+        按字段的取值分组统计符合条件的点位数量
+
+        参数:
+            facet (str): 分组字段，FACETS 之一
+            filters: 筛选条件，同 query()
+        """
+        if facet not in FACETS:
+            raise ValueError(f"不支持的分组字段: {facet}")
+
+        keys, params = self._filter_params(filters)
+        sql = _select_sql(keys, f"{facet}, COUNT(*)", False) + f" GROUP BY {facet}"
+        return dict(self.conn.execute(sql, params).fetchall())
+
+    def iter_facets(self) -> Iterator[Tuple[int, str, str, str, str]]:
+        """遍历所有点位的 (id, map, hero, skill, side)"""
+        yield from self.conn.execute(_select_sql((), "id, " + ", ".join(FACETS), False))
+
+    def iter_positions(self) -> Iterator[tuple]:
+        """遍历标注了坐标的点位的 (id, map, stand_x, stand_y, land_x, land_y)"""
+        yield from self.conn.execute(
+            "SELECT id, map, " + ", ".join(POSITION_FIELDS) + " FROM lineups "
+            "WHERE stand_x IS NOT NULL OR land_x IS NOT NULL")
+
+    def iter_texts(self, fields: Iterable[str] = TEXT_FIELDS, **filters) -> Iterator[tuple]:
+        """遍历符合条件的点位的 (id, 各文本字段...)，用于构建全文索引"""
+        fields = [f for f in fields if f in TEXT_FIELDS]
+        keys, params = self._filter_params(filters)
+        yield from self.conn.execute(_select_sql(keys, ", ".join(["id"] + fields), False), params)
+
+    @staticmethod
+    def _filter_params(filters: dict):
+        unknown = set(filters) - set(FACETS)
+        if unknown:
+            raise ValueError(f"不支持的筛选条件: {', '.join(sorted(unknown))}")
+
+        keys = tuple(k for k in FACETS if filters.get(k) is not None)
+        return keys, {k: filters[k] for k in keys}
+
+    @staticmethod
+    def _to_lineup(row: sqlite3.Row) -> Lineup:
+        return Lineup(**{c: row[c] for c in _COLUMNS})
+
+    def _attach_images(self, lineups: List[Lineup]) -> List[Lineup]:
+        """一次查询取回一批点位的全部图片"""
+        if not lineups:
+            return lineups
+
+        byId = {lineup.id: lineup for lineup in lineups}
+        ids = list(byId)
+
+        # SQLite 限制单条语句的参数数量，分段查询
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self.conn.execute(
+                "SELECT lineup_id, kind, image FROM lineup_images "
+                f"WHERE lineup_id IN ({', '.join('?' * len(chunk))}) "
+                "ORDER BY lineup_id, kind, seq", chunk)
+
+            for lineup_id, kind, image in rows:
+                byId[lineup_id].images.setdefault(kind, []).append(image)
+
+        return lineups
+
+
+class _Transaction:
+    """显式事务，正常退出时提交，出现异常时回滚"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Cursor:
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.cursor = self.conn.cursor()
+        return self.cursor
+
+    def __exit__(self, excType, exc, tb):
+        self.conn.execute("ROLLBACK" if excType else "COMMIT")
+        self.cursor.close()
+        return False
+
+
+_store = None   # type: Optional[LineupStore]
+
+
+def lineupStore() -> LineupStore:
+    """返回进程内共享的点位数据库"""
+    global _store
+    if _store is None:
+        _store = LineupStore()
+
+    return _store
@@ -0,0 +1,600 @@
+# coding:utf-8
+"""
+点位库增量同步
+
+每个数据库有一个随机的 replica 标识，点位的新增和删除都追加到变更日志 lineup_changes 中
+（见 common.lineup_store）。同步时双方只交换对方上次同步之后的日志对应的点位，以及本地缺少的图片：
+
+    1. 拉取：读取服务端日志中 pulled 之后的变更（不包括本机发出的），先下载缺少的图片，再写入点位
+    2. 推送：把本地日志中 pushed 之后的变更（不包括服务端发出的）连同服务端缺少的图片发给服务端
+    3. 记录双方的日志位置，下次从这里继续
+
+同一个点位两边都有修改时版本号高的一方胜出，版本相同时修改时间晚的一方胜出；删除也是一次修改，
+日志中保留删除记录，旧版本的点位不会被同步回来。传输使用本地 HTTP，JSON 用 gzip 压缩：
+
+    python -m common.lineup_sync serve --host 0.0.0.0 --port 8765     在一台电脑上启动服务
+    python -m common.lineup_sync sync http://192.168.1.10:8765        与服务端双向同步
+
+本模块不依赖 Qt。
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+from common.lineup_pack import lineupRecord, parseRecord
+from common.lineup_store import LineupStore
+
+SYNC_FORMAT = "valorant-lineup-sync"
+SYNC_VERSION = 1
+
+DEFAULT_PORT = 8765
+
+# 每次请求传输的变更数量
+PAGE_SIZE = 500
+
+CHUNK_SIZE = 1024 * 1024
+
+# 每台对端的同步位置：pulled 是已经拉取到的对方日志序号，pushed 是已经推送的本地日志序号
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_peers (
+    peer      TEXT PRIMARY KEY,
+    url       TEXT NOT NULL DEFAULT '',
+    pulled    INTEGER NOT NULL DEFAULT 0,
+    pushed    INTEGER NOT NULL DEFAULT 0,
+    synced_at REAL
+) WITHOUT ROWID;
+"""
+
+_DIGEST_CHARS = set("0123456789abcdef")
+
+
+class SyncError(Exception):
+    """同步失败，对端不可用或数据格式错误"""
+
+
+@dataclass
+class ApplyResult:
+    """写入一批远端变更的结果"""
+    added: List[int] = field(default_factory=list)      # 新写入的点位 id（包括被更新后重新写入的）
+    removed: List[int] = field(default_factory=list)    # 被删除或被更新替换掉的本地点位 id
+    skipped: int = 0                                    # 本地已有相同或更新的版本
+    invalid: int = 0                                    # 格式错误的记录
+
+    def merge(self, other: "ApplyResult"):
+        self.added.extend(other.added)
+        self.removed.extend(other.removed)
+        self.skipped += other.skipped
+        self.invalid += other.invalid
+
+
+@dataclass
+class SyncResult:
+    """一次双向同步的结果"""
+    pulled: ApplyResult = field(default_factory=ApplyResult)
+    pushed: int = 0             # 推送的变更数量
+    blobs_received: int = 0
+    blobs_sent: int = 0
+    bytes_received: int = 0     # 传输的字节数（压缩后）
+    bytes_sent: int = 0
+
+    def summary(self) -> str:
+        return (f"收到 {len(self.pulled.added)} 个点位、删除 {len(self.pulled.removed)} 个，"
+                f"发送 {self.pushed} 条变更；图片收 {self.blobs_received} 张、发 {self.blobs_sent} 张；"
+                f"传输 {(self.bytes_received + self.bytes_sent) / 1024:.1f} KB")
+
+
+def _isDigest(value) -> bool:
+    return isinstance(value, str) and len(value) == 64 and set(value) <= _DIGEST_CHARS
+
+
+# --- 日志 ---
+
+def lastSeq(store: LineupStore) -> int:
+    return store.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM lineup_changes").fetchone()[0]
+
+
+def changesSince(store: LineupStore, since: int, exclude: str = "",
+                 limit: int = PAGE_SIZE) -> Tuple[List[dict], int, bool]:
+    """
+    读取日志中 since 之后的变更，转换为同步记录
+
+    同一个点位在这一段日志中的多次修改只发送最新状态。
+
+    参数:
+        since (int): 上次读到的日志序号
+        exclude (str): 不发送这个 replica 做出的和从它同步来的变更（不需要发回去）
+        limit (int): 最多读取的日志条数
+
+    返回 (记录列表, 读到的最后一个序号, 是否还有更多)
+    """
+    # 先确定这次读到哪里，读取期间其他连接写入的变更留到下一次
+    end = lastSeq(store)
+    rows = store.conn.execute(
+        "SELECT seq, uid FROM lineup_changes WHERE seq > ? AND seq <= ? AND origin != ? AND via != ? "
+        "ORDER BY seq LIMIT ?", (since, end, exclude, exclude, limit)).fetchall()
+    more = len(rows) == limit
+    last = rows[-1][0] if more else max(since, end)
+    uids = list(dict.fromkeys(uid for _, uid in rows))
+
+    records = []
+    for start in range(0, len(uids), 500):
+        chunk = uids[start:start + 500]
+        marks = ", ".join("?" * len(chunk))
+        latest = {row[0]: row for row in store.conn.execute(
+            "SELECT uid, version, deleted, origin, changed_at FROM lineup_changes WHERE seq IN "
+            f"(SELECT MAX(seq) FROM lineup_changes WHERE uid IN ({marks}) GROUP BY uid)", chunk)}
+        ids = dict(store.conn.execute(f"SELECT uid, id FROM lineups WHERE uid IN ({marks})", chunk).fetchall())
+        lineups = {lineup.uid: lineup for lineup in store.get_many(ids[u] for u in chunk if u in ids)}
+
+        for uid in chunk:
+            _, version, deleted, origin, changedAt = latest[uid]
+            lineup = lineups.get(uid)
+            if lineup is None:
+                records.append({"uid": uid, "version": version, "deleted": True,
+                                "origin": origin, "updated_at": changedAt})
+            else:
+                record = lineupRecord(lineup)
+                record.update(uid=uid, version=lineup.version, origin=origin, updated_at=lineup.updated_at)
+                records.append(record)
+
+    return records, last, more
+
+
+def recordDigests(records: Iterable[dict]) -> Set[str]:
+    """记录引用的所有图片摘要"""
+    digests = set()
+    for record in records:
+        images = record.get("images")
+        if isinstance(images, dict):
+            for values in images.values():
+                if isinstance(values, list):
+                    digests.update(d for d in values if _isDigest(d))
+    return digests
+
+
+def hasBlob(store: LineupStore, digest: str) -> bool:
+    return store.blobs.size(digest) is not None and store.blobs.exists(digest)
+
+
+def receiveBlob(store: LineupStore, digest: str, stream, length: int = -1) -> int:
+    """
+    从流中读取图片，校验摘要后以 0 次引用移入存储，返回读取的字节数
+    写入引用它的点位时才增加引用
+    """
+    tmpPath = os.path.join(store.blobs.tmpDir(), uuid.uuid4().hex)
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmpPath, "wb") as out:
+            while length < 0 or size < length:
+                chunk = stream.read(CHUNK_SIZE if length < 0 else min(CHUNK_SIZE, length - size))
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+
+        if hasher.hexdigest() != digest:
+            raise SyncError(f"图片 {digest[:12]} 的内容与摘要不符")
+    except BaseException:
+        os.remove(tmpPath)
+        raise
+
+    store.blobs.adopt(tmpPath, digest, size, refs=0)
+    return size
+
+
+def _isNewer(version: int, updatedAt: float, localVersion: int, localUpdatedAt: float) -> bool:
+    return (version, updatedAt) > (localVersion, localUpdatedAt)
+
+
+def applyChanges(store: LineupStore, records: List[dict], via: str) -> ApplyResult:
+    """
+    在一个事务中写入远端 via 发来的变更，引用的图片必须已经在存储中
+
+    远端版本不比本地新的记录被跳过；被更新的点位删除后重新写入，本地 id 会改变
+    """
+    result = ApplyResult()
+    released = []
+    with store.transaction() as cursor:
+        for record in records:
+            try:
+                uid, version, origin = record["uid"], record["version"], record["origin"]
+                updatedAt = float(record.get("updated_at") or 0.0)
+                if not (isinstance(uid, str) and isinstance(version, int) and isinstance(origin, str)):
+                    raise ValueError("uid、version 或 origin 格式错误")
+                lineup = None if record.get("deleted") else parseRecord(record)
+            except (KeyError, TypeError, ValueError):
+                result.invalid += 1
+                continue
+
+            if lineup is not None and not all(
+                    hasBlob(store, d) for images in lineup.images.values() for d in images):
+                # 对方缺少这个点位的图片文件，不写入不完整的点位
+                result.invalid += 1
+                continue
+
+            local = cursor.execute(
+                "SELECT id, version, updated_at FROM lineups WHERE uid = ?", (uid,)).fetchone()
+            if local is None:
+                tombstone = cursor.execute(
+                    "SELECT version, changed_at FROM lineup_changes WHERE uid = ? AND deleted = 1 "
+                    "ORDER BY seq DESC LIMIT 1", (uid,)).fetchone()
+                if tombstone and not _isNewer(version, updatedAt, *tombstone):
+                    result.skipped += 1
+                    continue
+            elif not _isNewer(version, updatedAt, local[1], local[2]):
+                result.skipped += 1
+                continue
+
+            if local is not None:
+                released.extend(store.delete_rows(cursor, [local[0]], journal=False))
+                result.removed.append(local[0])
+
+            if lineup is None:
+                store.journal(cursor, uid, version, True, origin, updatedAt, via)
+                continue
+
+            for images in lineup.images.values():
+                for digest in images:
+                    store.blobs.incref(digest)
+
+            lineup.uid, lineup.version, lineup.updated_at = uid, version, updatedAt
+            lineup.created_at = lineup.created_at or updatedAt
+            result.added.extend(store.insert_rows(cursor, [lineup], origin, via))
+
+    # 提交之后才释放旧版本的图片，新旧版本共用的图片此时已经增加了引用
+    for digest in released:
+        store.blobs.decref(digest)
+
+    return result
+
+
+# --- 服务端 ---
+
+def _encodeJson(data) -> bytes:
+    return gzip.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"), 6)
+
+
+def _decodeJson(body: bytes, encoding: str):
+    if encoding == "gzip":
+        body = gzip.decompress(body)
+    return json.loads(body.decode("utf-8"))
+
+
+class SyncRequestHandler(BaseHTTPRequestHandler):
+    """
+    同步接口
+
+        GET  /sync/info                         replica 和日志位置
+        GET  /sync/changes?since=&exclude=      日志中 since 之后的变更
+        POST /sync/changes                      写入对方（replica）的变更
+        POST /sync/missing                      对方给出的图片中本机缺少的
+        GET  /sync/blobs/<摘要>                 下载图片
+        PUT  /sync/blobs/<摘要>                 上传图片
+    """
+
+    server: "SyncServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def _dispatch(self, method: str):
+        url = urllib.parse.urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        query = dict(urllib.parse.parse_qsl(url.query))
+
+        if self.server.token and self.headers.get("X-Sync-Token") != self.server.token:
+            return self._sendError(403, "同步口令错误")
+
+        try:
+            if parts[:1] != ["sync"]:
+                return self._sendError(404, "未知接口")
+            if method == "GET" and parts[1:] == ["info"]:
+                return self._sendJson(self._info())
+            if method == "GET" and parts[1:] == ["changes"]:
+                records, last, more = changesSince(self.server.store, int(query.get("since", 0)),
+                                                   query.get("exclude", ""),
+                                                   min(int(query.get("limit", PAGE_SIZE)), PAGE_SIZE))
+                return self._sendJson({"changes": records, "seq": last, "more": more})
+            if method == "POST" and parts[1:] == ["changes"]:
+                body = self._readJson()
+                result = applyChanges(self.server.store, body["changes"], str(body.get("replica", "")))
+                if self.server.onApplied:
+                    self.server.onApplied(result)
+                return self._sendJson({"applied": len(result.added), "removed": len(result.removed),
+                                       "skipped": result.skipped, "invalid": result.invalid})
+            if method == "POST" and parts[1:] == ["missing"]:
+                digests = [d for d in self._readJson()["digests"] if _isDigest(d)]
+                return self._sendJson({"missing": [d for d in digests if not hasBlob(self.server.store, d)]})
+            if len(parts) == 3 and parts[1] == "blobs" and _isDigest(parts[2]):
+                return self._getBlob(parts[2]) if method == "GET" else self._putBlob(parts[2])
+        except SyncError as e:
+            return self._sendError(400, str(e))
+        except (KeyError, TypeError, ValueError) as e:
+            return self._sendError(400, f"请求格式错误: {e!r}")
+
+        self._sendError(404, "未知接口")
+
+    def _info(self) -> dict:
+        store = self.server.store
+        return {"format": SYNC_FORMAT, "version": SYNC_VERSION, "replica": store.replica, "seq": lastSeq(store)}
+
+    def _readJson(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        return _decodeJson(body, self.headers.get("Content-Encoding", ""))
+
+    def _sendJson(self, data):
+        body = _encodeJson(data)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _sendError(self, status: int, message: str):
+        body = json.dumps({"error": message}, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _getBlob(self, digest: str):
+        store = self.server.store
+        if not hasBlob(store, digest):
+            return self._sendError(404, "图片不存在")
+
+        path = store.blobs.path(digest)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.end_headers()
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+
+    def _putBlob(self, digest: str):
+        receiveBlob(self.server.store, digest, self.rfile, int(self.headers.get("Content-Length", 0)))
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class SyncServer(HTTPServer):
+    """
+    同步服务端，逐个处理请求
+
+    SQLite 连接只能在创建它的线程中使用，服务端需要在运行 serve_forever() 的线程中创建
+    """
+
+    def __init__(self, store: LineupStore, address: Tuple[str, int] = ("127.0.0.1", DEFAULT_PORT),
+                 token: str = "", verbose: bool = False, onApplied: Callable[[ApplyResult], None] = None):
+        """
+        参数:
+            store: 服务端的点位数据库
+            address: 监听地址，局域网内同步时使用 ("0.0.0.0", 端口)
+            token (str): 同步口令，非空时客户端必须提供相同的口令
+            verbose (bool): 是否打印请求日志
+            onApplied: 写入客户端推送的变更后调用
+        """
+        super().__init__(address, SyncRequestHandler)
+        self.store = store
+        self.token = token
+        self.verbose = verbose
+        self.onApplied = onApplied
+
+
+# --- 客户端 ---
+
+class SyncClient:
+    """同步服务端的 HTTP 客户端，统计传输的字节数"""
+
+    def __init__(self, url: str, token: str = "", timeout: float = 30):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.bytesSent = 0
+        self.bytesReceived = 0
+
+    def _open(self, method: str, path: str, body=None, headers: Dict[str, str] = None):
+        request = urllib.request.Request(self.url + path, data=body, method=method)
+        request.add_header("Accept-Encoding", "gzip")
+        if self.token:
+            request.add_header("X-Sync-Token", self.token)
+        for key, value in (headers or {}).items():
+            request.add_header(key, value)
+
+        if isinstance(body, bytes):
+            self.bytesSent += len(body)
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read().decode("utf-8"))["error"]
+            except (ValueError, KeyError):
+                message = e.reason
+            raise SyncError(f"服务端返回错误 {e.code}: {message}") from e
+        except (urllib.error.URLError, OSError) as e:
+            raise SyncError(f"无法连接同步服务端 {self.url}: {e}") from e
+
+    def requestJson(self, method: str, path: str, data=None):
+        body = _encodeJson(data) if data is not None else None
+        headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"} if body else None
+        with self._open(method, path, body, headers) as response:
+            raw = response.read()
+            self.bytesReceived += len(raw)
+            return _decodeJson(raw, response.headers.get("Content-Encoding", ""))
+
+    def info(self) -> dict:
+        info = self.requestJson("GET", "/sync/info")
+        if info.get("format") != SYNC_FORMAT or info.get("version") != SYNC_VERSION:
+            raise SyncError("服务端的同步协议版本不兼容")
+        return info
+
+    def changes(self, since: int, exclude: str) -> dict:
+        query = urllib.parse.urlencode({"since": since, "exclude": exclude, "limit": PAGE_SIZE})
+        return self.requestJson("GET", f"/sync/changes?{query}")
+
+    def downloadBlob(self, store: LineupStore, digest: str):
+        with self._open("GET", f"/sync/blobs/{digest}") as response:
+            length = int(response.headers.get("Content-Length", -1))
+            self.bytesReceived += receiveBlob(store, digest, response, length)
+
+    def uploadBlob(self, store: LineupStore, digest: str):
+        path = store.blobs.path(digest)
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            self._open("PUT", f"/sync/blobs/{digest}", f, {
+                "Content-Type": "application/octet-stream", "Content-Length": str(size)}).close()
+        self.bytesSent += size
+
+
+def _peerState(store: LineupStore, peer: str) -> Tuple[int, int]:
+    row = store.conn.execute("SELECT pulled, pushed FROM sync_peers WHERE peer = ?", (peer,)).fetchone()
+    return tuple(row) if row else (0, 0)
+
+
+def _savePeerState(store: LineupStore, peer: str, url: str, pulled: int, pushed: int):
+    store.conn.execute(
+        "INSERT INTO sync_peers (peer, url, pulled, pushed, synced_at) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (peer) DO UPDATE SET url = excluded.url, pulled = excluded.pulled, "
+        "pushed = excluded.pushed, synced_at = excluded.synced_at",
+        (peer, url, pulled, pushed, time.time()))
+
+
+def syncWith(store: LineupStore, url: str, token: str = "",
+             progress: Callable[[str], None] = None) -> SyncResult:
+    """
+    与同步服务端双向同步
+
+    参数:
+        store: 本地点位数据库
+        url (str): 服务端地址，如 http://192.168.1.10:8765
+        token (str): 同步口令
+        progress: 每完成一步调用一次，参数为进度说明
+    """
+    client = SyncClient(url, token)
+    peer = client.info()["replica"]
+    if peer == store.replica:
+        raise SyncError("不能与同一个数据库同步")
+
+    store.conn.executescript(SCHEMA)
+    pulled, pushed = _peerState(store, peer)
+    result = SyncResult()
+
+    # 拉取：先下载缺少的图片，再写入点位，每一页写入后保存位置
+    while True:
+        page = client.changes(pulled, store.replica)
+        records = page["changes"]
+        received = [d for d in sorted(recordDigests(records)) if not hasBlob(store, d)]
+        for digest in received:
+            client.downloadBlob(store, digest)
+            result.blobs_received += 1
+
+        result.pulled.merge(applyChanges(store, records, peer))
+
+        # 引用它们的记录无效或被跳过时，收到的图片没有引用，直接删除
+        for digest in received:
+            if store.blobs.refcount(digest) == 0:
+                store.blobs.decref(digest)
+        pulled = page["seq"]
+        _savePeerState(store, peer, url, pulled, pushed)
+        if progress:
+            progress(f"已接收 {len(result.pulled.added)} 个点位")
+        if not page["more"]:
+            break
+
+    # 推送：服务端缺少的图片先上传，再发送变更
+    while True:
+        records, last, more = changesSince(store, pushed, peer)
+        if records:
+            digests = sorted(recordDigests(records))
+            missing = client.requestJson("POST", "/sync/missing", {"digests": digests})["missing"] if digests else []
+            for digest in missing:
+                client.uploadBlob(store, digest)
+                result.blobs_sent += 1
+
+            client.requestJson("POST", "/sync/changes", {"changes": records, "replica": store.replica})
+            result.pushed += len(records)
+
+        pushed = last
+        _savePeerState(store, peer, url, pulled, pushed)
+        if progress and records:
+            progress(f"已发送 {result.pushed} 条变更")
+        if not more:
+            break
+
+    result.bytes_received = client.bytesReceived
+    result.bytes_sent = client.bytesSent
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m common.lineup_sync", description="点位库增量同步")
+    parser.add_argument("--token", default="", help="同步口令，服务端和客户端需要一致")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="启动同步服务端")
+    serve.add_argument("--host", default="127.0.0.1", help="监听地址，局域网同步使用 0.0.0.0")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    sync = commands.add_parser("sync", help="与服务端双向同步")
+    sync.add_argument("url", help="服务端地址，如 http://192.168.1.10:8765")
+    sync.add_argument("--no-previews", action="store_true", help="不为收到的图片生成预览版本")
+    args = parser.parse_args()
+
+    from common.lineup_store import lineupStore
+
+    store = lineupStore()
+    if args.command == "serve":
+        server = SyncServer(store, (args.host, args.port), args.token, verbose=True)
+        print(f"同步服务端 {store.replica} 监听 {args.host}:{args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+
+    try:
+        result = syncWith(store, args.url, args.token, progress=print)
+    except SyncError as e:
+        parser.exit(1, f"同步失败: {e}\n")
+
+    print(result.summary())
+    if result.blobs_received and not args.no_previews:
+        from common.image_ingest import backfill
+
+        count = backfill(store)
+        print(f"已为 {count} 张图片生成预览版本")
+
+
+if __name__ == '__main__':
+    main()
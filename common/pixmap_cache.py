@@ -0,0 +1,110 @@
+# coding:utf-8
+"""
+进程内共享的 QPixmap 缓存
+
+同一张图片以相同尺寸显示在多个页面时只解码、只占用一份内存。
+缓存按 (路径, 逻辑尺寸, 设备像素比) 区分，总字节数超过上限时淘汰最久未使用的图片。
+QPixmap 只能在 GUI 线程中使用，本缓存也只能在 GUI 线程中访问。
+"""
+from collections import OrderedDict
+from typing import Optional
+
+from PyQt5.QtCore import QSize
+from PyQt5.QtGui import QPixmap
+
+# 默认容量上限
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def imageKey(path: str, size: QSize, dpr: float) -> tuple:
+    """图片缓存键，图片加载器和本缓存共用"""
+    return (path, (size.width(), size.height()), round(dpr, 2))
+
+
+def pixmapBytes(pixmap: QPixmap) -> int:
+    """估算 QPixmap 占用的内存"""
+    return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+
+class PixmapCache:
+    """按字节数限制容量的 LRU 缓存"""
+
+    def __init__(self, maxBytes: int = DEFAULT_MAX_BYTES):
+        self.maxBytes = maxBytes
+        self.totalBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()     # 键 -> (QPixmap, 字节数)，最久未使用的在前
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key: tuple):
+        return key in self._items
+
+    def find(self, key: tuple) -> Optional[QPixmap]:
+        """查找图片，命中时标记为最近使用"""
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._items.move_to_end(key)
+        return item[0]
+
+    def insert(self, key: tuple, pixmap: QPixmap) -> bool:
+        """
+        加入缓存并淘汰超出容量的旧图片
+
+        返回是否加入成功，空图片和超过整个缓存容量的图片不会加入
+        """
+        size = pixmapBytes(pixmap)
+        if pixmap.isNull() or size > self.maxBytes:
+            return False
+
+        self.remove(key)
+        self._items[key] = (pixmap, size)
+        self.totalBytes += size
+        self._evict()
+        return True
+
+    def remove(self, key: tuple):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self.totalBytes -= item[1]
+
+    def clear(self):
+        self._items.clear()
+        self.totalBytes = 0
+
+    def setMaxBytes(self, maxBytes: int):
+        """修改容量上限，立即淘汰超出的部分"""
+        self.maxBytes = maxBytes
+        self._evict()
+
+    def _evict(self):
+        while self.totalBytes > self.maxBytes and self._items:
+            _, (_, size) = self._items.popitem(last=False)
+            self.totalBytes -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """命中、未命中、淘汰次数和当前占用"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "count": len(self._items),
+            "bytes": self.totalBytes,
+            "max_bytes": self.maxBytes,
+        }
+
+    def resetStats(self):
+        self.hits = self.misses = self.evictions = 0
+
+
+pixmapCache = PixmapCache()
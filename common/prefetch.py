@@ -0,0 +1,229 @@
+# coding:utf-8
+"""
+向导下一步的预取
+
+查询页是固定的 地图 -> 英雄 -> 攻防 三步，下一步需要的图片和统计原本都在点击之后才开始加载。
+鼠标在地图卡片上停留一小会儿、或者界面空闲时，先在后台准备下一步大概率要用到的内容：
+英雄立绘、该地图的点位数量、结果第一页的缩略图。
+
+每个预取意图是一个生成器，逐步产出 None（完成了一小步主线程工作）或 PrefetchImage（需要加载的图片）。
+调度器在主线程的定时器中分片执行，并限制：
+    - 每片的执行时间（SLICE_MS），两片之间让出事件循环，不影响界面响应
+    - 同时在线程池中排队的图片数量（MAX_IN_FLIGHT），图片以低优先级加载
+    - 每个意图新加载的图片字节数（共享 QPixmap 缓存容量的 BUDGET_SHARE），预取不会挤掉屏幕上的图片
+同一时间只执行一个意图，鼠标移到别处时取消还没完成的部分。
+"""
+import time
+from typing import Callable, Dict, Iterator, NamedTuple, Optional
+
+from PyQt5.QtCore import QObject, QSize, QTimer
+
+from common.image_loader import imageLoader
+from common.pixmap_cache import imageKey, pixmapCache
+from common.signal_bus import signalBus
+
+# 结果页每页的点位数量和缩略图尺寸
+RESULT_PAGE_SIZE = 24
+RESULT_THUMB_SIZE = QSize(180, 140)
+
+HOVER_DELAY = 150       # 鼠标停留多久（毫秒）才开始预取，划过卡片时不触发
+IDLE_DELAY = 500        # 界面空闲多久（毫秒）后开始空闲预取
+SLICE_MS = 4            # 每片主线程工作的时间上限（毫秒）
+MAX_IN_FLIGHT = 4       # 同时排队的图片数量
+BUDGET_SHARE = 0.25     # 每个意图新加载的图片最多占 QPixmap 缓存容量的比例
+PREFETCH_PRIORITY = -1  # 线程池中的优先级，低于界面直接发起的请求
+
+
+class PrefetchImage(NamedTuple):
+    """需要预先加载到 QPixmap 缓存的图片，参数同 imageLoader.loadPixmap()"""
+    path: str
+    size: QSize
+    dpr: float
+
+
+class PrefetchTask:
+    """一个正在执行的预取意图"""
+
+    def __init__(self, key: tuple, steps: Iterator[Optional[PrefetchImage]], budget: int):
+        self.key = key
+        self.steps = steps
+        self.budget = budget            # 剩余的图片字节数
+        self.receiver = QObject()       # 图片请求的接收方，取消时一起取消
+        self.waiting = None             # type: Optional[PrefetchImage]   # 等待排队空位的图片
+        self.inFlight = 0
+        self.kept = False               # 鼠标离开后仍然继续执行
+        self.exhausted = False          # 生成器已经执行完
+
+    def close(self):
+        imageLoader.cancel(self.receiver)
+        self.receiver.deleteLater()
+        self.steps.close()
+
+
+class Prefetcher(QObject):
+    """预取调度器，只能在主线程使用"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.task = None        # type: Optional[PrefetchTask]
+        self.results = {}       # type: Dict[tuple, object]   # 预先计算好的结果，见 remember()/take()
+
+        # 等待开始的意图 (键, 生成器工厂)
+        self._scheduled = None
+        self._delayTimer = QTimer(self)
+        self._delayTimer.setSingleShot(True)
+        self._delayTimer.timeout.connect(self._startScheduled)
+
+        self._sliceTimer = QTimer(self)
+        self._sliceTimer.setSingleShot(True)
+        self._sliceTimer.timeout.connect(self._runSlice)
+
+        # 点位变化后预先计算的统计不再准确
+        signalBus.lineupSaved.connect(self.invalidate)
+        signalBus.lineupsImported.connect(self.invalidate)
+
+    # --- 意图 ---
+
+    def schedule(self, key: tuple, factory: Callable[[], Iterator[Optional[PrefetchImage]]],
+                 delay: int = HOVER_DELAY):
+        """
+        delay 毫秒后开始预取，期间再次调用 schedule() 或 leave() 会取消这次预取
+
+        参数:
+            key (tuple): 意图的标识，如 ("map", 地图取值)
+            factory: 开始时调用，返回预取步骤的生成器
+            delay (int): 延迟的毫秒数
+        """
+        if self.task is not None and self.task.key == key:
+            self._delayTimer.stop()
+            self._scheduled = None
+            return
+
+        self._scheduled = (key, factory)
+        self._delayTimer.start(delay)
+
+    def start(self, key: tuple, factory: Callable[[], Iterator[Optional[PrefetchImage]]],
+              keep: bool = False):
+        """
+        立即开始预取，取消正在执行的其它意图；同一个意图已经在执行时不重新开始
+
+        参数:
+            keep (bool): 鼠标离开后是否继续执行，用于用户已经选定的下一步
+        """
+        self._delayTimer.stop()
+        self._scheduled = None
+
+        if self.task is None or self.task.key != key:
+            self._cancelTask()
+            self.task = PrefetchTask(key, factory(), int(pixmapCache.maxBytes * BUDGET_SHARE))
+            self._sliceTimer.start(0)
+
+        self.task.kept = self.task.kept or keep
+
+    def leave(self, key: tuple):
+        """鼠标离开了 key 对应的目标：还没开始的预取不再开始，正在执行的预取被取消（keep 的除外）"""
+        if self._scheduled is not None and self._scheduled[0] == key:
+            self._delayTimer.stop()
+            self._scheduled = None
+
+        if self.task is not None and self.task.key == key and not self.task.kept:
+            self._cancelTask()
+
+    def cancel(self):
+        """取消所有预取"""
+        self._delayTimer.stop()
+        self._scheduled = None
+        self._cancelTask()
+
+    def isActive(self) -> bool:
+        return self.task is not None or self._scheduled is not None
+
+    # --- 预先计算的结果 ---
+
+    def remember(self, key: tuple, value):
+        self.results[key] = value
+
+    def take(self, key: tuple):
+        """取出预先计算的结果，没有时返回 None；结果只使用一次"""
+        return self.results.pop(key, None)
+
+    def invalidate(self, *_):
+        self.results.clear()
+
+    # --- 调度 ---
+
+    def _startScheduled(self):
+        if self._scheduled is not None:
+            key, factory = self._scheduled
+            self.start(key, factory)
+
+    def _cancelTask(self):
+        self._sliceTimer.stop()
+        if self.task is not None:
+            self.task.close()
+            self.task = None
+
+    def _runSlice(self):
+        """执行一片预取工作，时间用完或排队已满时返回"""
+        task = self.task
+        if task is None:
+            return
+
+        deadline = time.perf_counter() + SLICE_MS / 1000
+        while time.perf_counter() < deadline:
+            if task.waiting is None:
+                try:
+                    task.waiting = next(task.steps)
+                except StopIteration:
+                    task.exhausted = True
+                    break
+                if task.waiting is None:
+                    continue
+
+            if task.inFlight >= MAX_IN_FLIGHT:
+                # 有图片加载完成时继续
+                return
+
+            if not self._request(task, task.waiting):
+                # 预算用完，不再加载更多图片
+                task.exhausted = True
+                break
+            task.waiting = None
+
+        if task.exhausted:
+            self._finishIfDone(task)
+        else:
+            self._sliceTimer.start(0)
+
+    def _request(self, task: PrefetchTask, image: PrefetchImage) -> bool:
+        """发起一张图片的低优先级加载，已经在缓存中时跳过，超出预算时返回 False"""
+        if imageKey(image.path, image.size, image.dpr) in pixmapCache:
+            return True
+
+        cost = int(image.size.width() * image.dpr) * int(image.size.height() * image.dpr) * 4
+        if cost > task.budget:
+            return False
+
+        task.budget -= cost
+        task.inFlight += 1
+        imageLoader.loadPixmap(image.path, image.size, image.dpr, task.receiver,
+                               lambda _, t=task: self._onImageLoaded(t), PREFETCH_PRIORITY)
+        return True
+
+    def _onImageLoaded(self, task: PrefetchTask):
+        task.inFlight -= 1
+        if task is not self.task:
+            return
+
+        if task.exhausted:
+            self._finishIfDone(task)
+        elif not self._sliceTimer.isActive():
+            self._sliceTimer.start(0)
+
+    def _finishIfDone(self, task: PrefetchTask):
+        if task.inFlight == 0 and task is self.task:
+            task.close()
+            self.task = None
+
+
+prefetcher = Prefetcher()
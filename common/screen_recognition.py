@@ -0,0 +1,482 @@
+# coding:utf-8
+"""
+从游戏截图识别地图和英雄
+
+模板索引预先计算每张地图封面（resource/maps/*_cover.png）和 hero.json 中每个技能图标的缩小特征向量，
+特征都减去均值并归一化，两个向量的点积就是归一化互相关（NCC），取值 -1~1，对亮度和对比度的变化不敏感。
+
+    地图：整张截图缩小为 16x9 的 RGB 向量，与每张地图封面比较
+    英雄：截图底部技能栏中亮色像素的连通区域作为候选，每个候选裁掉暗色边缘后缩小为 16x16 灰度向量，
+          与所有技能图标比较；一个英雄匹配上的技能越多、相关越高，得分越高
+
+技能栏中四个技能同时显示，无法判断截图用的是哪一个，技能交给调用方结合已保存的相似截图判断。
+索引第一次使用时构建并缓存为 cache/recognition.pickle，目录或模板图片修改后自动重建。
+本模块不导入 Qt，图片处理函数在调用时才导入 QtGui，可以在处理上传图片的工作进程中运行。
+
+    python -m common.screen_recognition 截图.png      识别截图并输出各项得分
+"""
+import argparse
+import math
+import operator
+import os
+import pickle
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from common.catalog import HERO_JSON, MAP_JSON, catalog
+from common.config import CACHE_DIR, resource_path
+
+RECOGNITION_CACHE = os.path.join(CACHE_DIR, "recognition.pickle")
+
+# 缓存格式版本，修改特征的计算方式时加一
+INDEX_VERSION = 1
+
+# 识别前把截图缩小到这个宽度以内
+WORK_WIDTH = 1280
+
+# 特征尺寸
+MAP_FEATURE = (16, 9)
+ICON_FEATURE = 16
+
+# 技能栏的搜索区域（相对截图宽高的 x, y, 宽, 高），按 16:9 的游戏界面布局
+ABILITY_REGION = (0.30, 0.86, 0.40, 0.14)
+
+# 技能栏中图标的高度范围（相对截图高度）
+ICON_MIN_HEIGHT = 0.015
+ICON_MAX_HEIGHT = 0.08
+
+# 图标长边与短边之比的上限
+ICON_MAX_ASPECT = 2.5
+
+# 亮度不低于这个值的像素视为图标，背景较亮时按区域平均亮度加一个标准差提高阈值
+ICON_BRIGHTNESS = 150
+
+# 间隔不超过这个距离（相对截图高度）的亮色区域可能属于同一个图标
+ICON_GAP = 0.006
+
+# 标准差低于这个亮度的区域视为纯色，不参与比较
+MIN_CONTRAST = 4.0
+
+# 判定为匹配的最低相关系数
+MAP_THRESHOLD = 0.45
+ICON_THRESHOLD = 0.7
+
+# 技能栏同时显示四个技能，至少匹配上这么多个不同的技能才判定为该英雄
+HERO_MIN_SKILLS = 2
+
+# 地图的最高得分需要比第二名高出这么多才采用
+MAP_MARGIN = 0.05
+
+# 模板图标合成到接近游戏界面的暗色背景上再计算特征
+ICON_BACKGROUND = (24, 28, 36)
+
+Vector = Tuple[float, ...]
+
+# 二值化后一行中连续的亮色像素
+_BRIGHT_RUN = re.compile(b"\x01+")
+
+
+class IconTemplate(NamedTuple):
+    hero: str
+    slot: str
+    vector: Vector
+
+
+@dataclass
+class TemplateIndex:
+    """地图封面和技能图标的特征"""
+    maps: List[Tuple[str, Vector]] = field(default_factory=list)
+    icons: List[IconTemplate] = field(default_factory=list)
+
+
+@dataclass
+class Recognition:
+    """一张截图的识别结果，得分列表都按得分从高到低排列"""
+    map: Optional[str] = None
+    hero: Optional[str] = None
+    maps: List[Tuple[float, str]] = field(default_factory=list)
+    heroes: List[Tuple[float, str]] = field(default_factory=list)
+    icons: List[Tuple[float, str, str]] = field(default_factory=list)    # 匹配上的图标 (得分, 英雄, 技能)
+
+
+# --- 特征 ---
+
+def _normalize(values: Sequence[float]) -> Optional[Vector]:
+    """减去均值并归一化，近似纯色时返回 None"""
+    n = len(values)
+    mean = sum(values) / n
+    centered = [v - mean for v in values]
+    norm = math.sqrt(sum(c * c for c in centered))
+    if norm < MIN_CONTRAST * math.sqrt(n):
+        return None
+    return tuple(c / norm for c in centered)
+
+
+def correlation(a: Vector, b: Vector) -> float:
+    return sum(map(operator.mul, a, b))
+
+
+def _pixels(image, channels: int) -> List[int]:
+    """逐行读取像素字节，去掉每行末尾的对齐填充"""
+    width = image.width() * channels
+    data = image.constBits().asstring(image.sizeInBytes())
+    stride = image.bytesPerLine()
+    values = []
+    for y in range(image.height()):
+        values.extend(data[y * stride:y * stride + width])
+    return values
+
+
+def _grayVector(image, width: int, height: int) -> Optional[Vector]:
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QImage
+
+    small = image.scaled(width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    return _normalize(_pixels(small.convertToFormat(QImage.Format_Grayscale8), 1))
+
+
+def mapVector(image) -> Optional[Vector]:
+    """整张图片的 RGB 特征"""
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QImage
+
+    small = image.scaled(*MAP_FEATURE, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    return _normalize(_pixels(small.convertToFormat(QImage.Format_RGB888), 3))
+
+
+def iconVector(path: str) -> Optional[Vector]:
+    """
+    技能图标的特征：裁掉透明边缘，合成到暗色背景上后缩小
+
+    截图中的候选区域同样裁到亮色像素的范围，两边的图标都拉伸到正方形，位置和比例可以对齐
+    """
+    from PyQt5.QtGui import QColor, QImage, QPainter
+
+    icon = QImage(path)
+    if icon.isNull():
+        return None
+
+    icon = icon.convertToFormat(QImage.Format_ARGB32)
+    alpha = icon.convertToFormat(QImage.Format_Alpha8)
+    rect = _brightRect(_pixels(alpha, 1), alpha.width(), alpha.height(), 128)
+    if rect is None:
+        return None
+
+    x0, y0, x1, y1 = rect
+    canvas = QImage(x1 - x0, y1 - y0, QImage.Format_RGB32)
+    canvas.fill(QColor(*ICON_BACKGROUND))
+    painter = QPainter(canvas)
+    painter.drawImage(0, 0, icon, x0, y0, x1 - x0, y1 - y0)
+    painter.end()
+    return _grayVector(canvas, ICON_FEATURE, ICON_FEATURE)
+
+
+def _brightRect(pixels: List[int], width: int, height: int,
+                threshold: int) -> Optional[Tuple[int, int, int, int]]:
+    """亮度不低于 threshold 的像素的外接矩形 (x0, y0, x1, y1)，不含 x1、y1"""
+    xs, ys = [], []
+    for y in range(height):
+        row = pixels[y * width:(y + 1) * width]
+        columns = [x for x, v in enumerate(row) if v >= threshold]
+        if columns:
+            xs.extend((columns[0], columns[-1]))
+            ys.append(y)
+    if not ys:
+        return None
+    return min(xs), ys[0], max(xs) + 1, ys[-1] + 1
+
+
+# --- 索引 ---
+
+def _templateSources() -> Tuple[List[Tuple[str, str]], List[Tuple[str, str, str]]]:
+    """([(地图, 封面路径)], [(英雄, 技能, 图标路径)])"""
+    c = catalog()
+    maps = [(m.name, resource_path(m.cover)) for m in c.maps]
+    icons = [(hero.name, slot, resource_path(path))
+             for hero in c.heroes for slot, path in sorted(hero.skills.items())]
+    return maps, icons
+
+
+def buildIndex() -> TemplateIndex:
+    """读取所有模板图片计算特征，缺失或无法解码的图片跳过"""
+    from PyQt5.QtGui import QImage
+
+    maps, icons = _templateSources()
+    index = TemplateIndex()
+    for name, path in maps:
+        vector = mapVector(QImage(path))
+        if vector is not None:
+            index.maps.append((name, vector))
+
+    for hero, slot, path in icons:
+        vector = iconVector(path)
+        if vector is not None:
+            index.icons.append(IconTemplate(hero, slot, vector))
+
+    return index
+
+
+def _sourceStamp() -> dict:
+    maps, icons = _templateSources()
+    paths = [HERO_JSON, MAP_JSON] + [m[1] for m in maps] + [i[2] for i in icons]
+    stamps = {}
+    for path in paths:
+        try:
+            stamps[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            stamps[path] = None
+    return {"version": INDEX_VERSION, "sources": stamps}
+
+
+def loadIndex(cachePath: Optional[str] = RECOGNITION_CACHE) -> TemplateIndex:
+    """
+    读取模板索引，优先使用缓存
+
+    参数:
+        cachePath (str): 缓存文件路径，None 表示不使用缓存
+    """
+    stamp = _sourceStamp()
+
+    if cachePath and os.path.exists(cachePath):
+        try:
+            with open(cachePath, "rb") as f:
+                cachedStamp, index = pickle.load(f)
+            if cachedStamp == stamp:
+                return index
+        except Exception:
+            # 缓存损坏或格式过期，重新生成
+            pass
+
+    index = buildIndex()
+
+    if cachePath:
+        os.makedirs(os.path.dirname(cachePath), exist_ok=True)
+        tmpPath = f"{cachePath}.{os.getpid()}.tmp"
+        with open(tmpPath, "wb") as f:
+            pickle.dump((stamp, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpPath, cachePath)
+
+    return index
+
+
+_index = None   # type: Optional[TemplateIndex]
+
+
+def templateIndex() -> TemplateIndex:
+    """返回进程内共享的模板索引"""
+    global _index
+    if _index is None:
+        _index = loadIndex(RECOGNITION_CACHE)
+
+    return _index
+
+
+# --- 识别 ---
+
+def _components(rows: List[bytes], threshold: int) -> List[List[int]]:
+    """
+    亮色像素的连通区域（四连通）的外接矩形 [x0, y0, x1, y1]
+
+    每行先用正则找出连续的亮色像素段，再把与上一行重叠的段用并查集合并
+    """
+    table = bytes(1 if v >= threshold else 0 for v in range(256))
+    parent = []     # type: List[int]
+    boxes = []      # type: List[List[int]]
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    previous = []   # type: List[Tuple[int, int, int]]   # 上一行的 (起点, 终点, 编号)
+    for y, row in enumerate(rows):
+        current = []
+        for match in _BRIGHT_RUN.finditer(row.translate(table)):
+            x0, x1 = match.span()
+            label = len(parent)
+            parent.append(label)
+            boxes.append([x0, y, x1, y + 1])
+            for px0, px1, other in previous:
+                if px0 < x1 and x0 < px1:
+                    a, b = find(label), find(other)
+                    if a != b:
+                        parent[b] = a
+                        box, merged = boxes[a], boxes[b]
+                        box[0], box[1] = min(box[0], merged[0]), min(box[1], merged[1])
+                        box[2], box[3] = max(box[2], merged[2]), max(box[3], merged[3])
+            current.append((x0, x1, label))
+        previous = current
+
+    return [boxes[i] for i in range(len(parent)) if parent[i] == i]
+
+
+def iconCandidates(region) -> List[Tuple[int, int, int, int]]:
+    """
+    技能栏区域中可能是图标的矩形 (x0, y0, x1, y1)
+
+    亮色像素的连通区域中大小合适的，以及相邻的连通区域合并后大小合适的（由几部分组成的图标）
+    """
+    from PyQt5.QtGui import QImage
+
+    gray = region.convertToFormat(QImage.Format_Grayscale8)
+    width, height = gray.width(), gray.height()
+    pixels = _pixels(gray, 1)
+    mean = sum(pixels) / len(pixels)
+    deviation = math.sqrt(sum((p - mean) ** 2 for p in pixels) / len(pixels))
+    threshold = max(ICON_BRIGHTNESS, int(mean + deviation))
+
+    data = bytes(pixels)
+    rows = [data[y * width:(y + 1) * width] for y in range(height)]
+
+    # 区域高度与截图高度的比例由 ABILITY_REGION 决定
+    screenHeight = height / ABILITY_REGION[3]
+    minSize = max(3, int(ICON_MIN_HEIGHT * screenHeight))
+    maxSize = int(ICON_MAX_HEIGHT * screenHeight)
+    gap = max(1, int(ICON_GAP * screenHeight))
+
+    def fits(box) -> bool:
+        return box[2] - box[0] <= maxSize and box[3] - box[1] <= maxSize
+
+    # 相距不超过 gap 的连通区域归为一组，由几部分组成的图标整体作为一个候选
+    parts = sorted((box for box in _components(rows, threshold) if fits(box)), key=lambda box: box[0])
+    groups = list(range(len(parts)))
+
+    def find(i: int) -> int:
+        while groups[i] != i:
+            groups[i] = groups[groups[i]]
+            i = groups[i]
+        return i
+
+    for i, box in enumerate(parts):
+        for j in range(i + 1, len(parts)):
+            other = parts[j]
+            if other[0] - box[2] > gap:
+                break
+            if other[1] - box[3] <= gap and box[1] - other[3] <= gap:
+                groups[find(j)] = find(i)
+
+    merged = {}     # type: Dict[int, List[int]]
+    for i, box in enumerate(parts):
+        group = merged.setdefault(find(i), list(box))
+        group[:] = [min(group[0], box[0]), min(group[1], box[1]), max(group[2], box[2]), max(group[3], box[3])]
+
+    # 贴着区域边缘的多半是场景的一部分
+    candidates = {tuple(box) for box in parts + list(merged.values())
+                  if fits(box) and box[0] > 0 and box[1] > 0 and box[2] < width and box[3] < height}
+
+    def iconLike(box) -> bool:
+        w, h = box[2] - box[0], box[3] - box[1]
+        return max(w, h) >= minSize and max(w, h) <= ICON_MAX_ASPECT * min(w, h)
+
+    return sorted(box for box in candidates if iconLike(box))
+
+
+def _matchIcons(region, index: TemplateIndex) -> List[Tuple[float, str, str]]:
+    """每个候选区域最相似的技能图标，低于阈值的丢弃"""
+    matches = []
+    for x0, y0, x1, y1 in iconCandidates(region):
+        best = None
+        # 候选的亮色范围受阈值影响，向外扩一个像素再比较一次
+        for pad in (0, 1):
+            crop = region.copy(x0 - pad, y0 - pad, x1 - x0 + 2 * pad, y1 - y0 + 2 * pad)
+            vector = _grayVector(crop, ICON_FEATURE, ICON_FEATURE)
+            if vector is None:
+                continue
+            for template in index.icons:
+                score = correlation(vector, template.vector)
+                if best is None or score > best[0]:
+                    best = (score, template.hero, template.slot)
+
+        if best is not None and best[0] >= ICON_THRESHOLD:
+            matches.append(best)
+
+    matches.sort(reverse=True)
+    return matches
+
+
+def _runnerUp(ranking: List[Tuple[float, str]], default: float) -> float:
+    return ranking[1][0] if len(ranking) > 1 else default
+
+
+def recognizeImage(image, index: TemplateIndex = None) -> Recognition:
+    """
+    识别一张截图
+
+    参数:
+        image (QImage): 截图
+        index: 模板索引，默认为 templateIndex()
+    """
+    from PyQt5.QtCore import Qt
+
+    index = index or templateIndex()
+    if image.width() > WORK_WIDTH:
+        image = image.scaledToWidth(WORK_WIDTH, Qt.SmoothTransformation)
+
+    result = Recognition()
+    vector = mapVector(image)
+    if vector is not None:
+        result.maps = sorted(((correlation(vector, v), name) for name, v in index.maps), reverse=True)
+    if result.maps:
+        best, name = result.maps[0]
+        if best >= MAP_THRESHOLD and best - _runnerUp(result.maps, -1.0) >= MAP_MARGIN:
+            result.map = name
+
+    x, y, w, h = ABILITY_REGION
+    region = image.copy(int(x * image.width()), int(y * image.height()),
+                        int(w * image.width()), int(h * image.height()))
+    result.icons = _matchIcons(region, index)
+
+    # 每个英雄每个技能取最高的一次匹配，技能匹配得越多得分越高
+    slots = {}      # type: Dict[Tuple[str, str], float]
+    for score, hero, slot in result.icons:
+        slots[(hero, slot)] = max(score, slots.get((hero, slot), 0.0))
+    heroes = {}     # type: Dict[str, float]
+    counts = {}     # type: Dict[str, int]
+    for (hero, _), score in slots.items():
+        heroes[hero] = heroes.get(hero, 0.0) + score
+        counts[hero] = counts.get(hero, 0) + 1
+
+    result.heroes = sorted(((score, hero) for hero, score in heroes.items()), reverse=True)
+    if result.heroes:
+        best, hero = result.heroes[0]
+        if best > _runnerUp(result.heroes, 0.0) and counts[hero] >= HERO_MIN_SKILLS:
+            result.hero = hero
+
+    return result
+
+
+def recognizeFile(path: str) -> Recognition:
+    """读取并识别截图文件，图片无法解码时返回空结果"""
+    from PyQt5.QtGui import QImageReader
+
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    image = reader.read()
+    return Recognition() if image.isNull() else recognizeImage(image)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m common.screen_recognition", description="从截图识别地图和英雄")
+    parser.add_argument("paths", nargs="+", help="截图文件")
+    parser.add_argument("--rebuild", action="store_true", help="忽略缓存重新构建模板索引")
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(RECOGNITION_CACHE):
+        os.remove(RECOGNITION_CACHE)
+
+    c = catalog()
+    for path in args.paths:
+        result = recognizeFile(path)
+        print(path)
+        print(f"  地图: {c.mapLabel(result.map) if result.map else '未识别'}  "
+              + "  ".join(f"{c.mapLabel(name)} {score:.2f}" for score, name in result.maps[:3]))
+        print(f"  英雄: {c.heroLabel(result.hero) if result.hero else '未识别'}  "
+              + "  ".join(f"{c.heroLabel(name)} {score:.2f}" for score, name in result.heroes[:3]))
+        for score, hero, slot in result.icons:
+            print(f"    {c.heroLabel(hero)} {c.skillLabel(slot)} {score:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+# coding:utf-8
+"""全局信号总线，用于在互不引用的页面之间通知数据变化"""
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class SignalBus(QObject):
+    """信号总线"""
+
+    # 新点位已保存，参数为点位 id
+    lineupSaved = pyqtSignal(int)
+
+    # 从点位包导入了一批点位，参数为新点位的 id 列表
+    lineupsImported = pyqtSignal(list)
+
+
+signalBus = SignalBus()
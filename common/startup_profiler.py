@@ -0,0 +1,83 @@
+# coding:utf-8
+"""
+启动耗时统计
+
+使用 --profile-startup 启动时记录各阶段（导入、创建 QApplication、
+每个页面的构造、第一次显示）的耗时并写成 JSON，方便在版本之间对比。
+未启用时 phase() 不做任何事情，可以放心留在代码里。
+"""
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+
+class StartupProfiler:
+    """启动阶段计时器"""
+
+    def __init__(self):
+        self.enabled = False
+        self.origin = time.perf_counter()
+        self.phases = []    # type: List[dict]
+
+    def enable(self, origin: Optional[float] = None):
+        """
+        开始记录
+
+        参数:
+            origin (float): 计时起点（time.perf_counter()），默认为当前时间
+        """
+        self.enabled = True
+        self.origin = time.perf_counter() if origin is None else origin
+        self.phases.clear()
+
+    def _elapsedMs(self, t: float) -> float:
+        return round((t - self.origin) * 1000, 3)
+
+    @contextmanager
+    def phase(self, name: str):
+        """记录 with 语句块的耗时"""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.phases.append({
+                "name": name,
+                "start_ms": self._elapsedMs(start),
+                "duration_ms": round((end - start) * 1000, 3),
+            })
+
+    def mark(self, name: str):
+        """记录一个时间点"""
+        if self.enabled:
+            t = self._elapsedMs(time.perf_counter())
+            self.phases.append({"name": name, "start_ms": t, "duration_ms": 0.0})
+
+    def report(self) -> dict:
+        return {
+            "version": 1,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "argv": sys.argv,
+            "total_ms": max((p["start_ms"] + p["duration_ms"] for p in self.phases), default=0.0),
+            "phases": self.phases,
+        }
+
+    def save(self, path: str):
+        """把记录写成 JSON 文件"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+
+startupProfiler = StartupProfiler()
@@ -0,0 +1,89 @@
+# coding:utf-8
+"""
+磁盘缩略图缓存
+
+地图封面、英雄立绘都是大尺寸 PNG，每次启动都解码并缩放一遍代价很高。
+这里把缩放后的图片按 (源路径, 修改时间, 目标尺寸, 设备像素比) 存到磁盘，
+热启动时只读取小尺寸的缩略图，源文件改动后会自动重新生成。
+"""
+import hashlib
+import os
+
+from PyQt5.QtCore import QSize, Qt
+from PyQt5.QtGui import QImage, QImageReader
+
+from common.config import THUMBNAIL_DIR, resource_path
+
+
+class ThumbnailCache:
+    """缩略图缓存，生成的图片按比例缩放到目标尺寸以内"""
+
+    def __init__(self, cacheDir: str = THUMBNAIL_DIR):
+        self.cacheDir = cacheDir
+
+    def cachePath(self, path: str, size: QSize, dpr: float = 1.0):
+        """
+        计算缓存文件路径，源文件不存在时返回 None
+
+        参数:
+            path (str): 源图片路径
+            size (QSize): 目标逻辑尺寸
+            dpr (float): 设备像素比
+        """
+        path = os.path.abspath(resource_path(path))
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        key = f"{path}|{mtime}|{size.width()}x{size.height()}|{dpr:.2f}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cacheDir, digest[:2], digest + ".png")
+
+    def load(self, path: str, size: QSize, dpr: float = 1.0) -> QImage:
+        """
+        读取缩略图，缓存未命中时从源文件生成并写入缓存
+
+        返回的图片已设置设备像素比，逻辑尺寸不超过 size；
+        源图片无法读取时返回空 QImage
+        """
+        cachePath = self.cachePath(path, size, dpr)
+        if cachePath is None:
+            return QImage()
+
+        image = QImage(cachePath)
+        if image.isNull():
+            image = self._generate(resource_path(path), size * dpr)
+            if image.isNull():
+                return image
+
+            self._save(image, cachePath)
+
+        image.setDevicePixelRatio(dpr)
+        return image
+
+    def _generate(self, path: str, size: QSize) -> QImage:
+        """解码源图片并缩放到目标像素尺寸以内"""
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+
+        # 只读取文件头得到原始尺寸，让解码器直接输出缩放后的图片
+        sourceSize = reader.size()
+        if sourceSize.isValid():
+            scaledSize = sourceSize.scaled(size, Qt.KeepAspectRatio)
+            if scaledSize.width() < sourceSize.width():
+                reader.setScaledSize(scaledSize)
+
+        return reader.read()
+
+    def _save(self, image: QImage, cachePath: str):
+        """先写临时文件再重命名，避免并发读取到写了一半的缓存"""
+        os.makedirs(os.path.dirname(cachePath), exist_ok=True)
+        tmpPath = f"{cachePath}.{os.getpid()}.{id(image)}.tmp"
+        if image.save(tmpPath, "PNG"):
+            os.replace(tmpPath, cachePath)
+        elif os.path.exists(tmpPath):
+            os.remove(tmpPath)
+
+
+thumbnailCache = ThumbnailCache()
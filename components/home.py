@@ -1,9 +1,7 @@
-import sys
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout
+from PyQt5.QtWidgets import QWidget, QHBoxLayout
 from PyQt5.QtCore import Qt,QSize
-from PyQt5.QtGui import QPixmap,QColor
-from PyQt5.QtWidgets import QStackedWidget, QLabel
-from qfluentwidgets import CardWidget, ImageLabel, CaptionLabel, FluentIcon, TransparentToolButton
+from PyQt5.QtGui import QColor
+from qfluentwidgets import CardWidget, FluentIcon, TransparentToolButton
 # from qfluentwidgets import *
 
 
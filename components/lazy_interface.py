@@ -0,0 +1,47 @@
+from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtWidgets import QVBoxLayout, QWidget
+
+from common.startup_profiler import startupProfiler
+
+
+class LazyInterface(QWidget):
+    """
+    延迟创建的子界面
+    注册到导航栏的是这个轻量的占位控件，真正的页面在第一次显示时才创建
+    """
+
+    # 真正的页面创建完成时发出
+    created = pyqtSignal(QWidget)
+
+    def __init__(self, factory, objectName: str, parent=None):
+        """
+        参数:
+            factory: 无参数的可调用对象，返回真正的页面
+            objectName (str): 子界面的全局唯一对象名（导航栏路由键）
+            parent: 父组件，默认为None
+        """
+        super().__init__(parent)
+        self.setObjectName(objectName)
+        self.factory = factory
+        self.widget = None
+
+        self.vBoxLayout = QVBoxLayout(self)
+        self.vBoxLayout.setContentsMargins(0, 0, 0, 0)
+
+    def isCreated(self) -> bool:
+        return self.widget is not None
+
+    def ensureCreated(self) -> QWidget:
+        """创建真正的页面（只创建一次）并返回"""
+        if self.widget is None:
+            with startupProfiler.phase(f"construct {self.objectName()}"):
+                self.widget = self.factory()
+            self.vBoxLayout.addWidget(self.widget)
+            self.created.emit(self.widget)
+
+        return self.widget
+
+    def showEvent(self, event):
+        """ 第一次显示时创建页面 """
+        self.ensureCreated()
+        super().showEvent(event)
@@ -0,0 +1,461 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+from PyQt5.QtCore import QPointF, QRectF, QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QPainter, QPainterPath, QPen, QPixmap, QRegion
+from PyQt5.QtWidgets import QWidget
+
+from common.catalog import catalog
+from common.image_loader import imageLoader
+from common.lineup_spatial import MAP_ASPECT, PositionGrid
+from common.lineup_store import IMAGE_KINDS
+
+# 站位和落点标记的颜色
+KIND_COLORS = {"stand": QColor(0x1E, 0x90, 0xFF), "land": QColor(255, 70, 84)}
+
+_markers = {}   # type: Dict[tuple, QPixmap]
+
+
+def markerPixmap(color: QColor, radius: int, dpr: float) -> QPixmap:
+    """
+    白边圆点标记，按 (颜色, 半径, 设备像素比) 缓存
+
+    几百个标记逐个画抗锯齿圆形很慢，预先画好再用 drawPixmap 复制
+    """
+    key = (color.rgba(), radius, round(dpr, 2))
+    pixmap = _markers.get(key)
+    if pixmap is None:
+        size = (radius + 1) * 2
+        pixmap = QPixmap(QSize(size, size) * dpr)
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.transparent)
+
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(Qt.white, 1.5))
+        painter.setBrush(color)
+        painter.drawEllipse(QRectF(1, 1, size - 2, size - 2))
+        painter.end()
+        pixmap = _markers[key] = pixmap
+
+    return pixmap
+
+
+class MapCanvas(QWidget):
+    """
+    按比例显示地图图片的画布，负责 0~1 地图坐标与控件坐标之间的转换
+    子类重写 paintOverlay() 在地图上绘制标记
+    """
+
+    # 地图图片加载的尺寸上限，缩放到控件大小的结果另外缓存
+    COVER_SIZE = QSize(1280, 720)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.mapKey = None
+        self.cover = None           # type: Optional[QPixmap]
+        self._scaled = None         # type: Optional[QPixmap]   # 缩放到当前大小的地图
+        self.setMouseTracking(True)
+
+    def setMap(self, mapKey: Optional[str]):
+        """切换地图，图片在后台加载"""
+        if mapKey == self.mapKey:
+            return
+
+        imageLoader.cancel(self)
+        self.mapKey = mapKey
+        self.cover = self._scaled = None
+        self.update()
+
+        gameMap = catalog().map(mapKey) if mapKey else None
+        if gameMap is not None:
+            imageLoader.loadPixmap(gameMap.cover, self.COVER_SIZE, self.devicePixelRatioF(), self,
+                                   lambda pixmap, key=mapKey: self._onCoverLoaded(key, pixmap))
+
+    def _onCoverLoaded(self, mapKey: str, pixmap: QPixmap):
+        if mapKey == self.mapKey and not pixmap.isNull():
+            self.cover = pixmap
+            self._scaled = None
+            self.coverChanged()
+            self.update()
+
+    def coverChanged(self):
+        """地图图片加载完成，图片区域可能改变"""
+
+    # --- 坐标 ---
+
+    def imageRect(self) -> QRectF:
+        """地图图片在控件中的区域，按比例居中"""
+        if self.cover is not None:
+            aspect = self.cover.height() / self.cover.width()
+        else:
+            aspect = MAP_ASPECT
+
+        rect = QRectF(self.rect())
+        width = min(rect.width(), rect.height() / aspect)
+        image = QRectF(0, 0, width, width * aspect)
+        image.moveCenter(rect.center())
+        return image
+
+    def toMap(self, pos: QPointF) -> Optional[Tuple[float, float]]:
+        """控件坐标转换为地图坐标，在地图外时返回 None"""
+        rect = self.imageRect()
+        if not rect.contains(pos):
+            return None
+        return (pos.x() - rect.left()) / rect.width(), (pos.y() - rect.top()) / rect.height()
+
+    def toWidget(self, point: Tuple[float, float]) -> QPointF:
+        rect = self.imageRect()
+        return QPointF(rect.left() + point[0] * rect.width(), rect.top() + point[1] * rect.height())
+
+    # --- 绘制 ---
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform)
+
+        rect = self.imageRect()
+        path = QPainterPath()
+        path.addRoundedRect(rect, 8, 8)
+
+        painter.save()
+        painter.setClipPath(path)
+        if self.cover is not None:
+            painter.drawPixmap(rect.topLeft(), self._scaledCover(rect.size().toSize()))
+        else:
+            painter.fillRect(rect, QColor(0, 0, 0, 15))
+            painter.setPen(QColor(0x66, 0x66, 0x66))
+            painter.drawText(rect, Qt.AlignCenter, "加载中..." if self.mapKey else "请先选择地图")
+        painter.restore()
+
+        if self.cover is not None:
+            self.paintOverlay(painter)
+
+    def _scaledCover(self, size: QSize) -> QPixmap:
+        """缩放到当前大小的地图，大小变化时才重新缩放"""
+        dpr = self.devicePixelRatioF()
+        if self._scaled is None or self._scaled.size() != size * dpr:
+            self._scaled = self.cover.scaled(size * dpr, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            self._scaled.setDevicePixelRatio(dpr)
+        return self._scaled
+
+    def paintOverlay(self, painter: QPainter):
+        """在地图上绘制标记"""
+
+
+class PositionPicker(MapCanvas):
+    """
+    在地图上标注站位和落点
+    左键放置当前类型的标记，右键清除，放好站位后自动切换到落点
+    """
+
+    positionChanged = pyqtSignal(str, object)   # (类型, 坐标或 None)
+    kindChanged = pyqtSignal(str)
+
+    MARKER_RADIUS = 7
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.kind = "stand"
+        self.positions = {"stand": None, "land": None}  # type: Dict[str, Optional[Tuple[float, float]]]
+        self.setCursor(Qt.CrossCursor)
+
+    def setKind(self, kind: str):
+        if kind != self.kind:
+            self.kind = kind
+            self.kindChanged.emit(kind)
+
+    def position(self, kind: str) -> Optional[Tuple[float, float]]:
+        return self.positions[kind]
+
+    def setPosition(self, kind: str, point: Optional[Tuple[float, float]]):
+        if point != self.positions[kind]:
+            self.positions[kind] = point
+            self.positionChanged.emit(kind, point)
+            self.update()
+
+    def clear(self):
+        for kind in self.positions:
+            self.setPosition(kind, None)
+        self.setKind("stand")
+
+    def mousePressEvent(self, event):
+        if self.cover is None:
+            return
+
+        if event.button() == Qt.RightButton:
+            self.setPosition(self.kind, None)
+            return
+
+        point = self.toMap(QPointF(event.pos()))
+        if event.button() == Qt.LeftButton and point is not None:
+            self.setPosition(self.kind, point)
+            if self.kind == "stand" and self.positions["land"] is None:
+                self.setKind("land")
+
+    def paintOverlay(self, painter: QPainter):
+        points = {kind: self.toWidget(p) for kind, p in self.positions.items() if p is not None}
+        if len(points) == 2:
+            painter.setPen(QPen(QColor(255, 255, 255, 220), 2, Qt.DashLine))
+            painter.drawLine(points["stand"], points["land"])
+
+        radius = self.MARKER_RADIUS
+        for kind, center in points.items():
+            painter.drawPixmap(center - QPointF(radius + 1, radius + 1),
+                               markerPixmap(KIND_COLORS[kind], radius, self.devicePixelRatioF()))
+            painter.setPen(Qt.white)
+            painter.drawText(QRectF(center.x() + radius + 2, center.y() - 10, 40, 20),
+                             Qt.AlignLeft | Qt.AlignVCenter, IMAGE_KINDS[kind])
+
+
+class LineupMapView(MapCanvas):
+    """
+    在地图上显示点位的站位（蓝）和落点（红）标记
+
+    标记从空间索引的网格读取，预先画好的圆点用 drawPixmap 复制；
+    悬停和点击的命中检测通过网格查找附近的标记，悬停变化时只重绘受影响的区域。
+    点击空白处查找落点在附近的点位，拖动框选查找站位在框内（从该区域投掷）的点位。
+    """
+
+    lineupClicked = pyqtSignal(int)
+    lineupsQueried = pyqtSignal(list, str)  # (点位 id 列表, 查询说明)
+
+    MARKER_RADIUS = 4
+    ACTIVE_RADIUS = 7       # 悬停、选中、查询命中的标记
+    HIT_DISTANCE = 8        # 命中标记的距离（像素）
+    QUERY_RADIUS = 0.04     # 点击查询的半径（地图宽度）
+    DRAG_DISTANCE = 5       # 超过这个距离（像素）视为框选
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.grids = {"stand": PositionGrid(), "land": PositionGrid()}
+        self.allowed = None         # type: Optional[Set[int]]
+        self.hovered = None         # type: Optional[int]
+        self.selected = None        # type: Optional[int]
+        self.highlighted = set()    # type: Set[int]
+        self.queryShape = None      # type: Optional[tuple]   # ("circle", 圆心, 半径) 或 ("rect", 矩形)
+        self._pressPos = None
+        self._dragRect = None       # type: Optional[QRectF]
+        self._points = None         # type: Optional[List[tuple]]   # 缓存的 (类型, id, 控件坐标)
+        self._pointsRect = None
+
+    def setMarkers(self, stand: PositionGrid, land: PositionGrid, allowed: Set[int] = None):
+        """
+        设置要显示的标记
+
+        参数:
+            stand, land: 当前地图的站位、落点网格
+            allowed: 只显示其中的点位（其余筛选条件），None 表示全部显示
+        """
+        self.grids = {"stand": stand, "land": land}
+        self.allowed = allowed
+        self.hovered = self.selected = None
+        self.highlighted = set()
+        self.queryShape = None
+        self._points = None
+        self.update()
+
+    def markerCount(self) -> int:
+        return len(self._ids())
+
+    def _ids(self) -> Set[int]:
+        ids = {i for grid in self.grids.values() for i, _ in grid.items()}
+        return ids if self.allowed is None else ids & self.allowed
+
+    def setSelected(self, lineupId: Optional[int]):
+        if lineupId != self.selected:
+            region = self._lineupRegion(self.selected) | self._lineupRegion(lineupId)
+            self.selected = lineupId
+            self.update(region)
+
+    def coverChanged(self):
+        self._points = None
+
+    # --- 命中检测 ---
+
+    def lineupAt(self, pos: QPointF) -> Optional[int]:
+        """pos 附近最近的标记对应的点位"""
+        point = self.toMap(pos)
+        if point is None:
+            return None
+
+        radius = self.HIT_DISTANCE / self.imageRect().width()
+        best = None
+        for grid in self.grids.values():
+            results = grid.within(point[0], point[1], radius, self.allowed)
+            if results and (best is None or results[0] < best):
+                best = results[0]
+
+        return best[1] if best else None
+
+    def _lineupRegion(self, lineupId: Optional[int]) -> QRegion:
+        """点位的标记和连线所在的区域"""
+        if lineupId is None:
+            return QRegion()
+
+        points = [self.toWidget(p) for p in (g.position(lineupId) for g in self.grids.values()) if p]
+        if not points:
+            return QRegion()
+
+        rect = QRectF(points[0], points[-1]).normalized()
+        margin = self.ACTIVE_RADIUS + 3
+        return QRegion(rect.adjusted(-margin, -margin, margin, margin).toAlignedRect())
+
+    # --- 鼠标事件 ---
+
+    def mouseMoveEvent(self, event):
+        pos = QPointF(event.pos())
+        if self._pressPos is not None and (pos - self._pressPos).manhattanLength() > self.DRAG_DISTANCE:
+            old = self._dragRect
+            self._dragRect = QRectF(self._pressPos, pos).normalized()
+            region = QRegion(self._dragRect.toAlignedRect().adjusted(-2, -2, 2, 2))
+            if old is not None:
+                region |= QRegion(old.toAlignedRect().adjusted(-2, -2, 2, 2))
+            self.update(region)
+            return
+
+        hovered = self.lineupAt(pos)
+        if hovered != self.hovered:
+            region = self._lineupRegion(self.hovered) | self._lineupRegion(hovered)
+            self.hovered = hovered
+            self.setCursor(Qt.PointingHandCursor if hovered is not None else Qt.ArrowCursor)
+            self.update(region)
+
+    def leaveEvent(self, event):
+        if self.hovered is not None:
+            region = self._lineupRegion(self.hovered)
+            self.hovered = None
+            self.update(region)
+        super().leaveEvent(event)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and self.cover is not None:
+            self._pressPos = QPointF(event.pos())
+
+    def mouseReleaseEvent(self, event):
+        if self._pressPos is None:
+            return
+
+        pos = QPointF(event.pos())
+        dragRect, self._dragRect, self._pressPos = self._dragRect, None, None
+
+        if dragRect is not None:
+            self.queryRect(dragRect)
+            return
+
+        lineupId = self.lineupAt(pos)
+        if lineupId is not None:
+            self.setSelected(lineupId)
+            self.lineupClicked.emit(lineupId)
+            return
+
+        point = self.toMap(pos)
+        if point is not None:
+            self.queryCircle(point, self.QUERY_RADIUS)
+
+    # --- 查询 ---
+
+    def queryCircle(self, point: Tuple[float, float], radius: float):
+        """落点在 point 附近 radius 以内的点位"""
+        ids = [i for _, i in self.grids["land"].within(point[0], point[1], radius, self.allowed)]
+        self._setQuery(("circle", point, radius), ids, f"落点在所选位置附近的点位 {len(ids)} 个")
+
+    def queryRect(self, rect: QRectF):
+        """站位在 rect（控件坐标）内的点位"""
+        image = self.imageRect()
+        rect = rect.intersected(image)
+        if rect.isEmpty():
+            return
+
+        x0, y0 = self.toMap(rect.topLeft()) or (0, 0)
+        x1 = (rect.right() - image.left()) / image.width()
+        y1 = (rect.bottom() - image.top()) / image.height()
+        ids = self.grids["stand"].inRect(x0, y0, x1, y1, self.allowed)
+        self._setQuery(("rect", (x0, y0, x1, y1)), ids, f"从所选区域投掷的点位 {len(ids)} 个")
+
+    def clearQuery(self):
+        self.queryShape = None
+        self.highlighted = set()
+        self.update()
+
+    def _setQuery(self, shape: tuple, ids: List[int], description: str):
+        self.queryShape = shape
+        self.highlighted = set(ids)
+        self.update()
+        self.lineupsQueried.emit(ids, description)
+
+    # --- 绘制 ---
+
+    def _markerPoints(self) -> List[tuple]:
+        """所有标记的控件坐标，地图区域不变时重复使用"""
+        rect = self.imageRect()
+        if self._points is None or self._pointsRect != rect:
+            points = []
+            for kind, grid in self.grids.items():
+                for lineupId, point in grid.items():
+                    if self.allowed is None or lineupId in self.allowed:
+                        points.append((kind, lineupId, self.toWidget(point)))
+            self._points, self._pointsRect = points, rect
+        return self._points
+
+    def resizeEvent(self, event):
+        self._points = None
+        super().resizeEvent(event)
+
+    def paintOverlay(self, painter: QPainter):
+        dpr = self.devicePixelRatioF()
+        dimmed = self.queryShape is not None
+        small, large = self.MARKER_RADIUS, self.ACTIVE_RADIUS
+
+        sprites = {}
+        for kind, color in KIND_COLORS.items():
+            faded = QColor(color)
+            faded.setAlpha(90 if dimmed else 255)
+            sprites[kind] = (markerPixmap(faded, small, dpr), markerPixmap(color, large, dpr))
+
+        # 只绘制需要重绘区域内的标记
+        clip = QRectF(painter.clipBoundingRect()) if painter.hasClipping() else QRectF(self.rect())
+        clip.adjust(-large - 1, -large - 1, large + 1, large + 1)
+        active = {self.hovered, self.selected}
+
+        for kind, lineupId, center in self._markerPoints():
+            if not clip.contains(center):
+                continue
+            if lineupId in self.highlighted or lineupId in active:
+                sprite, radius = sprites[kind][1], large
+            else:
+                sprite, radius = sprites[kind][0], small
+            painter.drawPixmap(center - QPointF(radius + 1, radius + 1), sprite)
+
+        self._paintQuery(painter)
+        for lineupId in (self.selected, self.hovered):
+            self._paintRoute(painter, lineupId)
+
+        if self._dragRect is not None:
+            painter.setPen(QPen(QColor(255, 255, 255, 200), 1, Qt.DashLine))
+            painter.setBrush(QColor(255, 255, 255, 40))
+            painter.drawRect(self._dragRect)
+
+    def _paintQuery(self, painter: QPainter):
+        if self.queryShape is None:
+            return
+
+        painter.setPen(QPen(QColor(255, 255, 255, 220), 1.5, Qt.DashLine))
+        painter.setBrush(QColor(255, 255, 255, 30))
+        rect = self.imageRect()
+        if self.queryShape[0] == "circle":
+            _, point, radius = self.queryShape
+            r = radius * rect.width()
+            painter.drawEllipse(self.toWidget(point), r, r)
+        else:
+            x0, y0, x1, y1 = self.queryShape[1]
+            painter.drawRect(QRectF(self.toWidget((x0, y0)), self.toWidget((x1, y1))))
+
+    def _paintRoute(self, painter: QPainter, lineupId: Optional[int]):
+        """站位到落点的连线"""
+        if lineupId is None:
+            return
+
+        stand, land = self.grids["stand"].position(lineupId), self.grids["land"].position(lineupId)
+        if stand and land:
+            painter.setPen(QPen(QColor(255, 255, 255, 230), 2, Qt.DashLine))
+            painter.drawLine(self.toWidget(stand), self.toWidget(land))
@@ -0,0 +1,59 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from common.lineup_pack import PackError, exportPack, importPack
+from common.lineup_store import LineupStore
+
+
+class PackTask(QThread):
+    """
+    在后台线程中导入或导出点位包
+    SQLite 连接不能跨线程使用，线程内会用同样的路径单独打开一个数据库连接
+    """
+
+    IMPORT, EXPORT = "import", "export"
+
+    # (已处理数量, 总数)，导出时总数为 0
+    progressChanged = pyqtSignal(int, int)
+    # 导入时为 ImportResult，导出时为导出的点位数量
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, mode: str, packPath: str, store: LineupStore, filters: dict = None, parent=None):
+        """
+        参数:
+            mode (str): PackTask.IMPORT 或 PackTask.EXPORT
+            packPath (str): 点位包路径
+            store: 界面使用的点位数据库，只读取它的路径
+            filters (dict): 导出时的筛选条件
+            parent: 父对象，默认为None
+        """
+        super().__init__(parent)
+        self.mode = mode
+        self.packPath = packPath
+        self.dbPath = store.path
+        self.blobDir = store.blobs.root
+        self.filters = filters or {}
+
+    def run(self):
+        store = None
+        try:
+            store = LineupStore(self.dbPath, self.blobDir)
+            if self.mode == self.IMPORT:
+                result = importPack(self.packPath, store, progress=self.progressChanged.emit)
+            else:
+                result = exportPack(self.packPath, store, progress=self._onExportProgress, **self.filters)
+        except (PackError, OSError) as e:
+            self.failed.emit(str(e))
+        except Exception as e:
+            # 数据库错误、校验进程崩溃等也要通知界面，否则界面会一直等待结果
+            self.failed.emit(f"{type(e).__name__}: {e}")
+        else:
+            self.succeeded.emit(result)
+        finally:
+            if store is not None:
+                store.close()
+
+    def _onExportProgress(self, count: int):
+        # 每个点位都发信号太频繁，每 100 个通知一次
+        if count % 100 == 0:
+            self.progressChanged.emit(count, 0)
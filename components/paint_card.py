@@ -0,0 +1,113 @@
+from PyQt5.QtCore import QRectF, Qt
+from PyQt5.QtGui import QColor, QMouseEvent, QPainter, QPen
+from PyQt5.QtWidgets import QWidget
+from qfluentwidgets import isDarkTheme
+
+# 卡片状态
+NORMAL, HOVER, PRESSED = 0, 1, 2
+
+
+class PaintCard(QWidget):
+    """
+    自绘卡片基类
+    悬停、按下、选中的边框和背景都在 paintEvent 中根据缓存的状态绘制，
+    状态变化时只调用 update()，不修改样式表，不会触发重新应用样式和重新布局。
+    子类重写 paintContent() 绘制卡片内容。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.state = NORMAL
+        self.selected = False
+        self.borderRadius = 8
+        self.borderWidth = 4
+
+        # 各状态的边框颜色，None 表示不画边框
+        self.borderColors = {
+            NORMAL: None,
+            HOVER: QColor(255, 0, 0),
+            PRESSED: QColor(0, 0, 255),
+        }
+        self.selectedBorderColor = QColor(255, 70, 84)
+
+    # --- 状态 ---
+
+    def setState(self, state: int):
+        """ 只有状态真正变化时才重绘 """
+        if state != self.state:
+            self.state = state
+            self.update()
+
+    def setSelected(self, selected: bool):
+        if selected != self.selected:
+            self.selected = selected
+            self.update()
+
+    def isSelected(self) -> bool:
+        return self.selected
+
+    def setBorderRadius(self, radius: int):
+        self.borderRadius = radius
+        self.update()
+
+    # --- 鼠标事件 ---
+
+    def enterEvent(self, event):
+        self.setState(HOVER)
+        super().enterEvent(event)
+
+    def leaveEvent(self, event):
+        self.setState(NORMAL)
+        super().leaveEvent(event)
+
+    def mousePressEvent(self, event: QMouseEvent):
+        if event.button() == Qt.LeftButton:
+            self.setState(PRESSED)
+        super().mousePressEvent(event)
+
+    def mouseReleaseEvent(self, event: QMouseEvent):
+        # 释放时仍在卡片上则恢复悬停状态，否则恢复普通状态
+        self.setState(HOVER if self.rect().contains(event.pos()) else NORMAL)
+        super().mouseReleaseEvent(event)
+
+    # --- 绘制 ---
+
+    def backgroundColor(self) -> QColor:
+        if isDarkTheme():
+            return QColor(255, 255, 255, 16 if self.state == HOVER else 13)
+        return QColor(255, 255, 255, 255 if self.state == HOVER else 170)
+
+    def borderColor(self):
+        color = self.borderColors.get(self.state)
+        if color is None and self.selected:
+            color = self.selectedBorderColor
+        return color
+
+    def contentRect(self) -> QRectF:
+        """ 边框以内的区域 """
+        m = self.borderWidth
+        return QRectF(self.rect()).adjusted(m, m, -m, -m)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform)
+
+        # 背景
+        r = self.borderRadius
+        painter.setPen(QColor(0, 0, 0, 48 if isDarkTheme() else 12))
+        painter.setBrush(self.backgroundColor())
+        painter.drawRoundedRect(QRectF(self.rect()).adjusted(0.5, 0.5, -0.5, -0.5), r, r)
+
+        self.paintContent(painter)
+
+        # 状态边框画在内容上面
+        color = self.borderColor()
+        if color is not None:
+            w = self.borderWidth
+            painter.setPen(QPen(color, w))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRoundedRect(QRectF(self.rect()).adjusted(w / 2, w / 2, -w / 2, -w / 2), r, r)
+
+    def paintContent(self, painter: QPainter):
+        """ 绘制卡片内容，由子类重写 """
+        pass
@@ -1,12 +1,24 @@
 # coding:utf-8
 import sys
+import time
 
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
-from PyQt5.QtWidgets import QApplication, QWidget, QStackedWidget, QVBoxLayout, QLabel
+from PyQt5.QtWidgets import QApplication, QFileDialog, QHBoxLayout, QWidget, QStackedWidget, QVBoxLayout, QLabel
 
-from qfluentwidgets import Pivot, setTheme, CaptionLabel,ElevatedCardWidget,ImageLabel
+from qfluentwidgets import InfoBar, Pivot, PushButton, SearchLineEdit, StateToolTip
+from qfluentwidgets import FluentIcon as FIF
+from components.pack_task import PackTask
 from components.queryPageSub.map_select import MapSelect
+from components.queryPageSub.hero_select import HeroSelect
+from components.queryPageSub.lineup_map import LineupMap
+from components.queryPageSub.lineup_result import LineupResult, LineupResultModel
+from components.queryPageSub.search_result import SearchResult
+from common.lineup_index import lineupIndex, iterBits
+from common.lineup_search import indexLineup, lineupSearch
+from common.lineup_spatial import indexLineupPosition
+from common.lineup_store import lineupStore
+from common.prefetch import IDLE_DELAY, RESULT_THUMB_SIZE, PrefetchImage, prefetcher
+from common.signal_bus import signalBus
 # from queryPageSub.map_select import MapSelect
 
 
@@ -39,15 +51,55 @@ class QueryPage(QWidget):
               
           # 添加地图选择界面
         self.mapSelect = MapSelect()
-        self.albumInterface = QLabel('第二', self) 
-        self.artistInterface = QLabel('第三', self)  
+        self.heroSelect = HeroSelect(self)
+        self.lineupResult = LineupResult(self)
 
         # 添加子界面到导航和堆叠容器
         self.addSubInterface(self.mapSelect, 'songInterface', '选择地图')
-        self.addSubInterface(self.albumInterface, 'albumInterface', '选择英雄')
-        self.addSubInterface(self.artistInterface, 'artistInterface', '选择攻防')
+        self.addSubInterface(self.heroSelect, 'albumInterface', '选择英雄')
+        self.addSubInterface(self.lineupResult, 'lineupResultInterface', '选择攻防')
+
+        # 搜索结果页面不在导航栏中显示
+        self.searchResult = SearchResult(self)
+        self.stackedWidget.addWidget(self.searchResult)
+
+        # 地图视图页面同样不在导航栏中显示
+        self.lineupMap = LineupMap(self)
+        self.lineupMap.backRequested.connect(self.showWizardStep)
+        self.stackedWidget.addWidget(self.lineupMap)
+
+        # 搜索框
+        self.searchEdit = SearchLineEdit(self)
+        self.searchEdit.setPlaceholderText("搜索站位、描点、落点或备注")
+        self.searchEdit.setFixedWidth(400)
+        self.searchEdit.searchSignal.connect(self.search)
+        self.searchEdit.clearSignal.connect(self.clearSearch)
+
+        # 点位包导入导出
+        self.packTask = None
+        self.stateTooltip = None
+        self.importButton = PushButton("导入点位包", self)
+        self.importButton.setIcon(FIF.DOWNLOAD)
+        self.importButton.clicked.connect(self.importPack)
+        self.exportButton = PushButton("导出点位包", self)
+        self.exportButton.setIcon(FIF.SHARE)
+        self.exportButton.clicked.connect(self.exportPack)
+
+        # 选择地图后才能打开地图视图
+        self.mapViewButton = PushButton("地图视图", self)
+        self.mapViewButton.setIcon(FIF.GLOBE)
+        self.mapViewButton.setEnabled(False)
+        self.mapViewButton.clicked.connect(self.showLineupMap)
+
+        self.toolBarLayout = QHBoxLayout()
+        self.toolBarLayout.addWidget(self.importButton)
+        self.toolBarLayout.addWidget(self.exportButton)
+        self.toolBarLayout.addWidget(self.mapViewButton)
+        self.toolBarLayout.addStretch(1)
+        self.toolBarLayout.addWidget(self.searchEdit)
 
         # 设置布局
+        self.mainLayout.addLayout(self.toolBarLayout)
         self.mainLayout.addWidget(self.pivot, 0, Qt.AlignHCenter)  # 导航栏居中
         self.mainLayout.addWidget(self.stackedWidget)  # 添加堆叠容器
         self.mainLayout.setContentsMargins(30, 0, 30, 30)  # 设置布局边距
@@ -59,6 +111,198 @@ class QueryPage(QWidget):
         
         # 禁止导航栏点击
         self.pivot.setDisabled(True)
+        self.nextPivot()
+
+        # 向导每一步选择的筛选条件 (map/hero/skill/side)
+        self.filters = {}
+        self.mapSelect.mapSelected.connect(self.onMapSelected)
+        self.mapSelect.mapHovered.connect(self.onMapHovered)
+        self.heroSelect.heroSelected.connect(self.onHeroSelected)
+        self.lineupResult.sideSelected.connect(self.onSideSelected)
+        signalBus.lineupSaved.connect(self.onLineupsChanged)
+        signalBus.lineupsImported.connect(self.onLineupsChanged)
+        self.refreshCounts()
+
+    def onLineupsChanged(self):
+        """点位保存或导入后刷新数量，正在显示的结果也重新读取"""
+        self.refreshCounts()
+        if self.pivot.currentRouteKey() == self.lineupResult.objectName():
+            self.lineupResult.refresh()
+
+    def refreshCounts(self):
+        """根据当前筛选条件刷新各张卡片上的点位数量"""
+        self.mapSelect.setLineupCounts(lineupIndex().counts("map", **self.filters))
+
+        # 悬停时可能已经预先算好
+        mapKey = self.filters.get("map")
+        counts = prefetcher.take(("counts", mapKey)) if mapKey else None
+        self.heroSelect.setCounts(*(counts or self.mapCounts(mapKey)))
+
+    @staticmethod
+    def mapCounts(mapKey: str = None):
+        """返回 (英雄 -> 点位数量, 英雄 -> {技能按键: 点位数量})，mapKey 为 None 时统计所有地图"""
+        index = lineupIndex()
+        heroCounts = index.counts("hero", map=mapKey)
+        skillCounts = {hero: index.counts("skill", map=mapKey, hero=hero) for hero in heroCounts}
+        return heroCounts, skillCounts
+
+    def search(self, text: str):
+        """在当前向导筛选出的点位中全文搜索"""
+        if not text.strip():
+            self.clearSearch()
+            return
+
+        start = time.perf_counter()
+        within = iterBits(lineupIndex().match(**self.filters)) if self.filters else None
+        results = lineupSearch().search(text, within=within)
+        lineups = lineupStore().get_many(lineupId for lineupId, _ in results)
+
+        self.searchResult.setResults(text, lineups, time.perf_counter() - start)
+        self.stackedWidget.setCurrentWidget(self.searchResult)
+
+    def clearSearch(self):
+        """清空搜索后回到向导当前步骤"""
+        self.showWizardStep()
+
+    def showWizardStep(self):
+        """从搜索结果或地图视图回到向导当前步骤"""
+        self.stackedWidget.setCurrentWidget(
+            self.findChild(QWidget, self.pivot.currentRouteKey()))
+
+    def showLineupMap(self):
+        """在地图上查看当前筛选条件下的点位"""
+        if self.filters.get("map"):
+            self.lineupMap.setFilters(self.filters)
+            self.stackedWidget.setCurrentWidget(self.lineupMap)
+
+    # --- 点位包 ---
+
+    def importPack(self):
+        """选择点位包并在后台导入"""
+        path, _ = QFileDialog.getOpenFileName(self, "导入点位包", "", "点位包 (*.zip)")
+        if path:
+            self.startPackTask(PackTask(PackTask.IMPORT, path, lineupStore(), parent=self), "正在导入点位包")
+
+    def exportPack(self):
+        """把当前向导筛选出的点位（未筛选时为全部点位）导出为点位包"""
+        path, _ = QFileDialog.getSaveFileName(self, "导出点位包", "lineups.zip", "点位包 (*.zip)")
+        if path:
+            task = PackTask(PackTask.EXPORT, path, lineupStore(), self.filters, parent=self)
+            self.startPackTask(task, "正在导出点位包")
+
+    def startPackTask(self, task: PackTask, title: str):
+        self.packTask = task
+        self.importButton.setEnabled(False)
+        self.exportButton.setEnabled(False)
+
+        self.stateTooltip = StateToolTip(title, "请稍候...", self.window())
+        self.stateTooltip.move(self.stateTooltip.getSuitablePos())
+        self.stateTooltip.show()
+
+        task.progressChanged.connect(self.onPackProgress)
+        task.succeeded.connect(self.onPackSucceeded)
+        task.failed.connect(self.onPackFailed)
+        task.finished.connect(self.onPackFinished)
+        task.start()
+
+    def onPackProgress(self, done: int, total: int):
+        if self.stateTooltip:
+            self.stateTooltip.setContent(f"{done} / {total}" if total else f"已处理 {done} 个点位")
+
+    def onPackSucceeded(self, result):
+        if self.packTask.mode == PackTask.EXPORT:
+            InfoBar.success("导出完成", f"导出 {result} 个点位", duration=3000, parent=self.window())
+            return
+
+        # 新点位写入了数据库，增量更新内存中的索引
+        index = lineupIndex()
+        for lineup in lineupStore().get_many(result.imported):
+            index.add(lineup.id, *lineup.facets())
+            indexLineup(lineup)
+            indexLineupPosition(lineup)
+
+        InfoBar.success("导入完成", result.summary(), duration=5000, parent=self.window())
+        signalBus.lineupsImported.emit(result.imported)
+
+    def onPackFailed(self, message: str):
+        InfoBar.error("点位包处理失败", message, duration=5000, parent=self.window())
+
+    def onPackFinished(self):
+        if self.stateTooltip:
+            self.stateTooltip.setState(True)
+            self.stateTooltip = None
+
+        self.importButton.setEnabled(True)
+        self.exportButton.setEnabled(True)
+        self.packTask.deleteLater()
+        self.packTask = None
+
+    # --- 预取 ---
+
+    def showEvent(self, e):
+        super().showEvent(e)
+        self.scheduleIdlePrefetch()
+
+    def hideEvent(self, e):
+        # 切换到其它页面后不再需要预取的内容
+        prefetcher.cancel()
+        super().hideEvent(e)
+
+    def scheduleIdlePrefetch(self):
+        """还在选择地图时，空闲一段时间后预取下一步一定会用到的英雄立绘"""
+        if self.pivot.currentRouteKey() == self.mapSelect.objectName():
+            prefetcher.schedule(("avatars",), self.heroSelect.prefetchAvatars, IDLE_DELAY)
+
+    def onMapHovered(self, mapKey: str, entered: bool):
+        """鼠标在地图卡片上停留时预取选中这张地图之后要用的内容"""
+        if entered:
+            prefetcher.schedule(("map", mapKey), lambda: self.prefetchMap(mapKey))
+        else:
+            prefetcher.leave(("map", mapKey))
+            self.scheduleIdlePrefetch()
+
+    def prefetchMap(self, mapKey: str):
+        """选中 mapKey 之后的步骤：英雄和技能的点位数量、英雄立绘、结果第一页的缩略图"""
+        if self.filters.get("map") != mapKey:
+            prefetcher.remember(("counts", mapKey), self.mapCounts(mapKey))
+            yield None
+
+        yield from self.heroSelect.prefetchAvatars()
+        yield from self.prefetchResultPage({"map": mapKey})
+
+    def prefetchResultPage(self, filters: dict):
+        """结果第一页的点位缩略图，与结果页第一次读取的点位相同"""
+        rows = LineupResultModel.loadRows(LineupResultModel.firstPageIds(filters))
+        yield None
+
+        dpr = self.devicePixelRatioF()
+        for row in rows:
+            if row.thumbPath:
+                yield PrefetchImage(row.thumbPath, RESULT_THUMB_SIZE, dpr)
+
+    # --- 向导 ---
+
+    def onMapSelected(self, mapKey: str):
+        """选中地图后进入选择英雄"""
+        # 悬停时开始的预取在离开地图页面后继续执行
+        prefetcher.start(("map", mapKey), lambda: self.prefetchMap(mapKey), keep=True)
+        self.filters = {"map": mapKey}
+        self.mapViewButton.setEnabled(True)
+        self.refreshCounts()
+        self.pivot.setCurrentItem(self.heroSelect.objectName())
+
+    def onHeroSelected(self, hero: str, skill: str):
+        """选中英雄（和技能）后进入选择攻防"""
+        self.filters["hero"] = hero
+        self.filters["skill"] = skill or None
+        self.filters["side"] = None
+        self.lineupResult.setFilters(self.filters)
+        self.pivot.setCurrentItem(self.lineupResult.objectName())
+
+    def onSideSelected(self, side: str):
+        """按攻防筛选结果"""
+        self.filters["side"] = side or None
+        self.lineupResult.setFilters(self.filters)
   
 
     def addSubInterface(self, widget: QLabel, objectName, text):
@@ -0,0 +1,367 @@
+from PyQt5.QtWidgets import QApplication, QHBoxLayout, QListView, QStyle, QStyledItemDelegate, QVBoxLayout, QWidget
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QPoint, QRect, QRectF, QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QFont, QIcon, QPainter, QPainterPath, QPixmap
+from qfluentwidgets import BodyLabel, PushButton, SearchLineEdit, TogglePushButton
+
+from common.catalog import ROLE_NAMES, SKILL_SLOTS, Hero, catalog
+from common.hero_atlas import AVATAR_SLOT, heroAtlas
+from common.image_loader import imageLoader
+from common.pixmap_cache import imageKey, pixmapCache
+from common.prefetch import PrefetchImage
+
+# 数据角色
+ItemKindRole = Qt.UserRole + 1
+HeroRole = Qt.UserRole + 2
+CountRole = Qt.UserRole + 3
+
+HEADER, HERO = 0, 1
+
+# 英雄格子与立绘尺寸
+TILE_SIZE = QSize(110, 176)
+AVATAR_SIZE = QSize(96, 140)
+HEADER_HEIGHT = 36
+
+ACCENT_COLOR = QColor(255, 70, 84)
+
+
+class HeroListModel(QAbstractListModel):
+    """
+    英雄列表模型
+    按定位分组，每组前面插入一个标题行，支持按名称筛选
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.counts = {}        # 英雄名 -> 点位数量
+        self.filterText = ""
+        self.rows = []          # (HEADER, 定位) 或 (HERO, Hero)
+        self._buildRows()
+
+    def _buildRows(self):
+        self.rows = []
+        text = self.filterText.strip().lower()
+        for role, heroes in catalog().heroesByRole.items():
+            matched = [h for h in heroes if not text or text in h.name.lower()
+                       or text in h.chinese_name or text == h.number]
+            if matched:
+                self.rows.append((HEADER, role))
+                self.rows.extend((HERO, h) for h in matched)
+
+    def setFilterText(self, text: str):
+        """按英文名、中文名或编号筛选"""
+        self.beginResetModel()
+        self.filterText = text
+        self._buildRows()
+        self.endResetModel()
+
+    def setCounts(self, counts: dict):
+        """更新每个英雄的点位数量"""
+        self.counts = counts
+        if self.rows:
+            self.dataChanged.emit(self.index(0), self.index(len(self.rows) - 1), [CountRole])
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def flags(self, index: QModelIndex):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        if self.rows[index.row()][0] == HEADER:
+            return Qt.ItemIsEnabled
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        kind, value = self.rows[index.row()]
+        if role == ItemKindRole:
+            return kind
+        if kind == HEADER:
+            return ROLE_NAMES.get(value, value) if role == Qt.DisplayRole else None
+
+        if role == Qt.DisplayRole:
+            return value.chinese_name
+        if role == Qt.ToolTipRole:
+            return f"{value.chinese_name} ({value.name})"
+        if role == HeroRole:
+            return value
+        if role == CountRole:
+            return self.counts.get(value.name, 0)
+
+        return None
+
+    def indexOfHero(self, name: str) -> QModelIndex:
+        for row, (kind, value) in enumerate(self.rows):
+            if kind == HERO and value.name == name:
+                return self.index(row)
+        return QModelIndex()
+
+
+class HeroDelegate(QStyledItemDelegate):
+    """
+    英雄格子绘制代理
+    只有可见的格子会被绘制，立绘在第一次绘制时才请求后台加载
+    """
+
+    def __init__(self, view: QListView):
+        super().__init__(view)
+        self.view = view
+        self.requested = set()  # 正在加载的立绘路径
+
+    def sizeHint(self, option, index: QModelIndex):
+        if index.data(ItemKindRole) == HEADER:
+            # 标题占满一整行，迫使下一个英雄换行
+            width = self.view.viewport().width() - 2 * self.view.spacing() - 1
+            return QSize(max(width, TILE_SIZE.width()), HEADER_HEIGHT)
+
+        return TILE_SIZE
+
+    def paint(self, painter: QPainter, option, index: QModelIndex):
+        painter.save()
+        painter.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform)
+
+        if index.data(ItemKindRole) == HEADER:
+            self._paintHeader(painter, option.rect, index.data())
+        else:
+            self._paintHero(painter, option, index)
+
+        painter.restore()
+
+    def _paintHeader(self, painter: QPainter, rect: QRect, text: str):
+        font = QFont(painter.font())
+        font.setPixelSize(16)
+        font.setBold(True)
+        painter.setFont(font)
+        painter.setPen(QColor(51, 51, 51))
+        painter.drawText(rect.adjusted(4, 0, 0, 0), Qt.AlignLeft | Qt.AlignVCenter, text)
+
+    def _paintHero(self, painter: QPainter, option, index: QModelIndex):
+        rect = option.rect.adjusted(1, 1, -1, -1)
+        hero = index.data(HeroRole)   # type: Hero
+        selected = bool(option.state & QStyle.State_Selected)
+        hovered = bool(option.state & QStyle.State_MouseOver)
+
+        # 背景与边框
+        painter.setPen(ACCENT_COLOR if selected else (QColor(0, 0, 0, 40) if hovered else Qt.NoPen))
+        painter.setBrush(QColor(255, 255, 255, 230 if hovered or selected else 170))
+        painter.drawRoundedRect(rect, 8, 8)
+
+        # 立绘
+        avatarRect = QRect(0, 0, AVATAR_SIZE.width(), AVATAR_SIZE.height())
+        avatarRect.moveCenter(rect.center())
+        avatarRect.moveTop(rect.top() + 6)
+
+        pixmap = self._avatar(hero)
+        path = QPainterPath()
+        path.addRoundedRect(QRectF(avatarRect), 6, 6)
+        painter.save()
+        painter.setClipPath(path)
+        if pixmap is None:
+            painter.fillRect(avatarRect, QColor(0, 0, 0, 15))
+        else:
+            target = QRect(QPoint(0, 0), pixmap.size() / pixmap.devicePixelRatio())
+            target.moveCenter(avatarRect.center())
+            painter.drawPixmap(target, pixmap)
+        painter.restore()
+
+        # 名称
+        painter.setPen(QColor(51, 51, 51))
+        textRect = QRect(rect.left(), avatarRect.bottom() + 4, rect.width(), rect.bottom() - avatarRect.bottom() - 4)
+        painter.drawText(textRect, Qt.AlignHCenter | Qt.AlignTop, hero.chinese_name)
+
+        # 点位数量角标
+        count = index.data(CountRole)
+        if count:
+            text = str(count) if count < 1000 else "999+"
+            badge = QRect(0, 0, max(20, painter.fontMetrics().width(text) + 10), 20)
+            badge.moveTopRight(rect.topRight() + QPoint(-4, 4))
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(ACCENT_COLOR)
+            painter.drawRoundedRect(badge, 10, 10)
+            painter.setPen(Qt.white)
+            painter.drawText(badge, Qt.AlignCenter, text)
+
+    def _avatar(self, hero: Hero):
+        """返回立绘，未加载时发起后台加载请求并返回 None"""
+        dpr = self.view.devicePixelRatioF()
+        if heroAtlas().contains(hero.number, AVATAR_SLOT):
+            # 图集页面已在内存中，直接裁剪
+            return heroAtlas().pixmap(hero.number, AVATAR_SLOT, AVATAR_SIZE, dpr)
+
+        pixmap = pixmapCache.find(imageKey(hero.avatar, AVATAR_SIZE, dpr))
+        if pixmap is None and hero.avatar not in self.requested:
+            self.requested.add(hero.avatar)
+            imageLoader.loadPixmap(hero.avatar, AVATAR_SIZE, dpr, self.view,
+                                   lambda p, path=hero.avatar: self._onAvatarLoaded(path, p))
+
+        return pixmap
+
+    def _onAvatarLoaded(self, path: str, pixmap: QPixmap):
+        # 加载失败的立绘不再重复请求
+        if not pixmap.isNull():
+            self.requested.discard(path)
+        self.view.viewport().update()
+
+    def cancelPending(self):
+        """取消未完成的加载请求，下次绘制时重新请求"""
+        imageLoader.cancel(self.view)
+        self.requested.clear()
+
+
+class HeroGridView(QListView):
+    """英雄网格视图"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QListView.IconMode)
+        self.setFlow(QListView.LeftToRight)
+        self.setWrapping(True)
+        self.setResizeMode(QListView.Adjust)
+        self.setMovement(QListView.Static)
+        self.setUniformItemSizes(False)
+        self.setSpacing(6)
+        self.setSelectionMode(QListView.SingleSelection)
+        self.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.setMouseTracking(True)
+        self.viewport().setAttribute(Qt.WA_Hover)
+        self.setStyleSheet("QListView { background: transparent; border: none; }")
+
+        self.heroDelegate = HeroDelegate(self)
+        self.setItemDelegate(self.heroDelegate)
+
+    def hideEvent(self, e):
+        self.heroDelegate.cancelPending()
+        super().hideEvent(e)
+
+
+class HeroSelect(QWidget):
+    """
+    英雄选择页面
+    上方是按定位分组的英雄网格，选中英雄后下方显示该英雄的技能
+    """
+
+    # 选择完成时发出，携带英雄名和技能按键（空字符串表示全部技能）
+    heroSelected = pyqtSignal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.skillCounts = {}
+
+        self.searchEdit = SearchLineEdit(self)
+        self.searchEdit.setPlaceholderText("筛选英雄")
+        self.searchEdit.setFixedWidth(240)
+        self.searchEdit.textChanged.connect(self.onFilterTextChanged)
+
+        self.model = HeroListModel(self)
+        self.view = HeroGridView(self)
+        self.view.setModel(self.model)
+        self.view.clicked.connect(self.onHeroClicked)
+
+        # 技能栏，选中英雄后才加载技能图标
+        self.skillLabel = BodyLabel("选择英雄后选择技能", self)
+        self.allSkillButton = PushButton("全部技能", self)
+        self.allSkillButton.clicked.connect(lambda: self.selectSkill(""))
+        self.skillButtons = {}
+        for slot in SKILL_SLOTS:
+            button = TogglePushButton(self)
+            button.setIconSize(QSize(28, 28))
+            button.clicked.connect(lambda _, s=slot: self.selectSkill(s))
+            self.skillButtons[slot] = button
+
+        self.skillLayout = QHBoxLayout()
+        self.skillLayout.addWidget(self.skillLabel)
+        self.skillLayout.addStretch(1)
+        for button in self.skillButtons.values():
+            self.skillLayout.addWidget(button)
+        self.skillLayout.addWidget(self.allSkillButton)
+
+        self.vBoxLayout = QVBoxLayout(self)
+        self.vBoxLayout.setContentsMargins(0, 10, 0, 0)
+        self.vBoxLayout.addWidget(self.searchEdit, 0, Qt.AlignLeft)
+        self.vBoxLayout.addWidget(self.view, 1)
+        self.vBoxLayout.addLayout(self.skillLayout)
+
+        self._updateSkillBar()
+
+    def currentHero(self):
+        index = self.view.currentIndex()
+        return index.data(HeroRole) if index.isValid() else None
+
+    def setCounts(self, heroCounts: dict, skillCounts: dict = None):
+        """
+        更新点位数量
+
+        参数:
+            heroCounts (dict): 英雄名 -> 点位数量
+            skillCounts (dict): 英雄名 -> {技能按键: 点位数量}
+        """
+        self.model.setCounts(heroCounts)
+        self.skillCounts = skillCounts or {}
+        self._updateSkillBar()
+
+    def prefetchAvatars(self):
+        """
+        预取所有英雄立绘的步骤（生成器，交给 prefetcher 分步执行）
+        图集中有的立绘直接裁剪放入缓存，其余的交给后台加载
+        """
+        dpr = self.devicePixelRatioF()
+        for hero in catalog().heroes:
+            if heroAtlas().contains(hero.number, AVATAR_SLOT):
+                heroAtlas().pixmap(hero.number, AVATAR_SLOT, AVATAR_SIZE, dpr)
+                yield None
+            else:
+                yield PrefetchImage(hero.avatar, AVATAR_SIZE, dpr)
+
+    def onFilterTextChanged(self, text: str):
+        hero = self.currentHero()
+        self.model.setFilterText(text)
+        if hero is not None:
+            self.view.setCurrentIndex(self.model.indexOfHero(hero.name))
+
+    def onHeroClicked(self, index: QModelIndex):
+        if index.data(ItemKindRole) == HERO:
+            self._updateSkillBar()
+
+    def selectSkill(self, slot: str):
+        hero = self.currentHero()
+        if hero is not None:
+            self.heroSelected.emit(hero.name, slot)
+
+    def _updateSkillBar(self):
+        """显示当前英雄的技能图标和点位数量"""
+        hero = self.currentHero()
+        self.allSkillButton.setEnabled(hero is not None)
+        for slot, button in self.skillButtons.items():
+            button.setChecked(False)
+            button.setVisible(hero is not None)
+            if hero is None:
+                continue
+
+            count = self.skillCounts.get(hero.name, {}).get(slot, 0)
+            button.setText(f"{catalog().skillLabel(slot)} ({count})")
+            imageLoader.cancel(button)
+            if heroAtlas().contains(hero.number, slot):
+                button.setIcon(QIcon(heroAtlas().pixmap(
+                    hero.number, slot, button.iconSize(), self.devicePixelRatioF())))
+            else:
+                imageLoader.loadPixmap(hero.skills[slot], button.iconSize(), self.devicePixelRatioF(), button,
+                                       lambda pixmap, b=button: b.setIcon(QIcon(pixmap)))
+
+        if hero is not None:
+            self.skillLabel.setText(f"{hero.chinese_name} 的技能")
+
+
+if __name__ == '__main__':
+    # 启用高DPI缩放
+    QApplication.setHighDpiScaleFactorRoundingPolicy(
+        Qt.HighDpiScaleFactorRoundingPolicy.PassThrough)
+    QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
+    QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
+    import sys
+    # 创建并运行应用
+    app = QApplication(sys.argv)
+    w = HeroSelect()
+    w.resize(1000, 700)
+    w.show()
+    app.exec_()
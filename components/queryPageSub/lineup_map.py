@@ -0,0 +1,103 @@
+from typing import List
+
+from PyQt5.QtWidgets import QHBoxLayout, QVBoxLayout, QWidget, QListWidgetItem
+from PyQt5.QtCore import Qt, pyqtSignal
+from qfluentwidgets import CaptionLabel, ListWidget, PushButton
+from qfluentwidgets import FluentIcon as FIF
+
+from common.catalog import catalog
+from common.lineup_index import iterBits, lineupIndex
+from common.lineup_spatial import lineupSpatial
+from common.lineup_store import lineupStore
+from components.map_canvas import LineupMapView
+from components.queryPageSub.search_result import SearchResult
+
+
+class LineupMap(QWidget):
+    """
+    地图视图页面
+    在地图上显示当前筛选条件下点位的站位和落点，右侧列出点击或框选查到的点位
+    """
+
+    backRequested = pyqtSignal()
+
+    # 列表最多显示的点位数量
+    MAX_RESULTS = 200
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.backButton = PushButton("返回", self)
+        self.backButton.setIcon(FIF.RETURN)
+        self.backButton.clicked.connect(self.backRequested)
+        self.summaryLabel = CaptionLabel(self)
+        self.mapView = LineupMapView(self)
+        self.resultLabel = CaptionLabel(self)
+        self.listWidget = ListWidget(self)
+        self.listWidget.setFixedWidth(360)
+
+        self.mapView.lineupClicked.connect(self.onLineupClicked)
+        self.mapView.lineupsQueried.connect(self.showLineups)
+        self.listWidget.currentItemChanged.connect(self.onCurrentItemChanged)
+
+        self.topLayout = QHBoxLayout()
+        self.topLayout.addWidget(self.backButton)
+        self.topLayout.addWidget(self.summaryLabel, 1)
+
+        self.listLayout = QVBoxLayout()
+        self.listLayout.addWidget(self.resultLabel)
+        self.listLayout.addWidget(self.listWidget)
+
+        self.contentLayout = QHBoxLayout()
+        self.contentLayout.addWidget(self.mapView, 1)
+        self.contentLayout.addLayout(self.listLayout)
+
+        self.vBoxLayout = QVBoxLayout(self)
+        self.vBoxLayout.setContentsMargins(0, 10, 0, 0)
+        self.vBoxLayout.addLayout(self.topLayout)
+        self.vBoxLayout.addLayout(self.contentLayout, 1)
+
+    def setFilters(self, filters: dict):
+        """
+        显示筛选条件下的点位，filters 必须包含地图
+
+        参数:
+            filters (dict): 向导的筛选条件 (map/hero/skill/side)
+        """
+        mapKey = filters["map"]
+        others = {k: v for k, v in filters.items() if k != "map" and v}
+        allowed = set(iterBits(lineupIndex().match(**filters))) if others else None
+
+        spatial = lineupSpatial()
+        self.mapView.setMap(mapKey)
+        self.mapView.setMarkers(spatial.grid(mapKey, "stand"), spatial.grid(mapKey, "land"), allowed)
+
+        self.summaryLabel.setText(
+            f"{catalog().mapLabel(mapKey)}：{self.mapView.markerCount()} 个点位标注了位置。"
+            "点击地图查找落点在附近的点位，拖动框选查找从该区域投掷的点位")
+        self.resultLabel.clear()
+        self.listWidget.clear()
+
+    def showLineups(self, ids: List[int], description: str):
+        """在列表中显示查询到的点位"""
+        self.listWidget.blockSignals(True)
+        self.listWidget.clear()
+        self.listWidget.blockSignals(False)
+
+        shown = ids[:self.MAX_RESULTS]
+        for lineup in lineupStore().get_many(shown):
+            item = QListWidgetItem(SearchResult.lineupText(lineup))
+            item.setData(Qt.UserRole, lineup.id)
+            self.listWidget.addItem(item)
+
+        if len(ids) > len(shown):
+            description += f"，显示前 {len(shown)} 个"
+        self.resultLabel.setText(description)
+
+    def onLineupClicked(self, lineupId: int):
+        self.showLineups([lineupId], "所选点位")
+        self.listWidget.setCurrentRow(0)
+
+    def onCurrentItemChanged(self, item: QListWidgetItem):
+        """在地图上高亮列表中选中的点位"""
+        self.mapView.setSelected(item.data(Qt.UserRole) if item else None)
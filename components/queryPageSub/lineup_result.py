@@ -0,0 +1,401 @@
+from itertools import islice
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from PyQt5.QtWidgets import QApplication, QHBoxLayout, QListView, QStyle, QStyledItemDelegate, QVBoxLayout, QWidget
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QPoint, QRect, QRectF, QSize, Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QFont, QPainter, QPainterPath, QPixmap
+from qfluentwidgets import CaptionLabel, SegmentedWidget
+
+from common.catalog import catalog
+from common.clip_player import ClipPlayback, clipAnimator
+from common.image_ingest import CLIP, THUMB
+from common.image_loader import imageLoader
+from common.lineup_index import iterBits, lineupIndex
+from common.lineup_store import SIDES, Lineup, lineupStore
+from common.pixmap_cache import imageKey, pixmapCache
+from common.prefetch import RESULT_PAGE_SIZE, RESULT_THUMB_SIZE
+from components.queryPageSub.search_result import SearchResult
+
+# 数据角色
+LineupRole = Qt.UserRole + 1
+ThumbRole = Qt.UserRole + 2
+
+# 点位格子尺寸
+TILE_SIZE = QSize(196, 212)
+
+ACCENT_COLOR = QColor(255, 70, 84)
+
+# 滚动停下多久（毫秒）后更新正在播放的短片
+CLIP_UPDATE_DELAY = 50
+
+
+class LineupRow(NamedTuple):
+    """结果中的一行"""
+    lineup: Lineup
+    thumbPath: str              # 缩略图路径，没有图片时为空字符串
+    clipPath: Optional[str]     # 短片路径，不是动图时为 None
+
+
+class LineupResultModel(QAbstractListModel):
+    """
+    点位结果模型
+    总数直接由位图索引得到，点位按 id 顺序分页从数据库读取：
+    视图滚动到底部（或第一屏还没填满）时才调用 fetchMore() 读取下一页
+    """
+
+    # 读取时发现索引中的点位已被删除，总数减少时发出
+    totalChanged = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []          # type: List[LineupRow]
+        self.total = 0
+        self._ids = iter(())    # 还没读取的点位 id
+        self._exhausted = True
+
+    def setFilters(self, filters: dict):
+        """按 map/hero/skill/side 重新筛选，只计算总数，不读取点位"""
+        bitmap = lineupIndex().match(**filters)
+
+        self.beginResetModel()
+        self.rows = []
+        self.total = bitmap.bit_count()
+        self._ids = iterBits(bitmap)
+        self._exhausted = not bitmap
+        self.endResetModel()
+
+    @staticmethod
+    def loadRows(ids: Iterable[int]) -> List[LineupRow]:
+        """读取一页点位和它们的缩略图、短片路径"""
+        blobs = lineupStore().blobs
+        rows = []
+        for lineup in lineupStore().get_many(ids):
+            digest = lineup.cover_image()
+            if digest is None:
+                rows.append(LineupRow(lineup, "", None))
+            else:
+                rows.append(LineupRow(lineup, blobs.imagePath(digest, THUMB), blobs.findVariant(digest, CLIP)))
+        return rows
+
+    @staticmethod
+    def firstPageIds(filters: dict) -> List[int]:
+        """筛选结果第一页的点位 id，与视图第一次读取的点位相同"""
+        return list(islice(iterBits(lineupIndex().match(**filters)), RESULT_PAGE_SIZE))
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+
+        # 索引中的点位可能已经被删除（例如同步时被其他设备删除），读到的数量可能少于 id 数量；
+        # 整页都被删除时继续读下一页，直到读到点位或 id 读完
+        rows = []
+        while not rows and not self._exhausted:
+            ids = list(islice(self._ids, RESULT_PAGE_SIZE))
+            if len(ids) < RESULT_PAGE_SIZE:
+                self._exhausted = True
+
+            rows = self.loadRows(ids)
+            if len(rows) < len(ids):
+                self._dropMissing(ids, rows)
+
+        if not rows:
+            return
+
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+        self.rows.extend(rows)
+        self.endInsertRows()
+
+    def _dropMissing(self, ids: List[int], rows: List[LineupRow]):
+        """从索引和总数中去掉已经不存在的点位"""
+        found = {row.lineup.id for row in rows}
+        missing = [i for i in ids if i not in found]
+        index = lineupIndex()
+        for lineupId in missing:
+            index.remove(lineupId)
+
+        self.total -= len(missing)
+        self.totalChanged.emit(self.total)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        lineup, thumbPath, _ = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return SearchResult.lineupText(lineup)
+        if role == Qt.ToolTipRole:
+            return lineup.note or None
+        if role == LineupRole:
+            return lineup
+        if role == ThumbRole:
+            return thumbPath
+
+        return None
+
+
+class LineupDelegate(QStyledItemDelegate):
+    """
+    点位格子绘制代理
+    格子不是控件，滚动时只重绘可见的格子；缩略图在第一次绘制时才请求后台加载，
+    可见的动图格子绘制视图正在播放的短片帧
+    """
+
+    def __init__(self, view: QListView):
+        super().__init__(view)
+        self.view = view
+        self.requested = set()  # 正在加载的缩略图路径
+
+    def sizeHint(self, option, index: QModelIndex):
+        return TILE_SIZE
+
+    def paint(self, painter: QPainter, option, index: QModelIndex):
+        painter.save()
+        painter.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform)
+
+        rect = option.rect.adjusted(1, 1, -1, -1)
+        lineup = index.data(LineupRole)     # type: Lineup
+        selected = bool(option.state & QStyle.State_Selected)
+        hovered = bool(option.state & QStyle.State_MouseOver)
+
+        # 背景与边框
+        painter.setPen(ACCENT_COLOR if selected else (QColor(0, 0, 0, 40) if hovered else Qt.NoPen))
+        painter.setBrush(QColor(255, 255, 255, 230 if hovered or selected else 170))
+        painter.drawRoundedRect(rect, 8, 8)
+
+        # 缩略图
+        thumbRect = QRect(QPoint(0, 0), RESULT_THUMB_SIZE)
+        thumbRect.moveCenter(rect.center())
+        thumbRect.moveTop(rect.top() + 7)
+
+        playback = self.view.playbacks.get(index.row())
+        if playback is not None and playback.pixmap is not None:
+            pixmap = playback.pixmap
+        else:
+            pixmap = self._thumbnail(index.data(ThumbRole))
+        path = QPainterPath()
+        path.addRoundedRect(QRectF(thumbRect), 6, 6)
+        painter.save()
+        painter.setClipPath(path)
+        painter.fillRect(thumbRect, QColor(0, 0, 0, 15))
+        if pixmap is not None and not pixmap.isNull():
+            size = (pixmap.size() / pixmap.devicePixelRatio()).scaled(RESULT_THUMB_SIZE, Qt.KeepAspectRatio)
+            target = QRect(QPoint(0, 0), size)
+            target.moveCenter(thumbRect.center())
+            painter.drawPixmap(target, pixmap)
+        painter.restore()
+
+        # 英雄 · 技能 · 攻防，下一行是站位 → 描点 → 落点
+        c = catalog()
+        textRect = QRect(rect.left() + 8, thumbRect.bottom() + 6, rect.width() - 16, 20)
+        font = QFont(painter.font())
+        font.setBold(True)
+        painter.setFont(font)
+        painter.setPen(QColor(51, 51, 51))
+        facets = " · ".join([c.heroLabel(lineup.hero), c.skillLabel(lineup.skill),
+                             SIDES.get(lineup.side, lineup.side)])
+        painter.drawText(textRect, Qt.AlignLeft | Qt.AlignVCenter,
+                         painter.fontMetrics().elidedText(facets, Qt.ElideRight, textRect.width()))
+
+        font.setBold(False)
+        painter.setFont(font)
+        painter.setPen(QColor(96, 96, 96))
+        textRect.translate(0, 20)
+        route = " → ".join(t for t in (lineup.stand, lineup.aim, lineup.land) if t)
+        painter.drawText(textRect, Qt.AlignLeft | Qt.AlignVCenter,
+                         painter.fontMetrics().elidedText(route, Qt.ElideRight, textRect.width()))
+
+        painter.restore()
+
+    def _thumbnail(self, path: str):
+        """返回缩略图，未加载时发起后台加载请求并返回 None"""
+        if not path:
+            return None
+
+        dpr = self.view.devicePixelRatioF()
+        pixmap = pixmapCache.find(imageKey(path, RESULT_THUMB_SIZE, dpr))
+        if pixmap is None and path not in self.requested:
+            self.requested.add(path)
+            imageLoader.loadPixmap(path, RESULT_THUMB_SIZE, dpr, self.view,
+                                   lambda p, path=path: self._onThumbnailLoaded(path, p))
+
+        return pixmap
+
+    def _onThumbnailLoaded(self, path: str, pixmap: QPixmap):
+        # 加载失败的缩略图不再重复请求
+        if not pixmap.isNull():
+            self.requested.discard(path)
+        self.view.viewport().update()
+
+    def cancelPending(self):
+        """取消未完成的加载请求，下次绘制时重新请求"""
+        imageLoader.cancel(self.view)
+        self.requested.clear()
+
+
+class LineupGridView(QListView):
+    """
+    点位网格视图
+    格子尺寸一致，布局按批次在事件循环中分片完成，结果再多也不会一次性卡住界面。
+    只播放可见区域内的短片，滚动停下后更新，视图隐藏时全部暂停
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QListView.IconMode)
+        self.setFlow(QListView.LeftToRight)
+        self.setWrapping(True)
+        self.setResizeMode(QListView.Adjust)
+        self.setMovement(QListView.Static)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(RESULT_PAGE_SIZE)
+        self.setSpacing(6)
+        self.setSelectionMode(QListView.SingleSelection)
+        self.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.setMouseTracking(True)
+        self.viewport().setAttribute(Qt.WA_Hover)
+        self.setStyleSheet("QListView { background: transparent; border: none; }")
+
+        self.lineupDelegate = LineupDelegate(self)
+        self.setItemDelegate(self.lineupDelegate)
+
+        self.playbacks = {}     # type: Dict[int, ClipPlayback]   # 行号 -> 正在播放的短片
+        self.clipTimer = QTimer(self)
+        self.clipTimer.setSingleShot(True)
+        self.clipTimer.setInterval(CLIP_UPDATE_DELAY)
+        self.clipTimer.timeout.connect(self.updateClips)
+        self.verticalScrollBar().valueChanged.connect(self.clipTimer.start)
+
+    def setModel(self, model: LineupResultModel):
+        super().setModel(model)
+        model.modelAboutToBeReset.connect(self.stopClips)
+        model.modelReset.connect(self.clipTimer.start)
+        model.rowsInserted.connect(self.clipTimer.start)
+
+    def updateClips(self):
+        """播放可见区域内的短片，停止滚出可见区域的短片"""
+        model = self.model()
+        if model is None or not self.isVisible():
+            return
+
+        visible = self.viewport().rect()
+        wanted = {row for row, r in enumerate(model.rows)
+                  if r.clipPath and self.visualRect(model.index(row)).intersects(visible)}
+
+        for row in set(self.playbacks) - wanted:
+            clipAnimator.stop(self.playbacks.pop(row))
+
+        dpr = self.devicePixelRatioF()
+        for row in wanted - set(self.playbacks):
+            playback = clipAnimator.play(model.rows[row].clipPath, RESULT_THUMB_SIZE, dpr, self,
+                                         lambda _, row=row: self._onClipFrame(row))
+            if playback is not None:
+                self.playbacks[row] = playback
+
+    def stopClips(self):
+        for playback in self.playbacks.values():
+            clipAnimator.stop(playback)
+        self.playbacks.clear()
+
+    def _onClipFrame(self, row: int):
+        self.viewport().update(self.visualRect(self.model().index(row)))
+
+    def resizeEvent(self, e):
+        super().resizeEvent(e)
+        self.clipTimer.start()
+
+    def showEvent(self, e):
+        super().showEvent(e)
+        self.clipTimer.start()
+
+    def hideEvent(self, e):
+        self.lineupDelegate.cancelPending()
+        self.stopClips()
+        super().hideEvent(e)
+
+
+class LineupResult(QWidget):
+    """
+    选择攻防页面
+    上方选择攻防，下方按筛选条件分页显示点位，总数在读取点位之前就能显示
+    """
+
+    # 选择攻防时发出，空字符串表示全部
+    sideSelected = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.filters = {}
+        self.filterText = ""
+
+        self.sideBar = SegmentedWidget(self)
+        self.sideBar.addItem("", "全部", lambda: self.sideSelected.emit(""))
+        for side, label in SIDES.items():
+            self.sideBar.addItem(side, label, lambda s=side: self.sideSelected.emit(s))
+        self.sideBar.setCurrentItem("")
+
+        self.summaryLabel = CaptionLabel(self)
+
+        self.model = LineupResultModel(self)
+        self.model.totalChanged.connect(self._updateSummary)
+        self.view = LineupGridView(self)
+        self.view.setModel(self.model)
+
+        self.headerLayout = QHBoxLayout()
+        self.headerLayout.addWidget(self.sideBar)
+        self.headerLayout.addStretch(1)
+        self.headerLayout.addWidget(self.summaryLabel)
+
+        self.vBoxLayout = QVBoxLayout(self)
+        self.vBoxLayout.setContentsMargins(0, 10, 0, 0)
+        self.vBoxLayout.addLayout(self.headerLayout)
+        self.vBoxLayout.addWidget(self.view, 1)
+
+    def setFilters(self, filters: dict):
+        """
+        显示符合筛选条件的点位
+
+        参数:
+            filters (dict): map/hero/skill/side 的取值，值为 None 的条件会被忽略
+        """
+        self.filters = dict(filters)
+        self.sideBar.setCurrentItem(self.filters.get("side") or "")
+        self.view.lineupDelegate.cancelPending()
+        self.model.setFilters(self.filters)
+        self.view.scrollToTop()
+
+        c = catalog()
+        parts = [c.mapLabel(filters["map"]) if filters.get("map") else "全部地图",
+                 c.heroLabel(filters["hero"]) if filters.get("hero") else "全部英雄",
+                 c.skillLabel(filters["skill"]) if filters.get("skill") else "全部技能"]
+        self.filterText = ' · '.join(parts)
+        self._updateSummary(self.model.total)
+
+    def _updateSummary(self, total: int):
+        self.summaryLabel.setText(f"{self.filterText}    共 {total} 个点位")
+
+    def refresh(self):
+        """点位变化后按当前筛选条件重新显示"""
+        self.setFilters(self.filters)
+
+
+if __name__ == '__main__':
+    # 启用高DPI缩放
+    QApplication.setHighDpiScaleFactorRoundingPolicy(
+        Qt.HighDpiScaleFactorRoundingPolicy.PassThrough)
+    QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
+    QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
+    import sys
+    # 创建并运行应用
+    app = QApplication(sys.argv)
+    w = LineupResult()
+    w.setFilters({})
+    w.resize(1000, 700)
+    w.show()
+    app.exec_()
@@ -1,23 +1,30 @@
-from PyQt5.QtWidgets import QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QApplication, QPushButton
-from PyQt5.QtCore import Qt, QEasingCurve, pyqtSignal
-from PyQt5.QtGui import QEnterEvent, QMouseEvent, QDragLeaveEvent
-from qfluentwidgets import LineEdit, PrimaryPushButton, ElevatedCardWidget, CaptionLabel, ImageLabel, ScrollArea, FlowLayout
+from PyQt5.QtWidgets import QVBoxLayout, QWidget, QApplication
+from PyQt5.QtCore import Qt, QPoint, QRect, QRectF, QSize, pyqtSignal
+from PyQt5.QtGui import QMouseEvent, QPainter, QPainterPath, QPixmap
+from qfluentwidgets import CaptionLabel, FlowLayout
+
+from common.catalog import catalog
+from common.image_loader import imageLoader, placeholderImage
+from components.paint_card import PaintCard
 
 # from step_base import BaseStep
-import json
-from dataclasses import dataclass
-from typing import List
 
 
-class MapCard(ElevatedCardWidget):
+class MapCard(PaintCard):
     """
-    地图卡片组件，继承自ElevatedCardWidget
-    用于显示一个图标和标签的卡片式组件，并支持鼠标交互
+    地图卡片组件，继承自自绘卡片基类 PaintCard
+    封面直接在 paintEvent 中绘制，悬停、按下时只重绘边框，不修改样式表
     """
     # 定义一个信号，当卡片被点击时发出，并携带卡片信息（例如：名称和图标路径）
     clicked = pyqtSignal(str, str)
 
-    def __init__(self, iconPath: str, name: str, parent=None):
+    # 鼠标进入 (True) 或离开 (False) 卡片时发出，用于预取下一步
+    hoverChanged = pyqtSignal(bool)
+
+    # 封面的逻辑尺寸上限
+    COVER_SIZE = QSize(300, 155)
+
+    def __init__(self, iconPath: str, name: str, parent=None, key: str = None):
         """
         初始化地图卡片
 
@@ -25,75 +32,113 @@ class MapCard(ElevatedCardWidget):
             iconPath (str): 图标文件路径
             name (str): 卡片标签文本
             parent: 父组件，默认为None
+            key (str): 地图在点位数据中的取值，默认与 name 相同
         """
         super().__init__(parent)
         self.iconPath = iconPath  # 存储图标路径
         self.name = name         # 存储卡片名称
+        self.key = key or name   # 存储地图取值
+        self.lineupCount = 0     # 该地图的点位数量
 
-        # 设置卡片默认样式
-        self.setStyleSheet(
-            # 初始边框透明
-            "MapCard { border: 2px solid transparent; }")
-
-        # 创建图标组件，传入图标路径和父组件
-        self.imageLabel = ImageLabel(iconPath, self)
+        # 先显示占位图，缩略图在后台线程解码完成后再替换
+        self.isImageLoaded = False
+        self.cover = QPixmap.fromImage(
+            placeholderImage(QSize(275, 155), self.devicePixelRatioF()))
 
-        # 如果需要圆角
-        self.imageLabel.setBorderRadius(8, 8, 8, 8)
-        self.setBorderRadius(8)
         # 创建标签组件，显示卡片名称
         self.label = CaptionLabel(name, self)
         self.label.setAlignment(Qt.AlignCenter)
 
-        # 创建垂直布局管理器
+        # 创建垂直布局管理器，封面区域由 paintContent 绘制
         self.vBoxLayout = QVBoxLayout(self)
-        self.vBoxLayout.setAlignment(Qt.AlignCenter)
+        self.vBoxLayout.setContentsMargins(8, 4, 8, 4)
         self.vBoxLayout.addStretch(1)
-        self.vBoxLayout.addWidget(self.imageLabel, 0, Qt.AlignCenter)
-        self.vBoxLayout.addStretch(2)
         self.vBoxLayout.addWidget(
             self.label, 0, Qt.AlignHCenter | Qt.AlignBottom)
 
-        self.imageLabel.scaledToHeight(155)
         self.setFixedSize(300, 180)
 
+    def setLineupCount(self, count: int):
+        """ 在卡片标签上显示点位数量 """
+        self.lineupCount = count
+        self.label.setText(f"{self.name} · {count} 个点位" if count else self.name)
+
+    # --- 图片加载 ---
+
+    def requestCover(self):
+        """ 封面还没有加载、也没有在排队时请求加载 """
+        if not self.isImageLoaded and not imageLoader.isPending(self):
+            imageLoader.loadPixmap(self.iconPath, self.COVER_SIZE,
+                                   self.devicePixelRatioF(), self, self._onImageLoaded)
+
+    def showEvent(self, event):
+        """ 卡片第一次显示时才请求加载封面 """
+        super().showEvent(event)
+        self.requestCover()
+
+    def hideEvent(self, event):
+        """ 卡片隐藏时取消还在排队的加载请求 """
+        imageLoader.cancel(self)
+        super().hideEvent(event)
+
+    def _onImageLoaded(self, pixmap: QPixmap):
+        """ 封面加载完成（或缓存命中），替换占位图；加载失败时保留占位图，不再重试 """
+        self.isImageLoaded = True
+        if pixmap.isNull():
+            return
+
+        self.cover = pixmap
+        self.update()
+
+    # --- 绘制 ---
+
+    def coverRect(self) -> QRect:
+        """ 封面按高度 155 缩放后在卡片上方居中 """
+        size = self.cover.size() / self.cover.devicePixelRatio()
+        size = size.scaled(QSize(self.width() - 2 * self.borderWidth, 155), Qt.KeepAspectRatio)
+        rect = QRect(QPoint(0, 0), size)
+        rect.moveCenter(QPoint(self.width() // 2, 0))
+        rect.moveTop(self.borderWidth)
+        return rect
+
+    def paintContent(self, painter: QPainter):
+        # 在滚动区域中滚出可见范围时请求会被取消，再次绘制（滚回可见范围）时重新请求
+        self.requestCover()
+
+        path = QPainterPath()
+        rect = self.coverRect()
+        path.addRoundedRect(QRectF(rect), 8, 8)
+        painter.save()
+        painter.setClipPath(path)
+        painter.drawPixmap(rect, self.cover)
+        painter.restore()
+
     # --- 鼠标事件处理方法 ---
 
-    def enterEvent(self, event: QEnterEvent):
-        """ 鼠标进入事件 """
-        self.setStyleSheet(
-            # 鼠标进入时边框变红
-            "MapCard { border: 4px solid red;border-radius: 8px; }")
+    def enterEvent(self, event):
         super().enterEvent(event)
+        self.hoverChanged.emit(True)
 
-    def leaveEvent(self, event: QDragLeaveEvent):
-        """ 鼠标离开事件 """
-        self.setStyleSheet(
-            # 鼠标离开时边框恢复透明
-            "MapCard { border: 4px solid transparent; border-radius: 8px;}")
+    def leaveEvent(self, event):
         super().leaveEvent(event)
+        self.hoverChanged.emit(False)
 
     def mousePressEvent(self, event: QMouseEvent):
-        """ 鼠标按下事件 """
+        """ 鼠标按下事件，边框颜色由 PaintCard 处理 """
+        super().mousePressEvent(event)
         if event.button() == Qt.LeftButton:  # 检查是否是左键点击
-            # 鼠标点击时边框可以瞬间变蓝或其他颜色，提供视觉反馈
-            self.setStyleSheet(
-                "MapCard { border: 4px solid blue; border-radius: 8px;}")
             # 发出 clicked 信号，并传递当前卡片的信息
             self.clicked.emit(self.name, self.iconPath)
-        super().mousePressEvent(event)
-
-    def mouseReleaseEvent(self, event: QMouseEvent):
-        """ 鼠标释放事件 """
-        # 鼠标释放时，如果仍在卡片上，恢复红色边框；如果离开了，则会由 leaveEvent 处理为透明
-        if self.rect().contains(event.pos()):
-            self.setStyleSheet("MapCard { border: 4px solid red; }")
-        else:
-            self.setStyleSheet("MapCard { border: 4px solid transparent; }")
-        super().mouseReleaseEvent(event)
 
 
 class MapSelect(QWidget):
+    """地图选择页面"""
+
+    # 选中地图时发出，携带地图取值
+    mapSelected = pyqtSignal(str)
+
+    # 鼠标进入或离开地图卡片时发出，携带地图取值和是否进入
+    mapHovered = pyqtSignal(str, bool)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -111,22 +156,30 @@ class MapSelect(QWidget):
 
         
 
-        # 读取地图数据
-        self.map_data = json.loads(
-            open("./resource/maps/maps.json", "r", encoding="utf-8").read())
-
-        # 创建地图选择卡片
+        # 创建地图选择卡片，地图数据来自共享的目录
         self.map_cards = []
-        for map_item in self.map_data['maps']:
+        for game_map in catalog().maps:
             # 创建卡片，父组件依然是 self，这是为了方便管理信号槽等，
             # 但关键是把它添加到 FlowLayout 中
-            card = MapCard(map_item['url'],
-                           map_item['chinese_name'], self)
+            card = MapCard(game_map.cover,
+                           game_map.chinese_name, self, game_map.name)
+            card.clicked.connect(lambda *_, c=card: self.mapSelected.emit(c.key))
+            card.hoverChanged.connect(lambda entered, c=card: self.mapHovered.emit(c.key, entered))
             self.map_cards.append(card)  # 可以把卡片存储起来方便后续操作
 
             # 关键修改：将卡片添加到 FlowLayout 中
             self.flowLayout.addWidget(card)
 
+    def setLineupCounts(self, counts: dict):
+        """
+        更新每张地图卡片上的点位数量
+
+        参数:
+            counts (dict): 地图取值 -> 点位数量
+        """
+        for card in self.map_cards:
+            card.setLineupCount(counts.get(card.key, 0))
+
 
 if __name__ == '__main__':
     # 启用高DPI缩放
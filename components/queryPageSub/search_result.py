@@ -0,0 +1,51 @@
+from PyQt5.QtWidgets import QVBoxLayout, QWidget, QListWidgetItem
+from PyQt5.QtCore import Qt
+from qfluentwidgets import CaptionLabel, ListWidget
+
+from common.catalog import catalog
+from common.lineup_store import Lineup, SIDES
+
+
+class SearchResult(QWidget):
+    """
+    搜索结果页面
+    按相关度列出匹配的点位
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.summaryLabel = CaptionLabel(self)
+        self.listWidget = ListWidget(self)
+
+        self.vBoxLayout = QVBoxLayout(self)
+        self.vBoxLayout.setContentsMargins(0, 10, 0, 0)
+        self.vBoxLayout.addWidget(self.summaryLabel)
+        self.vBoxLayout.addWidget(self.listWidget)
+
+    def setResults(self, query: str, lineups: list, elapsed: float):
+        """
+        显示搜索结果
+
+        参数:
+            query (str): 搜索文本
+            lineups (list): 按相关度排列的点位
+            elapsed (float): 搜索耗时（秒）
+        """
+        self.listWidget.clear()
+        self.summaryLabel.setText(
+            f"“{query}” 找到 {len(lineups)} 个点位（{elapsed * 1000:.1f} 毫秒）")
+
+        for lineup in lineups:
+            item = QListWidgetItem(self.lineupText(lineup))
+            item.setData(Qt.UserRole, lineup.id)
+            self.listWidget.addItem(item)
+
+    @staticmethod
+    def lineupText(lineup: Lineup) -> str:
+        """点位在列表中显示的文字"""
+        c = catalog()
+        facets = " · ".join([c.mapLabel(lineup.map), c.heroLabel(lineup.hero),
+                             c.skillLabel(lineup.skill), SIDES.get(lineup.side, lineup.side)])
+        route = " → ".join(t for t in (lineup.stand, lineup.aim, lineup.land) if t)
+        return f"{facets}    {route}" if route else facets
@@ -1,38 +1,71 @@
-import sys
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QFrame
-from PyQt5.QtCore import Qt,pyqtSignal
-from PyQt5.QtGui import QPixmap, QPainter, QBrush, QColor
+import time
+
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QFileDialog
+from PyQt5.QtCore import Qt, QObject, QPoint, QRect, QRectF, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QIcon, QPainter, QPixmap
 from qfluentwidgets import (
-    ComboBox, LineEdit, PlainTextEdit, PushButton, 
-    FluentIcon, CardWidget, ScrollArea, setTheme, Theme
+    ComboBox, LineEdit, PlainTextEdit, PushButton, FlowLayout,
+    ScrollArea, SegmentedWidget, setTheme, Theme, InfoBar
 )
 from qfluentwidgets import FluentIcon as FIF
 
-class ImageDisplayCard(CardWidget):
-    """单个图片显示卡片"""
+from common.catalog import ROLE_NAMES, catalog
+from common.hero_atlas import SKILL_CELL, heroAtlas
+from common.clip_player import clipAnimator
+from common.draft_journal import draftJournal
+from common.image_ingest import CLIP, THUMB
+from common.image_ingestor import imageIngestor
+from common.image_loader import imageLoader
+from common.image_similarity import nearDuplicateLineups
+from common.lineup_index import lineupIndex
+from common.lineup_search import indexLineup
+from common.lineup_spatial import indexLineupPosition
+from common.lineup_store import FACETS, IMAGE_KINDS, POSITION_KINDS, TEXT_FIELDS, Lineup, SIDES, lineupStore
+from common.signal_bus import signalBus
+from components.map_canvas import PositionPicker
+from components.paint_card import HOVER, NORMAL, PRESSED, PaintCard
+
+# 停止输入多久（毫秒）后写入草稿，持续输入时最多间隔多久写入一次
+DRAFT_DELAY = 500
+DRAFT_MAX_DELAY = 3000
+
+# 草稿保存的字段：四个下拉框、文本、地图位置和三类图片的摘要列表
+DRAFT_FIELDS = (FACETS + TEXT_FIELDS + tuple(f"{kind}_position" for kind in POSITION_KINDS)
+                + tuple(f"{kind}_images" for kind in IMAGE_KINDS))
+
+
+class ImageDisplayCard(PaintCard):
+    """单个图片显示卡片，缩略图和加载状态直接绘制，不使用样式表
+
+    image_path 为 None 时卡片处于“处理中”状态，图片处理完成后调用 set_image() 显示
+    动图有短片版本时，卡片显示期间循环播放短片，隐藏时暂停
+    """
     removeClicked = pyqtSignal(str)  # 发射要删除的图片路径
     
-    def __init__(self, image_path, parent=None):
+    def __init__(self, image_path=None, parent=None, digest=None):
         super().__init__(parent)
         self.image_path = image_path
+        self.digest = digest  # 图片在存储中的摘要
+        self.request = None   # 处理中的 IngestRequest
+        self.pixmap = None    # 加载完成的缩略图，播放短片时为当前帧
+        self.clip_path = None # 短片版本的路径
+        self.playback = None  # 正在播放的短片
+        self.load_failed = False
+        self.warning = None   # 近似重复提示，显示在图片顶部
         self.setFixedSize(200, 180)
+
+        # 悬停时只加深一点边框
+        self.borderWidth = 1
+        self.borderColors = {NORMAL: None, HOVER: QColor(0, 0, 0, 40), PRESSED: QColor(0, 0, 0, 60)}
         
         layout = QVBoxLayout(self)
-        
-        # 图片显示区域
-        self.image_label = QLabel()
-        self.image_label.setFixedSize(180, 140)
-        self.image_label.setAlignment(Qt.AlignCenter)
-        self.image_label.setStyleSheet("""
-            QLabel {
-                border: 1px solid #E0E0E0;
-                border-radius: 8px;
-                background-color: white;
-            }
-        """)
+
+        # 图片显示区域，由 paintContent 绘制
+        self.image_rect = QRect(10, 10, 180, 140)
         
         # 加载并显示图片
-        self.load_image()
+        if self.image_path is not None:
+            self.load_image()
         
         # 删除按钮
         self.remove_button = PushButton("删除", self)
@@ -40,31 +73,214 @@ class ImageDisplayCard(CardWidget):
         self.remove_button.setFixedHeight(30)
         self.remove_button.clicked.connect(self.on_remove_clicked)
         
-        layout.addWidget(self.image_label)
+        layout.addSpacing(self.image_rect.height())
         layout.addWidget(self.remove_button)
         layout.setContentsMargins(10, 10, 10, 10)
         layout.setSpacing(8)
     
+    def set_image(self, image_path, digest):
+        """图片处理完成，显示处理后的缩略图"""
+        self.image_path = image_path
+        self.digest = digest
+        self.request = None
+        self.load_image()
+
+    def set_warning(self, text):
+        """设置图片顶部的提示文字，None 表示清除"""
+        if text != self.warning:
+            self.warning = text
+            self.setToolTip(text or "")
+            self.update()
+
+    def is_pending(self):
+        return self.image_path is None
+
     def load_image(self):
-        """加载并显示图片"""
-        pixmap = QPixmap(self.image_path)
+        """在后台线程加载图片，完成前显示占位文字"""
+        self.request_image()
+
+        if self.digest is not None:
+            self.clip_path = lineupStore().blobs.findVariant(self.digest, CLIP)
+            if self.isVisible():
+                self.play_clip()
+
+    def request_image(self):
+        """缩略图还没有加载、也没有在排队时请求加载"""
+        if self.pixmap is None and not self.load_failed and not imageLoader.isPending(self):
+            imageLoader.loadPixmap(self.image_path, self.image_rect.size(),
+                                   self.devicePixelRatioF(), self, self._on_image_loaded)
+
+    def play_clip(self):
+        """开始播放短片，缩略图作为第一帧解码完成前的封面"""
+        if self.clip_path is not None and self.playback is None:
+            self.playback = clipAnimator.play(self.clip_path, self.image_rect.size(),
+                                              self.devicePixelRatioF(), self, self._on_image_loaded)
+
+    def stop_clip(self):
+        clipAnimator.stop(self.playback)
+        self.playback = None
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.play_clip()
+
+    def hideEvent(self, event):
+        """隐藏（包括窗口最小化）时暂停短片"""
+        self.stop_clip()
+        super().hideEvent(event)
+
+    def _on_image_loaded(self, pixmap: QPixmap):
+        """图片加载完成（或缓存命中）后显示，已按比例缩放到显示区域大小"""
         if not pixmap.isNull():
-            # 按比例缩放图片以适应标签大小
-            scaled_pixmap = pixmap.scaled(
-                self.image_label.size(), 
-                Qt.KeepAspectRatio, 
-                Qt.SmoothTransformation
-            )
-            self.image_label.setPixmap(scaled_pixmap)
+            self.pixmap = pixmap
+        else:
+            self.load_failed = True
+        self.update()
+
+    def paintContent(self, painter: QPainter):
+        """绘制白底圆角的图片区域，居中显示缩略图或状态文字"""
+        painter.setPen(QColor(0xE0, 0xE0, 0xE0))
+        painter.setBrush(Qt.white)
+        painter.drawRoundedRect(QRectF(self.image_rect).adjusted(0.5, 0.5, -0.5, -0.5), 8, 8)
+
+        if self.pixmap is not None:
+            target = QRect(QPoint(0, 0), self.pixmap.size() / self.pixmap.devicePixelRatio())
+            target.moveCenter(self.image_rect.center())
+            painter.drawPixmap(target, self.pixmap)
+
+            if self.warning:
+                banner = QRect(self.image_rect.left(), target.top(), self.image_rect.width(), 28)
+                painter.setPen(Qt.NoPen)
+                painter.setBrush(QColor(0xFF, 0x9F, 0x1C, 220))
+                painter.drawRoundedRect(QRectF(banner), 6, 6)
+                painter.setPen(Qt.white)
+                painter.drawText(banner, Qt.AlignCenter,
+                                 painter.fontMetrics().elidedText(self.warning, Qt.ElideRight, banner.width() - 12))
+        elif self.load_failed:
+            painter.setPen(QColor(0xFF, 0x6B, 0x6B))
+            painter.drawText(self.image_rect, Qt.AlignCenter, "❌\n图片加载失败")
         else:
-            self.image_label.setText("❌\n图片加载失败")
-            self.image_label.setStyleSheet(self.image_label.styleSheet() + 
-                                         "color: #FF6B6B; font-size: 14px;")
+            painter.setPen(QColor(0x66, 0x66, 0x66))
+            painter.drawText(self.image_rect, Qt.AlignCenter,
+                             "处理中..." if self.is_pending() else "加载中...")
+            # 滚出可见范围时请求会被取消，滚回来重新绘制时再请求
+            if not self.is_pending():
+                self.request_image()
     
     def on_remove_clicked(self):
         """处理删除按钮点击"""
-        self.removeClicked.emit(self.image_path)
+        self.removeClicked.emit(self.image_path or "")
+
+
+class ImageUploadSection(QWidget):
+    """图片上传区域：上传按钮加上已上传图片的卡片列表"""
+
+    # 一张图片处理完成（成功或失败）
+    imageProcessed = pyqtSignal()
+    # 截图识别完成，参数为 (Recognition, 图片摘要)
+    imageRecognized = pyqtSignal(object, str)
+    # 已上传的图片列表（images() 的结果）变化
+    imagesChanged = pyqtSignal()
+
+    def __init__(self, title, parent=None):
+        super().__init__(parent)
+        self.image_cards = []
+        # 上传时是否识别截图中的地图和英雄
+        self.recognize_screenshots = False
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        title_layout = QHBoxLayout()
+        title_label = QLabel(title)
+        title_label.setStyleSheet("font-weight: bold; margin-top: 10px;")
+
+        self.upload_button = PushButton("上传图片", self)
+        self.upload_button.setIcon(FIF.PHOTO)
+        self.upload_button.clicked.connect(self.on_upload_clicked)
+
+        title_layout.addWidget(title_label)
+        title_layout.addStretch()
+        title_layout.addWidget(self.upload_button)
+
+        self.cards_layout = FlowLayout(needAni=False)
+        self.cards_layout.setContentsMargins(0, 0, 0, 0)
+
+        layout.addLayout(title_layout)
+        layout.addLayout(self.cards_layout)
+
+    def on_upload_clicked(self):
+        """选择图片文件并添加到列表"""
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, "选择图片", "", "图片 (*.png *.jpg *.jpeg *.bmp *.gif *.webp)")
+        for path in paths:
+            self.add_image(path)
+
+    def add_image(self, image_path):
+        """先显示处理中的卡片，图片在后台处理并保存到内容寻址存储中，卡片持有一次引用"""
+        card = self._add_card(ImageDisplayCard(None, self))
+        card.request = imageIngestor.ingest(
+            image_path, lambda digest, error, c=card: self._on_image_processed(c, digest, error),
+            self.recognize_screenshots)
+
+    def _on_image_processed(self, card, digest, error):
+        if digest is None:
+            # remove_card 会发出 imageProcessed
+            self.remove_card(card, release=False)
+            InfoBar.error("上传失败", error, parent=self.window())
+            return
+
+        recognition = card.request.recognition
+        card.set_image(lineupStore().blobs.imagePath(digest, THUMB), digest)
+        self.imagesChanged.emit()
+        if recognition is not None:
+            self.imageRecognized.emit(recognition, digest)
+        self.imageProcessed.emit()
+
+    def add_blob(self, digest):
+        """显示已在存储中的图片，调用方需要已经为卡片持有一次引用"""
+        self._add_card(ImageDisplayCard(lineupStore().blobs.imagePath(digest, THUMB), self, digest))
+        self.imagesChanged.emit()
+
+    def _add_card(self, card):
+        card.removeClicked.connect(lambda _, c=card: self.remove_card(c))
+        self.image_cards.append(card)
+        self.cards_layout.addWidget(card)
+        return card
+
+    def remove_card(self, card, release=True):
+        """移除卡片，release 为 True 时释放卡片持有的引用，处理中的图片直接丢弃"""
+        self.image_cards.remove(card)
+        self.cards_layout.removeWidget(card)
+        card.stop_clip()
+        card.deleteLater()
+
+        if card.is_pending():
+            # 取消的请求不会再回调，由这里通知等待中的保存
+            card.request.cancel()
+            self.imageProcessed.emit()
+            return
+
+        if release:
+            lineupStore().blobs.decref(card.digest)
+        self.imagesChanged.emit()
+
+    def pending_count(self):
+        """还在处理中的图片数量"""
+        return sum(card.is_pending() for card in self.image_cards)
+
+    def images(self):
+        """已上传图片的摘要列表"""
+        return [card.digest for card in self.image_cards if not card.is_pending()]
+
+    def clear(self, release=True):
+        for card in self.image_cards[:]:
+            self.remove_card(card, release)
+
+
 class AddPointPage(QWidget):
+    """新增点位页面，表单内容自动保存为草稿（见 common.draft_journal），下次打开时恢复"""
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("表单页面")
@@ -92,29 +308,45 @@ class AddPointPage(QWidget):
         first_row_layout = QHBoxLayout()
         
         # 选择地图
-        map_combo = ComboBox()
-        map_combo.addItems(["选择地图", "地图1", "地图2", "地图3"])
-        map_combo.setFixedWidth(250)
-        
-        # 选择英雄
-        hero_combo = ComboBox()
-        hero_combo.addItems(["选择英雄", "英雄1", "英雄2", "英雄3"])
-        hero_combo.setFixedWidth(250)
-        
-        # 英雄技能
-        skill_combo = ComboBox()
-        skill_combo.addItems(["英雄技能", "技能1", "技能2", "技能3"])
-        skill_combo.setFixedWidth(250)
+        self.map_combo = ComboBox()
+        self.map_combo.addItem("选择地图")
+        for game_map in catalog().maps:
+            self.map_combo.addItem(game_map.chinese_name, userData=game_map.name)
+        self.map_combo.setFixedWidth(250)
+        
+        # 选择英雄，按定位排列
+        self.hero_combo = ComboBox()
+        self.hero_combo.addItem("选择英雄")
+        for role, heroes in catalog().heroesByRole.items():
+            for hero in heroes:
+                self.hero_combo.addItem(
+                    f"{hero.chinese_name}（{ROLE_NAMES.get(role, role)}）", userData=hero.name)
+        self.hero_combo.setFixedWidth(250)
+        self.hero_combo.currentIndexChanged.connect(self.update_skill_combo)
+        self.hero_combo.currentIndexChanged.connect(self.check_duplicates)
+        self.map_combo.currentIndexChanged.connect(self.check_duplicates)
+        self.map_combo.currentIndexChanged.connect(self.update_position_map)
+        self.map_combo.currentIndexChanged.connect(self.update_recognition)
+        self.hero_combo.currentIndexChanged.connect(self.update_recognition)
+        
+        # 英雄技能，选择英雄后才有选项
+        self.skill_combo = ComboBox()
+        # 技能图标加载请求的接收方，切换英雄时取消；不用下拉框本身，避免滚出可见范围时被取消
+        self.skill_icon_receiver = QObject(self)
+        self.skill_combo.setFixedWidth(250)
+        self.update_skill_combo()
         
         # 进攻防守
-        position_combo = ComboBox()
-        position_combo.addItems(["进攻防守", "进攻", "防守"])
-        position_combo.setFixedWidth(250)
-        
-        first_row_layout.addWidget(map_combo)
-        first_row_layout.addWidget(hero_combo)
-        first_row_layout.addWidget(skill_combo)
-        first_row_layout.addWidget(position_combo)
+        self.side_combo = ComboBox()
+        self.side_combo.addItem("进攻防守")
+        for side, text in SIDES.items():
+            self.side_combo.addItem(text, userData=side)
+        self.side_combo.setFixedWidth(250)
+        
+        first_row_layout.addWidget(self.map_combo)
+        first_row_layout.addWidget(self.hero_combo)
+        first_row_layout.addWidget(self.skill_combo)
+        first_row_layout.addWidget(self.side_combo)
         first_row_layout.addStretch()
         
         content_layout.addLayout(first_row_layout)
@@ -124,45 +356,37 @@ class AddPointPage(QWidget):
         
         # 左侧：站位
         position_layout = QVBoxLayout()
-        position_input = LineEdit()
-        position_input.setPlaceholderText("站位")
-        position_input.setFixedWidth(300)
+        self.position_input = LineEdit()
+        self.position_input.setPlaceholderText("站位")
+        self.position_input.setFixedWidth(300)
         
-        position_detail_input = LineEdit()
-        position_detail_input.setPlaceholderText("站位详情")
-        position_detail_input.setFixedWidth(300)
+        self.position_detail_input = LineEdit()
+        self.position_detail_input.setPlaceholderText("站位详情")
+        self.position_detail_input.setFixedWidth(300)
         
-        position_layout.addWidget(position_input)
-        position_layout.addWidget(position_detail_input)
+        position_layout.addWidget(self.position_input)
+        position_layout.addWidget(self.position_detail_input)
         
         # 站位图片上传
-        position_label = QLabel("站位图片上传")
-        position_label.setStyleSheet("font-weight: bold; margin-top: 10px;")
-        position_layout.addWidget(position_label)
-        
-        # position_image_card = ImageDisplayCard()
-        # position_layout.addWidget(position_image_card)
+        self.position_images = ImageUploadSection("站位图片上传")
+        position_layout.addWidget(self.position_images)
         
         # 右侧：描点
         point_layout = QVBoxLayout()
-        point_input = LineEdit()
-        point_input.setPlaceholderText("描点")
-        point_input.setFixedWidth(300)
+        self.point_input = LineEdit()
+        self.point_input.setPlaceholderText("描点")
+        self.point_input.setFixedWidth(300)
         
-        point_detail_input = LineEdit()
-        point_detail_input.setPlaceholderText("描点详情")
-        point_detail_input.setFixedWidth(300)
+        self.point_detail_input = LineEdit()
+        self.point_detail_input.setPlaceholderText("描点详情")
+        self.point_detail_input.setFixedWidth(300)
         
-        point_layout.addWidget(point_input)
-        point_layout.addWidget(point_detail_input)
+        point_layout.addWidget(self.point_input)
+        point_layout.addWidget(self.point_detail_input)
         
         # 描点图片上传
-        point_label = QLabel("描点图片上传")
-        point_label.setStyleSheet("font-weight: bold; margin-top: 10px;")
-        point_layout.addWidget(point_label)
-        
-        # point_image_card = ImageDisplayCard()
-        # point_layout.addWidget(point_image_card)
+        self.point_images = ImageUploadSection("描点图片上传")
+        point_layout.addWidget(self.point_images)
         
         second_row_layout.addLayout(position_layout)
         second_row_layout.addSpacing(50)
@@ -176,31 +400,27 @@ class AddPointPage(QWidget):
         
         # 左侧：落点
         drop_layout = QVBoxLayout()
-        drop_input = LineEdit()
-        drop_input.setPlaceholderText("落点")
-        drop_input.setFixedWidth(300)
+        self.drop_input = LineEdit()
+        self.drop_input.setPlaceholderText("落点")
+        self.drop_input.setFixedWidth(300)
         
-        drop_detail_input = LineEdit()
-        drop_detail_input.setPlaceholderText("落点详情")
-        drop_detail_input.setFixedWidth(300)
+        self.drop_detail_input = LineEdit()
+        self.drop_detail_input.setPlaceholderText("落点详情")
+        self.drop_detail_input.setFixedWidth(300)
         
-        drop_layout.addWidget(drop_input)
-        drop_layout.addWidget(drop_detail_input)
+        drop_layout.addWidget(self.drop_input)
+        drop_layout.addWidget(self.drop_detail_input)
         
         # 落点图片上传
-        drop_label = QLabel("落点图片上传")
-        drop_label.setStyleSheet("font-weight: bold; margin-top: 10px;")
-        drop_layout.addWidget(drop_label)
-        
-        # drop_image_card = ImageDisplayCard()
-        # drop_layout.addWidget(drop_image_card)
+        self.drop_images = ImageUploadSection("落点图片上传")
+        drop_layout.addWidget(self.drop_images)
         
         # 右侧：点位备注
         note_layout = QVBoxLayout()
-        note_text = PlainTextEdit()
-        note_text.setPlaceholderText("点位备注")
-        note_text.setFixedSize(300, 280)
-        note_layout.addWidget(note_text)
+        self.note_text = PlainTextEdit()
+        self.note_text.setPlaceholderText("点位备注")
+        self.note_text.setFixedSize(300, 280)
+        note_layout.addWidget(self.note_text)
         
         third_row_layout.addLayout(drop_layout)
         third_row_layout.addSpacing(50)
@@ -208,15 +428,54 @@ class AddPointPage(QWidget):
         third_row_layout.addStretch()
         
         content_layout.addLayout(third_row_layout)
+
+        # 第四行：在地图上标注站位和落点（可选）
+        map_row_layout = QHBoxLayout()
+        self.position_picker = PositionPicker()
+        self.position_picker.setFixedSize(640, 360)
+
+        picker_side_layout = QVBoxLayout()
+        self.position_kind = SegmentedWidget()
+        for kind in POSITION_KINDS:
+            self.position_kind.addItem(kind, IMAGE_KINDS[kind])
+        self.position_kind.setCurrentItem(self.position_picker.kind)
+        self.position_kind.setFixedWidth(200)
+        self.position_kind.currentItemChanged.connect(self.position_picker.setKind)
+        self.position_picker.kindChanged.connect(self.position_kind.setCurrentItem)
+
+        position_hint = QLabel("地图位置（可选）\n左键标注，右键清除当前标记")
+        self.clear_position_button = PushButton("清除位置")
+        self.clear_position_button.setFixedWidth(200)
+        self.clear_position_button.clicked.connect(self.position_picker.clear)
+
+        picker_side_layout.addWidget(position_hint)
+        picker_side_layout.addWidget(self.position_kind)
+        picker_side_layout.addWidget(self.clear_position_button)
+        picker_side_layout.addStretch()
+
+        map_row_layout.addWidget(self.position_picker)
+        map_row_layout.addSpacing(20)
+        map_row_layout.addLayout(picker_side_layout)
+        map_row_layout.addStretch()
+
+        content_layout.addLayout(map_row_layout)
         
         # 保存按钮
-        save_button = PushButton("保存")
-        save_button.setFixedSize(100, 40)
-        save_button.clicked.connect(self.save_data)
+        self.save_button = PushButton("保存")
+        self.save_button.setFixedSize(100, 40)
+        self.save_button.clicked.connect(self.save_data)
+
+        # 点击保存时还有图片在处理，处理完后自动保存
+        self.save_pending = False
+        for section in self.image_sections():
+            section.imageProcessed.connect(self.on_image_processed)
+            section.imageProcessed.connect(self.check_duplicates)
+            section.imageRecognized.connect(self.apply_recognition)
+        self.update_recognition()
         
         button_layout = QHBoxLayout()
         button_layout.addStretch()
-        button_layout.addWidget(save_button)
+        button_layout.addWidget(self.save_button)
         
         content_layout.addLayout(button_layout)
         content_layout.addStretch()
@@ -231,8 +490,305 @@ class AddPointPage(QWidget):
                 font-size: 12px;
             }
         """)
-    
+
+        # 草稿：修改的字段合并后在后台线程写入日志，下次打开页面时恢复
+        self.journal = draftJournal()
+        self.draft = {}             # 已经写入日志的字段值
+        self.draft_dirty = set()    # 修改后还没有写入的字段
+        self.draft_deadline = 0.0   # 未写入的修改最迟的写入时间 (time.perf_counter)
+        self.restoring_draft = False
+        self.draft_timer = QTimer(self)
+        self.draft_timer.setSingleShot(True)
+        self.draft_timer.timeout.connect(self.save_draft)
+
+        for field, combo in zip(FACETS, self.facet_combos()):
+            combo.currentIndexChanged.connect(lambda _, f=field: self.mark_draft_dirty(f))
+        for field, line_edit in self.text_inputs().items():
+            line_edit.textChanged.connect(lambda _, f=field: self.mark_draft_dirty(f))
+        self.note_text.textChanged.connect(lambda: self.mark_draft_dirty("note"))
+        self.position_picker.positionChanged.connect(
+            lambda kind, _: self.mark_draft_dirty(f"{kind}_position"))
+        for kind, section in self.image_sections_by_kind().items():
+            # 图片的引用计数保存在数据库中，草稿中的图片列表需要尽快与之一致
+            section.imagesChanged.connect(lambda f=f"{kind}_images": self.mark_draft_dirty(f, 0))
+
+        self.restore_draft()
+        QApplication.instance().aboutToQuit.connect(self.close_draft)
+
+    def facet_combos(self):
+        """与 FACETS 顺序一致的四个下拉框"""
+        return [self.map_combo, self.hero_combo, self.skill_combo, self.side_combo]
+
+    def text_inputs(self):
+        """点位文本字段（备注除外）对应的输入框"""
+        return {
+            "stand": self.position_input,
+            "stand_detail": self.position_detail_input,
+            "aim": self.point_input,
+            "aim_detail": self.point_detail_input,
+            "land": self.drop_input,
+            "land_detail": self.drop_detail_input,
+        }
+
+    def image_sections_by_kind(self):
+        return dict(zip(IMAGE_KINDS, self.image_sections()))
+
+    def draft_value(self, field):
+        """字段的当前值，转换成可以写入 JSON 的形式"""
+        if field in FACETS:
+            return self.combo_value(self.facet_combos()[FACETS.index(field)])
+        if field == "note":
+            return self.note_text.toPlainText()
+        if field in TEXT_FIELDS:
+            return self.text_inputs()[field].text()
+
+        kind, _, attribute = field.rpartition("_")
+        if attribute == "position":
+            point = self.position_picker.position(kind)
+            return list(point) if point is not None else None
+        return self.image_sections_by_kind()[kind].images()
+
+    def mark_draft_dirty(self, field, delay=DRAFT_DELAY):
+        """
+        记录修改的字段，停止修改 delay 毫秒后写入草稿
+
+        持续修改时最迟在第一次修改 DRAFT_MAX_DELAY 毫秒后写入，之后的修改也不会推迟更早的写入时间
+        """
+        if self.restoring_draft:
+            return
+
+        now = time.perf_counter()
+        if not self.draft_dirty:
+            self.draft_deadline = now + DRAFT_MAX_DELAY / 1000
+        self.draft_deadline = min(self.draft_deadline, now + delay / 1000)
+        self.draft_dirty.add(field)
+
+        wait = min(delay / 1000, self.draft_deadline - now)
+        self.draft_timer.start(int(max(0.0, wait) * 1000))
+
+    def save_draft(self):
+        """把修改过并且与已写入的值不同的字段作为一条补丁交给写线程，不等待写入完成"""
+        self.draft_timer.stop()
+        patch = {}
+        for field in self.draft_dirty:
+            value = self.draft_value(field)
+            if self.draft.get(field) != value:
+                patch[field] = self.draft[field] = value
+
+        self.draft_dirty.clear()
+        self.journal.append(patch)
+
+    def close_draft(self):
+        """程序退出前写入还没有写入的修改"""
+        self.save_draft()
+        self.journal.close(timeout=2)
+
+    def restore_draft(self):
+        """恢复上次没有保存的草稿，已经不在存储中的图片被忽略"""
+        draft = self.journal.load()
+        if not draft:
+            return
+
+        self.restoring_draft = True
+        try:
+            # 先选地图和英雄：切换地图会清空地图位置，切换英雄会重新填充技能
+            for field, combo in zip(FACETS, self.facet_combos()):
+                index = combo.findData(draft.get(field))
+                if index > 0:
+                    combo.setCurrentIndex(index)
+
+            for field, line_edit in self.text_inputs().items():
+                line_edit.setText(draft.get(field) or "")
+            self.note_text.setPlainText(draft.get("note") or "")
+
+            for kind in POSITION_KINDS:
+                point = draft.get(f"{kind}_position")
+                if point is not None:
+                    self.position_picker.setPosition(kind, tuple(point))
+
+            # 草稿中的图片持有的引用在上次退出时没有释放，由恢复的卡片继续持有
+            blobs = lineupStore().blobs
+            for kind, section in self.image_sections_by_kind().items():
+                for digest in draft.get(f"{kind}_images") or []:
+                    if blobs.refcount(digest) > 0:
+                        section.add_blob(digest)
+        finally:
+            self.restoring_draft = False
+
+        # 没能恢复的字段（如已经删除的图片）在下一次写入时更正
+        self.draft = dict(draft)
+        for field in DRAFT_FIELDS:
+            if field in draft:
+                self.mark_draft_dirty(field)
+        self.check_duplicates()
+
+    def update_skill_combo(self):
+        """根据选择的英雄填充技能下拉框"""
+        self.skill_combo.clear()
+        self.skill_combo.addItem("英雄技能")
+
+        hero = self.combo_value(self.hero_combo)
+        if hero is None:
+            return
+
+        # 图集没有构建时图标在后台加载，不在切换英雄时同步解码原始文件
+        imageLoader.cancel(self.skill_icon_receiver)
+        number = catalog().hero(hero).number
+        for slot, path in catalog().skills(hero).items():
+            if heroAtlas().contains(number, slot):
+                self.skill_combo.addItem(catalog().skillLabel(slot), heroAtlas().icon(number, slot), slot)
+                continue
+
+            self.skill_combo.addItem(catalog().skillLabel(slot), None, slot)
+            imageLoader.loadPixmap(path, SKILL_CELL, self.devicePixelRatioF(), self.skill_icon_receiver,
+                                   lambda pixmap, i=self.skill_combo.count() - 1: self.skill_combo.setItemIcon(
+                                       i, QIcon(pixmap)))
+
+    @staticmethod
+    def combo_value(combo):
+        """下拉框的取值，第一项是提示文字，视为未选择"""
+        if combo.currentIndex() <= 0:
+            return None
+        return combo.currentData() or combo.currentText()
+
+    def collect_lineup(self):
+        """从表单收集点位数据，必选项未选择时返回 None"""
+        facets = [self.combo_value(combo) for combo in (
+            self.map_combo, self.hero_combo, self.skill_combo, self.side_combo)]
+        if None in facets:
+            return None
+
+        lineup = Lineup(
+            *facets,
+            stand=self.position_input.text().strip(),
+            stand_detail=self.position_detail_input.text().strip(),
+            aim=self.point_input.text().strip(),
+            aim_detail=self.point_detail_input.text().strip(),
+            land=self.drop_input.text().strip(),
+            land_detail=self.drop_detail_input.text().strip(),
+            note=self.note_text.toPlainText().strip(),
+            images={
+                "stand": self.position_images.images(),
+                "aim": self.point_images.images(),
+                "land": self.drop_images.images(),
+            }
+        )
+        for kind in POSITION_KINDS:
+            lineup.set_position(kind, self.position_picker.position(kind))
+        return lineup
+
+    def clear_form(self):
+        """保存成功后清空表单，保留四个下拉框方便连续录入
+
+        图片的引用已经转交给保存的点位，清空时不释放
+        """
+        for line_edit in (self.position_input, self.position_detail_input,
+                          self.point_input, self.point_detail_input,
+                          self.drop_input, self.drop_detail_input):
+            line_edit.clear()
+
+        self.note_text.clear()
+        self.position_picker.clear()
+        for section in self.image_sections():
+            section.clear(release=False)
+
+    def update_position_map(self):
+        """切换地图后显示新地图，之前标注的位置不再适用"""
+        self.position_picker.clear()
+        self.position_picker.setMap(self.combo_value(self.map_combo))
+
+    def image_sections(self):
+        return [self.position_images, self.point_images, self.drop_images]
+
+    def update_recognition(self):
+        """地图或英雄还没有选择时，上传的截图同时识别地图和英雄"""
+        recognize = self.combo_value(self.map_combo) is None or self.combo_value(self.hero_combo) is None
+        for section in self.image_sections():
+            section.recognize_screenshots = recognize
+
+    @staticmethod
+    def select_if_empty(combo, value):
+        """下拉框还没有选择时选中 value 对应的选项，返回是否选中"""
+        if value is None or combo.currentIndex() > 0:
+            return False
+
+        index = combo.findData(value)
+        if index <= 0:
+            return False
+        combo.setCurrentIndex(index)
+        return True
+
+    def apply_recognition(self, recognition, digest):
+        """
+        用截图的识别结果填写还没有选择的地图、英雄和技能
+
+        模板识别不出来的地图、英雄以及技能，参考截图相似的已保存点位
+        """
+        game_map = self.combo_value(self.map_combo) or recognition.map
+        hero = self.combo_value(self.hero_combo) or recognition.hero
+        matches = nearDuplicateLineups(digest, game_map, hero)
+        similar = lineupStore().get(matches[0][0]) if matches else None
+        if similar is not None:
+            game_map, hero = game_map or similar.map, hero or similar.hero
+
+        filled = []
+        if self.select_if_empty(self.map_combo, game_map):
+            filled.append(catalog().mapLabel(game_map))
+        if self.select_if_empty(self.hero_combo, hero):
+            filled.append(catalog().heroLabel(hero))
+        if (similar is not None and similar.hero == self.combo_value(self.hero_combo)
+                and self.select_if_empty(self.skill_combo, similar.skill)):
+            filled.append(catalog().skillLabel(similar.skill))
+
+        if filled:
+            InfoBar.info("已识别截图", "、".join(filled), parent=self)
+
+    def check_duplicates(self):
+        """在图片上提示同一地图、同一英雄下已有相似截图的点位"""
+        game_map, hero = self.combo_value(self.map_combo), self.combo_value(self.hero_combo)
+        for section in self.image_sections():
+            for card in section.image_cards:
+                matches = []
+                if card.digest and game_map and hero:
+                    matches = nearDuplicateLineups(card.digest, game_map, hero)
+
+                if matches:
+                    ids = "、".join(f"#{lineup_id}" for lineup_id, _ in matches[:3])
+                    card.set_warning(f"⚠ 与点位 {ids} 的截图相似" if len(matches) <= 3
+                                     else f"⚠ 与点位 {ids} 等 {len(matches)} 个点位的截图相似")
+                else:
+                    card.set_warning(None)
+
+    def on_image_processed(self):
+        """等待中的保存在所有图片处理完后继续"""
+        if self.save_pending and not any(s.pending_count() for s in self.image_sections()):
+            self.save_pending = False
+            self.save_button.setEnabled(True)
+            self.save_button.setText("保存")
+            self.save_data()
+
     def save_data(self):
-        print("保存数据...")
-        # 在这里添加保存逻辑
+        """保存点位到数据库，有图片还在处理时等处理完成后再保存"""
+        lineup = self.collect_lineup()
+        if lineup is None:
+            InfoBar.warning("无法保存", "请先选择地图、英雄、技能和攻防", parent=self)
+            return
+
+        if any(s.pending_count() for s in self.image_sections()):
+            self.save_pending = True
+            self.save_button.setEnabled(False)
+            self.save_button.setText("处理图片...")
+            return
+
+        lineupStore().add(lineup)
+        lineupIndex().add(lineup.id, *lineup.facets())
+        indexLineup(lineup)
+        indexLineupPosition(lineup)
+        signalBus.lineupSaved.emit(lineup.id)
 
+        self.clear_form()
+        # 图片的引用已经转交给点位，立即换成只有四个下拉框的新草稿
+        self.journal.clear()
+        self.draft, self.draft_dirty = {}, set(FACETS)
+        self.save_draft()
+        InfoBar.success("保存成功", f"点位 #{lineup.id} 已保存", parent=self)
@@ -1,21 +1,39 @@
-from qfluentwidgets import FluentIcon, PushButton, BodyLabel, ComboBox, SwitchButton, IndicatorPosition, ExpandGroupSettingCard, PrimaryToolButton, PrimaryPushButton, ToolButton
-from qfluentwidgets import NavigationItemPosition, MSFluentWindow, SubtitleLabel, setFont, setTheme, Theme
-from components.upload import AddPointPage
-from qfluentwidgets import FluentIcon as FIF
-import time
-import os
-from PyQt5.QtGui import QIcon, QPixmap
-from PyQt5.QtCore import QSize, QEventLoop, QTimer, Qt
-from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QVBoxLayout, QFrame, QSizePolicy, QPushButton, QHBoxLayout, QScrollArea, QComboBox
-from qframelesswindow import FramelessWindow, StandardTitleBar
-from PyQt5.QtWidgets import QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QApplication
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QIcon
-from qfluentwidgets import (NavigationInterface, NavigationItemPosition, PushButton, TitleLabel, BodyLabel, PrimaryPushButton, FluentWindow,
-                         FlowLayout,   FluentIcon, CardWidget, qrouter, setTheme, Theme)
 import sys
-from components.home import Home # Assuming home.py is in the same directory
-from components.queryPage import QueryPage # Assuming upload.py is in the same directory
+import time
+
+_START = time.perf_counter()
+
+from common.startup_profiler import startupProfiler
+
+# --profile-startup[=路径]：记录启动各阶段耗时并写成 JSON 后退出
+PROFILE_ARG = "--profile-startup"
+PROFILE_PATH = "startup_profile.json"
+
+if __name__ == '__main__' and any(a.split("=")[0] == PROFILE_ARG for a in sys.argv):
+    startupProfiler.enable(_START)
+
+with startupProfiler.phase("imports"):
+    from PyQt5.QtCore import QTimer, Qt
+    from PyQt5.QtGui import QIcon
+    from PyQt5.QtWidgets import QApplication, QHBoxLayout, QMainWindow
+    from qfluentwidgets import (CardWidget, MSFluentWindow, NavigationItemPosition, SubtitleLabel,
+                                Theme, setFont, setTheme)
+    from qfluentwidgets import FluentIcon as FIF
+
+    from components.home import Home
+    from components.lazy_interface import LazyInterface
+
+
+def createQueryPage():
+    """创建查询页面，页面模块在第一次需要时才导入"""
+    from components.queryPage import QueryPage
+    return QueryPage()
+
+
+def createAddPointPage():
+    """创建新增点位页面，页面模块在第一次需要时才导入"""
+    from components.upload import AddPointPage
+    return AddPointPage()
 
 
 class ValorantMainWindow(QMainWindow):
@@ -36,18 +54,26 @@ class ValorantMainWindow(QMainWindow):
 class Window(MSFluentWindow):
     """ 主界面 """
 
-    def __init__(self):
+    # 首帧显示后等待多久开始在空闲时预先创建其余页面（毫秒）
+    PREWARM_DELAY = 500
+
+    def __init__(self, prewarm: bool = True):
+        """
+        参数:
+            prewarm (bool): 首帧显示后是否在空闲时预先创建延迟加载的页面
+        """
         super().__init__()
+        self.prewarm = prewarm
 
         # 主界面 功能：1.查询点位 新增点位
-        self.homeInterface = Home(self)
+        with startupProfiler.phase("construct 主页"):
+            self.homeInterface = Home(self)
         self.homeInterface.setObjectName("主页")  
         
-        self.qureyPointInterface = QueryPage( )
-        self.qureyPointInterface.setObjectName("查询点位")  
+        # 查询和新增页面创建代价较高，先注册占位控件，第一次打开时再创建
+        self.qureyPointInterface = LazyInterface(createQueryPage, "查询点位", self)
         
-        self.addNewPointInterface = AddPointPage()
-        self.addNewPointInterface.setObjectName("新增点位")  
+        self.addNewPointInterface = LazyInterface(createAddPointPage, "新增点位", self)
 
         self.settingInterface = CardWidget( self)
         self.settingInterface.setObjectName("设置")  
@@ -84,24 +110,68 @@ class Window(MSFluentWindow):
         }
         
         if routeKey in interface_map:
-            self.switchTo(interface_map[routeKey])
-            self.navigationInterface.setCurrentItem(routeKey)
-        
+            interface = interface_map[routeKey]
+            if isinstance(interface, LazyInterface):
+                interface.ensureCreated()
+
+            self.switchTo(interface)
+            self.navigationInterface.setCurrentItem(interface.objectName())
+
+    def showEvent(self, e):
+        super().showEvent(e)
+        if self.prewarm:
+            self.prewarm = False
+            QTimer.singleShot(self.PREWARM_DELAY, self.prewarmInterfaces)
+
+    def prewarmInterfaces(self):
+        """每次事件循环空闲时创建一个还没创建的页面，避免一次性阻塞界面"""
+        for interface in self.lazyInterfaces():
+            if not interface.isCreated():
+                interface.ensureCreated()
+                QTimer.singleShot(0, self.prewarmInterfaces)
+                return
+
+    def lazyInterfaces(self):
+        return [self.qureyPointInterface, self.addNewPointInterface]
+
+
+def finishStartupProfile(window: Window, path: str):
+    """首帧之后依次创建所有页面，写出耗时记录并退出"""
+    startupProfiler.mark("first frame")
+    for interface in window.lazyInterfaces():
+        interface.ensureCreated()
+
+    startupProfiler.save(path)
+    print(f"startup profile written to {path}")
+    QApplication.quit()
+
 
 if __name__ == '__main__':
+    profilePath = None
+    for arg in sys.argv[1:]:
+        if arg.split("=")[0] == PROFILE_ARG:
+            profilePath = arg.partition("=")[2] or PROFILE_PATH
+
     # 启用高DPI缩放
     QApplication.setHighDpiScaleFactorRoundingPolicy(
         Qt.HighDpiScaleFactorRoundingPolicy.PassThrough)
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
     QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
 
-    app = QApplication(sys.argv)
+    with startupProfiler.phase("create QApplication"):
+        app = QApplication(sys.argv)
 
     # 设置主题
     setTheme(Theme.LIGHT)
 
     # 创建主窗口
-    window = Window()
-    window.show()
+    with startupProfiler.phase("construct Window"):
+        window = Window(prewarm=profilePath is None)
+
+    with startupProfiler.phase("show"):
+        window.show()
+
+    if profilePath:
+        QTimer.singleShot(0, lambda: finishStartupProfile(window, profilePath))
 
     sys.exit(app.exec_())